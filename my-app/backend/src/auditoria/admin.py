@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Institucion, VisitaAuditoria, PlatoObservado, IngredientePlato, PlatoPlantilla, IngredientePlantilla
+from .models import (
+    Institucion, VisitaAuditoria, PlatoObservado, IngredientePlato, PlatoPlantilla, IngredientePlantilla, ResumenDiario,
+    TrabajoReporte,
+)
 
 
 @admin.register(Institucion)
@@ -21,6 +24,12 @@ class VisitaAuditoriaAdmin(admin.ModelAdmin):
     list_filter = ['tipo_comida', 'fecha']
     search_fields = ['institucion__nombre']
     inlines = [PlatoObservadoInline]
+    readonly_fields = ['cantidad_platos', 'cantidad_platos_con_totales', 'porciones_servidas_total', 'energia_kcal_total',
+                      'proteinas_g_total', 'grasas_totales_g_total', 'carbohidratos_g_total']
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        VisitaAuditoria.recalcular_totales_de([form.instance.pk])
 
 
 class IngredientePlatoInline(admin.TabularInline):
@@ -38,6 +47,20 @@ class PlatoObservadoAdmin(admin.ModelAdmin):
     readonly_fields = ['energia_kcal_total', 'proteinas_g_total', 'grasas_totales_g_total',
                       'carbohidratos_g_total', 'fibra_g_total', 'sodio_mg_total']
 
+    def save_model(self, request, obj, form, change):
+        obj._visita_anterior = form.initial.get('visita')
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        visitas = {form.instance.visita_id, getattr(form.instance, '_visita_anterior', None)}
+        VisitaAuditoria.recalcular_totales_de(visitas - {None})
+
+    def delete_model(self, request, obj):
+        visita_id = obj.visita_id
+        super().delete_model(request, obj)
+        VisitaAuditoria.recalcular_totales_de([visita_id])
+
 
 @admin.register(IngredientePlato)
 class IngredientePlatoAdmin(admin.ModelAdmin):
@@ -58,10 +81,33 @@ class PlatoPlantillaAdmin(admin.ModelAdmin):
     search_fields = ['nombre', 'descripcion']
     inlines = [IngredientePlantillaInline]
     readonly_fields = ['energia_kcal_total', 'proteinas_g_total', 'grasas_totales_g_total',
-                      'carbohidratos_g_total', 'fibra_g_total', 'sodio_mg_total']
+                      'carbohidratos_g_total', 'agua_g_total', 'fibra_g_total', 'sodio_mg_total',
+                      'calcio_mg_total', 'hierro_mg_total', 'zinc_mg_total', 'vitamina_c_mg_total',
+                      'potasio_mg_total', 'fosforo_mg_total', 'grasas_saturadas_g_total',
+                      'grasas_monoinsat_g_total', 'grasas_poliinsat_g_total']
 
 
 @admin.register(IngredientePlantilla)
 class IngredientePlantillaAdmin(admin.ModelAdmin):
     list_display = ['plato_plantilla', 'alimento', 'cantidad', 'unidad']
     search_fields = ['plato_plantilla__nombre', 'alimento__nombre']
+
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ['institucion', 'fecha', 'tipo_comida', 'cantidad_visitas', 'cantidad_platos', 'energia_kcal_suma']
+    list_filter = ['tipo_comida', 'fecha']
+    search_fields = ['institucion__nombre']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'estado', 'creado', 'iniciado', 'finalizado']
+    list_filter = ['tipo', 'estado']
+    readonly_fields = ['clave', 'version', 'resultado', 'error', 'creado', 'iniciado', 'finalizado']
+
+    def has_add_permission(self, request):
+        return False
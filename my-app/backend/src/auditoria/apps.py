@@ -5,3 +5,6 @@ class AuditoriaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auditoria'
     verbose_name = 'Auditoría'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,127 @@
+"""Exportación columnar (Parquet) de los hechos nutricionales por plato.
+
+Una fila por PlatoObservado con los datos de su visita e institución y los 16
+totales. Los archivos se particionan por mes de la visita con el esquema de
+directorios de Hive (`mes=2025-04/platos.parquet`), que leen directamente
+pandas, DuckDB, Spark y las herramientas de BI.
+
+pyarrow es una dependencia opcional: solo se importa al exportar.
+"""
+import os
+from datetime import date
+
+from nutricion.matriz import CAMPOS_TOTAL
+from .models import VisitaAuditoria, PlatoObservado
+from .frecuencias import inicio_de_mes, mes_siguiente
+
+NOMBRE_ARCHIVO = 'platos.parquet'
+
+# (columna, lookup sobre PlatoObservado, tipo)
+COLUMNAS = (
+    ('plato_id', 'id', 'int64'),
+    ('visita_id', 'visita_id', 'int64'),
+    ('fecha', 'visita__fecha', 'date'),
+    ('tipo_comida', 'visita__tipo_comida', 'string'),
+    ('institucion_id', 'visita__institucion_id', 'int64'),
+    ('institucion_codigo', 'visita__institucion__codigo', 'string'),
+    ('institucion_tipo', 'visita__institucion__tipo', 'string'),
+    ('comuna', 'visita__institucion__comuna', 'string'),
+    ('nombre', 'nombre', 'string'),
+    ('tipo_plato', 'tipo_plato', 'string'),
+    ('porciones_servidas', 'porciones_servidas', 'int32'),
+    *((campo, campo, 'decimal') for campo in CAMPOS_TOTAL),
+)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('La exportación Parquet requiere pyarrow (pip install pyarrow)')
+    return pyarrow
+
+
+def esquema():
+    pa = _pyarrow()
+    tipos = {'int64': pa.int64(), 'int32': pa.int32(), 'date': pa.date32(), 'string': pa.string()}
+    campos = []
+    for columna, lookup, tipo in COLUMNAS:
+        if tipo == 'decimal':
+            campo = PlatoObservado._meta.get_field(lookup)
+            campos.append(pa.field(columna, pa.decimal128(campo.max_digits, campo.decimal_places)))
+        else:
+            campos.append(pa.field(columna, tipos[tipo]))
+    return pa.schema(campos)
+
+
+def ruta_particion(destino, mes):
+    return os.path.join(destino, f'mes={mes:%Y-%m}', NOMBRE_ARCHIVO)
+
+
+def exportado_completo(destino, mes):
+    """Si la partición del mes existe y se escribió después de cerrado el mes."""
+    ruta = ruta_particion(destino, mes)
+    if not os.path.exists(ruta):
+        return False
+    return date.fromtimestamp(os.path.getmtime(ruta)) >= mes_siguiente(mes)
+
+
+def meses_a_exportar(destino, desde=None, hasta=None, reescribir=False, incluir_mes_actual=False):
+    """Meses con visitas en el rango que hay que escribir.
+
+    Por defecto solo los meses cerrados que todavía no tienen un archivo escrito
+    después del cierre, así cada corrida agrega lo nuevo desde la anterior y
+    completa los meses exportados cuando estaban abiertos (--incluir-mes-actual).
+    Con `reescribir` se vuelven a escribir todos los del rango (p. ej. tras
+    corregir visitas viejas).
+    """
+    visitas = VisitaAuditoria.objects.order_by()
+    if desde:
+        visitas = visitas.filter(fecha__gte=inicio_de_mes(desde))
+    if hasta:
+        visitas = visitas.filter(fecha__lt=mes_siguiente(inicio_de_mes(hasta)))
+    mes_actual = inicio_de_mes(date.today())
+    return [
+        mes for mes in visitas.dates('fecha', 'month')
+        if (incluir_mes_actual or mes < mes_actual)
+        and (reescribir or not exportado_completo(destino, mes))
+    ]
+
+
+def exportar_mes(destino, mes, filas_por_grupo=100_000, compresion='snappy'):
+    """Escribe la partición del mes por grupos de filas. Devuelve la cantidad de filas.
+
+    Cada grupo de filas sale de una consulta keyset por id, así que la memoria no
+    depende del tamaño del mes. Se escribe a un archivo temporal que reemplaza al
+    anterior solo al terminar, para que un lector nunca vea un archivo a medias.
+    """
+    pa = _pyarrow()
+    schema = esquema()
+    ruta = ruta_particion(destino, mes)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.tmp'
+
+    platos = PlatoObservado.objects.filter(visita__fecha__gte=mes, visita__fecha__lt=mes_siguiente(mes))
+    lookups = [lookup for _, lookup, _ in COLUMNAS]
+    total = 0
+    ultimo = 0
+    try:
+        with pa.parquet.ParquetWriter(temporal, schema, compression=compresion) as escritor:
+            while True:
+                filas = list(platos.filter(id__gt=ultimo).order_by('id').values_list(*lookups)[:filas_por_grupo])
+                if not filas:
+                    break
+                columnas = [
+                    pa.array(valores, type=campo.type)
+                    for valores, campo in zip(zip(*filas), schema)
+                ]
+                escritor.write_table(pa.Table.from_arrays(columnas, schema=schema), row_group_size=filas_por_grupo)
+                total += len(filas)
+                ultimo = filas[-1][0]
+        os.replace(temporal, ruta)
+    finally:
+        # Si la escritura falló no queda el archivo a medias
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return total
@@ -0,0 +1,122 @@
+"""Exportación masiva de visitas, platos e ingredientes.
+
+Las visitas se recorren por lotes de ids (keyset) y cada lote se arma con tres
+consultas values(): visitas, sus platos y los ingredientes de esos platos. Las
+filas se van generando a medida que se leen, así que la memoria usada depende
+del tamaño del lote y no del total exportado.
+
+- CSV: una fila por ingrediente, con los totales del plato. Los platos sin
+  ingredientes y las visitas sin platos salen en una fila con esas columnas vacías.
+- JSON lines: una línea por visita con sus totales y los platos anidados.
+"""
+import csv
+import json
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from nutricion.matriz import CAMPOS_APORTE, CAMPOS_TOTAL
+from .models import VisitaAuditoria, PlatoObservado, IngredientePlato, CAMPOS_VISITA
+from .nutrientes import lotes
+
+FORMATOS = ('csv', 'jsonl')
+
+CAMPOS_VISITA_EXPORTACION = (
+    'id', 'fecha', 'tipo_comida', 'institucion_id', 'institucion__codigo', 'institucion__nombre',
+    'institucion__tipo', 'institucion__comuna', 'observaciones', 'formulario_completado', *CAMPOS_VISITA,
+)
+CAMPOS_PLATO_EXPORTACION = ('id', 'visita_id', 'nombre', 'tipo_plato', 'porciones_servidas', *CAMPOS_TOTAL)
+CAMPOS_INGREDIENTE_EXPORTACION = (
+    'id', 'plato_id', 'alimento_id', 'alimento__nombre', 'cantidad', 'unidad', *CAMPOS_APORTE,
+)
+
+# Columnas del CSV: (prefijo, campo) de visita, plato e ingrediente
+COLUMNAS_CSV = (
+    *(('visita', campo) for campo in ('id', 'fecha', 'tipo_comida', 'institucion_id', 'institucion__codigo',
+                                      'institucion__nombre', 'institucion__tipo', 'institucion__comuna')),
+    *(('plato', campo) for campo in CAMPOS_PLATO_EXPORTACION if campo != 'visita_id'),
+    *(('ingrediente', campo) for campo in CAMPOS_INGREDIENTE_EXPORTACION if campo != 'plato_id'),
+)
+
+
+def filtrar_visitas(fecha_inicio=None, fecha_fin=None, institucion_ids=None, tipo_comida=None):
+    """Visitas a exportar; las fechas son strings YYYY-MM-DD (ValueError si son inválidas)."""
+    visitas = VisitaAuditoria.objects.order_by()
+    if fecha_inicio:
+        visitas = visitas.filter(fecha__gte=date.fromisoformat(fecha_inicio))
+    if fecha_fin:
+        visitas = visitas.filter(fecha__lte=date.fromisoformat(fecha_fin))
+    if institucion_ids:
+        visitas = visitas.filter(institucion_id__in=institucion_ids)
+    if tipo_comida:
+        visitas = visitas.filter(tipo_comida=tipo_comida)
+    return visitas
+
+
+def visitas_por_lote(visitas, tamano=500):
+    """Genera (visita, platos) con platos = [(plato, [ingredientes])], todo como dicts."""
+    for primer_id, ultimo_id, _ in lotes(visitas, tamano):
+        lote = list(
+            visitas.filter(id__gte=primer_id, id__lte=ultimo_id)
+            .order_by('id')
+            .values(*CAMPOS_VISITA_EXPORTACION)
+        )
+        ids = [visita['id'] for visita in lote]
+
+        platos = {}
+        for plato in (
+            PlatoObservado.objects.filter(visita_id__in=ids)
+            .order_by('visita_id', 'id')
+            .values(*CAMPOS_PLATO_EXPORTACION)
+        ):
+            platos.setdefault(plato['visita_id'], []).append((plato, []))
+
+        ingredientes = {}
+        for ingrediente in (
+            IngredientePlato.objects.filter(plato__visita_id__in=ids)
+            .order_by('plato_id', 'orden', 'id')
+            .values(*CAMPOS_INGREDIENTE_EXPORTACION)
+        ):
+            ingredientes.setdefault(ingrediente['plato_id'], []).append(ingrediente)
+
+        for visita in lote:
+            yield visita, [
+                (plato, ingredientes.get(plato['id'], []))
+                for plato, _ in platos.get(visita['id'], [])
+            ]
+
+
+def filas_csv(visitas, tamano=500):
+    """Filas (listas) del CSV, empezando por el encabezado."""
+    yield [f'{prefijo}_{campo.replace("__", "_")}' for prefijo, campo in COLUMNAS_CSV]
+    for visita, platos in visitas_por_lote(visitas, tamano):
+        for plato, ingredientes in platos or [({}, [])]:
+            for ingrediente in ingredientes or [{}]:
+                fuentes = {'visita': visita, 'plato': plato, 'ingrediente': ingrediente}
+                yield [fuentes[prefijo].get(campo) for prefijo, campo in COLUMNAS_CSV]
+
+
+def lineas_csv(visitas, tamano=500):
+    """Texto CSV línea por línea."""
+    class Eco:
+        def write(self, valor):
+            return valor
+
+    escritor = csv.writer(Eco())
+    for fila in filas_csv(visitas, tamano):
+        yield escritor.writerow(fila)
+
+
+def lineas_jsonl(visitas, tamano=500):
+    """Una línea JSON por visita, con los platos y sus ingredientes anidados."""
+    for visita, platos in visitas_por_lote(visitas, tamano):
+        visita['platos'] = [
+            {**plato, 'ingredientes': ingredientes} for plato, ingredientes in platos
+        ]
+        yield json.dumps(visita, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def exportar(visitas, formato, tamano=500):
+    """Generador de texto en el formato indicado ('csv' o 'jsonl')."""
+    if formato == 'csv':
+        return lineas_csv(visitas, tamano)
+    return lineas_jsonl(visitas, tamano)
@@ -0,0 +1,82 @@
+"""Índice de respuestas del formulario de relevamiento.
+
+`VisitaAuditoria.formulario_respuestas` es un JSON {seccion: {pregunta: valor}}.
+Para filtrar sin recorrerlo en Python, cada respuesta se guarda también como una
+fila de RespuestaFormulario con su valor normalizado.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from .models import RespuestaFormulario
+
+# Valores del filtro que se interpretan como verdadero al comparar con respuestas booleanas
+VALORES_VERDADEROS = ['true', 'si', 'sí', '1', 'yes']
+
+LARGO_TEXTO = RespuestaFormulario._meta.get_field('valor_texto').max_length
+LIMITE_NUMERO = Decimal(10) ** 14
+
+
+def aplanar_respuestas(respuestas):
+    """Filas (seccion, pregunta, valor_texto, valor_bool, valor_numero) de un formulario."""
+    filas = []
+    if not isinstance(respuestas, dict):
+        return filas
+    for seccion, preguntas in respuestas.items():
+        if not isinstance(preguntas, dict):
+            continue
+        for pregunta, valor in preguntas.items():
+            filas.append((str(seccion), str(pregunta), *normalizar_valor(valor)))
+    return filas
+
+
+def normalizar_valor(valor):
+    """(texto en minúsculas, booleano, número) de un valor de respuesta."""
+    texto = str(valor).lower()[:LARGO_TEXTO]
+    if isinstance(valor, bool):
+        return texto, valor, None
+    numero = None
+    if isinstance(valor, (int, float)):
+        try:
+            numero = Decimal(str(valor)).quantize(Decimal('0.000001'))
+        except InvalidOperation:
+            pass
+        # NaN, infinitos o valores que no entran en la columna quedan solo como texto
+        if numero is not None and (not numero.is_finite() or abs(numero) >= LIMITE_NUMERO):
+            numero = None
+    return texto, None, numero
+
+
+def indexar_visitas(visitas, batch_size=1000):
+    """Regenera las respuestas indexadas de las visitas indicadas (instancias o filas con
+    `id` y `formulario_respuestas`). Devuelve la cantidad de respuestas escritas."""
+    visitas = list(visitas)
+    filas = [
+        RespuestaFormulario(
+            visita_id=visita.id,
+            seccion=seccion,
+            pregunta=pregunta,
+            valor_texto=texto,
+            valor_bool=booleano,
+            valor_numero=numero,
+        )
+        for visita in visitas
+        for seccion, pregunta, texto, booleano, numero in aplanar_respuestas(visita.formulario_respuestas)
+    ]
+    with transaction.atomic():
+        RespuestaFormulario.objects.filter(visita_id__in=[visita.id for visita in visitas]).delete()
+        RespuestaFormulario.objects.bulk_create(filas, batch_size=batch_size)
+    return len(filas)
+
+
+def filtro_respuesta(pregunta, valor_esperado):
+    """Q sobre RespuestaFormulario que replica la comparación del reporte de filtros.
+
+    Las respuestas booleanas se comparan contra el valor interpretado como
+    verdadero/falso; el resto, como texto sin distinguir mayúsculas.
+    """
+    esperado = valor_esperado.lower()
+    return Q(pregunta=pregunta) & (
+        Q(valor_bool=esperado in VALORES_VERDADEROS)
+        | Q(valor_bool__isnull=True, valor_texto=esperado[:LARGO_TEXTO])
+    )
@@ -0,0 +1,110 @@
+"""Mantenimiento del cubo FrecuenciaRespuesta.
+
+Cada celda cuenta visitas e instituciones que dieron una respuesta, por tipo de
+institución, comuna y mes. Al guardar un formulario completado se recalculan solo
+las celdas de su (tipo, comuna, mes), a partir de las respuestas indexadas.
+"""
+from datetime import date
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+from .models import VisitaAuditoria, RespuestaFormulario, FrecuenciaRespuesta
+
+CLAVE = ('tipo_institucion', 'comuna', 'mes')
+
+
+def inicio_de_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def mes_siguiente(mes):
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def claves_de_visitas(visita_ids):
+    """Claves (tipo_institucion, comuna, mes) de las visitas con formulario completado."""
+    visita_ids = set(visita_ids)
+    if not visita_ids:
+        return set()
+    return {
+        (tipo, comuna, inicio_de_mes(fecha))
+        for tipo, comuna, fecha in VisitaAuditoria.objects.filter(id__in=visita_ids, formulario_completado=True)
+        .order_by()
+        .values_list('institucion__tipo', 'institucion__comuna', 'fecha')
+    }
+
+
+def programar_refresco(visita_ids=(), claves=()):
+    """Refresca las celdas afectadas cuando se confirma la transacción en curso."""
+    claves = set(claves) | claves_de_visitas(visita_ids)
+    if claves:
+        transaction.on_commit(lambda: refrescar_frecuencias(claves))
+
+
+def refrescar_frecuencias(claves, batch_size=100):
+    """Recalcula las celdas del cubo de las claves indicadas."""
+    claves = sorted(set(claves), key=lambda clave: (clave[0], clave[1] or '', clave[2]))
+    for i in range(0, len(claves), batch_size):
+        lote = claves[i:i + batch_size]
+        respuestas = RespuestaFormulario.objects.filter(
+            reduce(or_, (
+                Q(
+                    visita__institucion__tipo=tipo,
+                    visita__institucion__comuna=comuna,
+                    visita__fecha__gte=mes,
+                    visita__fecha__lt=mes_siguiente(mes),
+                )
+                for tipo, comuna, mes in lote
+            ))
+        )
+        celdas = reduce(or_, (Q(**dict(zip(CLAVE, clave))) for clave in lote))
+        with transaction.atomic():
+            FrecuenciaRespuesta.objects.filter(celdas).delete()
+            FrecuenciaRespuesta.objects.bulk_create(agregar(respuestas), batch_size=500)
+
+
+def reconstruir_frecuencias():
+    """Regenera el cubo completo. Devuelve la cantidad de celdas."""
+    celdas = agregar(RespuestaFormulario.objects.all())
+    with transaction.atomic():
+        FrecuenciaRespuesta.objects.all().delete()
+        FrecuenciaRespuesta.objects.bulk_create(celdas, batch_size=500)
+    return len(celdas)
+
+
+def agregar(respuestas):
+    """Celdas (sin guardar) para un queryset de respuestas, solo de formularios completados.
+
+    Una consulta agrupa por valor y otra calcula los totales por pregunta (valor nulo).
+    """
+    respuestas = respuestas.filter(visita__formulario_completado=True).order_by()
+    dimensiones = {
+        'tipo_institucion': F('visita__institucion__tipo'),
+        'comuna': F('visita__institucion__comuna'),
+        'mes': TruncMonth('visita__fecha'),
+    }
+    conteos = {
+        'cantidad_visitas': Count('visita_id', distinct=True),
+        'cantidad_instituciones': Count('visita__institucion_id', distinct=True),
+    }
+
+    celdas = []
+    for valores in (
+        respuestas.values('seccion', 'pregunta', **dimensiones, valor=F('valor_texto')).annotate(**conteos),
+        respuestas.values('seccion', 'pregunta', **dimensiones).annotate(**conteos),
+    ):
+        for fila in valores:
+            celdas.append(FrecuenciaRespuesta(
+                tipo_institucion=fila['tipo_institucion'],
+                comuna=fila['comuna'],
+                mes=fila['mes'],
+                seccion=fila['seccion'],
+                pregunta=fila['pregunta'],
+                valor=fila.get('valor'),
+                visitas=fila['cantidad_visitas'],
+                instituciones=fila['cantidad_instituciones'],
+            ))
+    return celdas
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from auditoria.models import TrabajoReporte
+from auditoria.trabajos import TIMEOUT_TRABAJO, ejecutar
+
+
+class Command(BaseCommand):
+    help = "Ejecuta los trabajos de reportes pendientes y reintenta los abandonados"
+
+    def handle(self, *args, **options):
+        reintentados = TrabajoReporte.objects.filter(
+            estado="ejecutando", iniciado__lt=timezone.now() - TIMEOUT_TRABAJO
+        ).update(estado="pendiente", iniciado=None)
+        if reintentados:
+            self.stdout.write(f"Trabajos abandonados a reintentar: {reintentados}")
+
+        ids = list(TrabajoReporte.objects.filter(estado="pendiente").order_by("creado").values_list("id", flat=True))
+        for trabajo_id in ids:
+            ejecutar(trabajo_id)
+            trabajo = TrabajoReporte.objects.get(pk=trabajo_id)
+            self.stdout.write(f"  #{trabajo_id} {trabajo.get_tipo_display()}: {trabajo.estado}")
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {len(ids)} trabajos ejecutados."))
@@ -0,0 +1,59 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from auditoria.columnar import exportar_mes, meses_a_exportar
+
+
+class Command(BaseCommand):
+    help = "Exporta los hechos nutricionales por plato a Parquet, particionados por mes (requiere pyarrow)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("destino", type=str, help="Directorio de salida")
+        parser.add_argument("--desde", type=str, help="Fecha mínima (YYYY-MM-DD)")
+        parser.add_argument("--hasta", type=str, help="Fecha máxima (YYYY-MM-DD)")
+        parser.add_argument(
+            "--reescribir",
+            action="store_true",
+            help="Vuelve a escribir los meses que ya tienen archivo",
+        )
+        parser.add_argument(
+            "--incluir-mes-actual",
+            action="store_true",
+            help="Exporta también el mes en curso (se reescribe en cada corrida)",
+        )
+        parser.add_argument("--filas-por-grupo", type=int, default=100_000, help="Filas por row group")
+        parser.add_argument("--compresion", choices=["snappy", "zstd", "gzip", "none"], default="snappy")
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options["desde"]) if options["desde"] else None
+            hasta = date.fromisoformat(options["hasta"]) if options["hasta"] else None
+        except ValueError as e:
+            raise CommandError(f"Fecha inválida: {e}")
+
+        meses = meses_a_exportar(
+            options["destino"],
+            desde,
+            hasta,
+            reescribir=options["reescribir"],
+            incluir_mes_actual=options["incluir_mes_actual"],
+        )
+        if not meses:
+            self.stdout.write("No hay meses nuevos para exportar.")
+            return
+
+        total = 0
+        for mes in meses:
+            try:
+                filas = exportar_mes(
+                    options["destino"],
+                    mes,
+                    filas_por_grupo=options["filas_por_grupo"],
+                    compresion=options["compresion"],
+                )
+            except ImportError as e:
+                raise CommandError(str(e))
+            total += filas
+            self.stdout.write(f"  {mes:%Y-%m}: {filas} platos")
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} platos exportados en {len(meses)} meses."))
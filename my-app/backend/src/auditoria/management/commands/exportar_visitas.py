@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from auditoria.exportacion import FORMATOS, exportar, filtrar_visitas
+
+
+class Command(BaseCommand):
+    help = "Exporta visitas, platos e ingredientes con sus totales a CSV o JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=FORMATOS, default="csv")
+        parser.add_argument("--salida", type=str, help="Archivo de salida; por defecto la salida estándar")
+        parser.add_argument("--desde", type=str, help="Fecha mínima (YYYY-MM-DD)")
+        parser.add_argument("--hasta", type=str, help="Fecha máxima (YYYY-MM-DD)")
+        parser.add_argument(
+            "--institucion",
+            type=int,
+            action="append",
+            dest="instituciones",
+            help="Solo visitas de esta institución (se puede repetir)",
+        )
+        parser.add_argument("--tipo-comida", type=str, dest="tipo_comida")
+        parser.add_argument("--lote", type=int, default=500, help="Visitas por lote")
+
+    def handle(self, *args, **options):
+        try:
+            visitas = filtrar_visitas(
+                fecha_inicio=options["desde"],
+                fecha_fin=options["hasta"],
+                institucion_ids=options["instituciones"],
+                tipo_comida=options["tipo_comida"],
+            )
+        except ValueError as e:
+            raise CommandError(f"Fecha inválida: {e}")
+
+        salida = open(options["salida"], "w", newline="", encoding="utf-8") if options["salida"] else sys.stdout
+        try:
+            for linea in exportar(visitas, options["formato"], options["lote"]):
+                salida.write(linea)
+        finally:
+            if options["salida"]:
+                salida.close()
+
+        if options["salida"]:
+            self.stdout.write(self.style.SUCCESS(f"✓ Exportación guardada en {options['salida']}"))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from auditoria.models import VisitaAuditoria
+from auditoria.formularios import indexar_visitas
+from auditoria.frecuencias import reconstruir_frecuencias
+from auditoria.nutrientes import lotes
+
+
+class Command(BaseCommand):
+    help = "Regenera el índice de respuestas de formulario y el cubo de frecuencias desde las visitas"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--institucion",
+            type=int,
+            action="append",
+            dest="instituciones",
+            help="Solo visitas de esta institución (se puede repetir)",
+        )
+        parser.add_argument("--lote", type=int, default=500, help="Visitas por lote")
+
+    def handle(self, *args, **options):
+        queryset = VisitaAuditoria.objects.order_by()
+        if options["instituciones"]:
+            queryset = queryset.filter(institucion_id__in=options["instituciones"])
+
+        total = queryset.count()
+        self.stdout.write(f"Visitas a indexar: {total}")
+
+        procesadas = respuestas = 0
+        inicio = time.monotonic()
+        for primer_id, ultimo_id, cantidad in lotes(queryset, options["lote"]):
+            visitas = queryset.filter(id__gte=primer_id, id__lte=ultimo_id).only("id", "formulario_respuestas")
+            respuestas += indexar_visitas(visitas)
+            procesadas += cantidad
+            transcurrido = time.monotonic() - inicio
+            self.stdout.write(
+                f"  {procesadas}/{total} - {procesadas / transcurrido if transcurrido else 0:.0f} visitas/s"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Indexadas {respuestas} respuestas de {procesadas} visitas."))
+
+        celdas = reconstruir_frecuencias()
+        self.stdout.write(self.style.SUCCESS(f"✓ Cubo de frecuencias regenerado: {celdas} celdas."))
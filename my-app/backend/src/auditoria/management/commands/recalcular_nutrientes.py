@@ -0,0 +1,187 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from nutricion.matriz import CAMPOS_TOTAL
+from auditoria.nutrientes import recalcular_platos, diferencias_platos, queryset_platos, lotes
+
+
+def procesar_lote(filtros, primer_id, ultimo_id, dry_run, max_ids):
+    """Recalcula (o compara, en dry-run) los platos de un rango de ids."""
+    platos = (
+        queryset_platos(filtros)
+        .filter(id__gte=primer_id, id__lte=ultimo_id)
+        .only('id', *CAMPOS_TOTAL)
+    )
+    if dry_run:
+        # recalcular_platos reescribe también las visitas anteriores a hoy
+        diferencias = diferencias_platos(platos, refrescar_historico=True)
+        return {
+            'ultimo_id': ultimo_id,
+            'platos_distintos': len(diferencias['platos']),
+            'ids_platos': [plato.id for plato in diferencias['platos'][:max_ids]],
+            'ingredientes_distintos': len(diferencias['ingredientes']),
+            'max_diferencia': diferencias['max_diferencia'],
+        }
+    recalcular_platos(platos)
+    return {'ultimo_id': ultimo_id}
+
+
+def inicializar_proceso():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Recalcula aportes de ingredientes y totales nutricionales de los platos en lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--institucion",
+            type=int,
+            action="append",
+            dest="instituciones",
+            help="Solo platos de esta institución (se puede repetir)",
+        )
+        parser.add_argument("--desde", type=str, help="Fecha de visita mínima (YYYY-MM-DD)")
+        parser.add_argument("--hasta", type=str, help="Fecha de visita máxima (YYYY-MM-DD)")
+        parser.add_argument(
+            "--plantillas",
+            action="store_true",
+            help="Recalcula platos plantilla en lugar de platos observados",
+        )
+        parser.add_argument("--lote", type=int, default=1000, help="Platos por lote")
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=1,
+            help="Cantidad de procesos en paralelo (1 = sin paralelismo)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="No escribe: informa cuántos platos e ingredientes cambiarían",
+        )
+        parser.add_argument(
+            "--max-ids",
+            type=int,
+            default=100,
+            help="Cantidad máxima de ids de ejemplo a informar en dry-run",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            help="Archivo donde se guarda el último id procesado",
+        )
+        parser.add_argument(
+            "--reanudar",
+            action="store_true",
+            help="Continúa desde el último id guardado en --checkpoint",
+        )
+
+    def handle(self, *args, **options):
+        filtros = {
+            "plantillas": options["plantillas"],
+            "instituciones": options["instituciones"] or [],
+            "desde": options["desde"],
+            "hasta": options["hasta"],
+        }
+        dry_run = options["dry_run"]
+        checkpoint = options["checkpoint"]
+
+        if options["reanudar"] and not checkpoint:
+            raise CommandError("--reanudar requiere --checkpoint")
+
+        desde_id = 0
+        if options["reanudar"] and os.path.exists(checkpoint):
+            with open(checkpoint, encoding="utf-8") as f:
+                estado = json.load(f)
+            if estado.get("filtros") != filtros:
+                raise CommandError("El checkpoint corresponde a otros filtros")
+            desde_id = estado["ultimo_id"]
+            self.stdout.write(self.style.NOTICE(f"Reanudando desde el id {desde_id}"))
+
+        queryset = queryset_platos(filtros)
+        total = queryset.filter(id__gt=desde_id).count()
+        self.stdout.write(f"Platos a procesar: {total}")
+
+        resumen = {"platos_distintos": 0, "ids_platos": [], "ingredientes_distintos": 0, "max_diferencia": {}}
+        procesados = 0
+        inicio = time.monotonic()
+
+        # Rangos en vuelo, en orden: el checkpoint solo avanza sobre rangos contiguos terminados
+        pendientes = deque()
+        terminados = set()
+
+        def registrar(rango, resultado):
+            nonlocal procesados
+            procesados += rango[2]
+            terminados.add(rango)
+            if dry_run:
+                resumen["platos_distintos"] += resultado["platos_distintos"]
+                faltan = options["max_ids"] - len(resumen["ids_platos"])
+                resumen["ids_platos"].extend(resultado["ids_platos"][:max(faltan, 0)])
+                resumen["ingredientes_distintos"] += resultado["ingredientes_distintos"]
+                for campo, diferencia in resultado["max_diferencia"].items():
+                    resumen["max_diferencia"][campo] = max(resumen["max_diferencia"].get(campo, 0), diferencia)
+
+            ultimo_id = None
+            while pendientes and pendientes[0] in terminados:
+                terminados.discard(pendientes[0])
+                ultimo_id = pendientes.popleft()[1]
+            if ultimo_id is not None and checkpoint and not dry_run:
+                self._guardar_checkpoint(checkpoint, filtros, ultimo_id)
+
+            transcurrido = time.monotonic() - inicio
+            porcentaje = procesados * 100 / total if total else 100
+            self.stdout.write(
+                f"  {procesados}/{total} ({porcentaje:.1f}%) - "
+                f"{procesados / transcurrido if transcurrido else 0:.0f} platos/s"
+            )
+
+        if options["procesos"] > 1:
+            # Los procesos hijos abren sus propias conexiones
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options["procesos"], initializer=inicializar_proceso
+            ) as pool:
+                en_vuelo = {}
+                for rango in lotes(queryset, options["lote"], desde_id):
+                    pendientes.append(rango)
+                    futuro = pool.submit(procesar_lote, filtros, rango[0], rango[1], dry_run, options["max_ids"])
+                    en_vuelo[futuro] = rango
+                    if len(en_vuelo) >= options["procesos"] * 2:
+                        hechos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                        for futuro in hechos:
+                            registrar(en_vuelo.pop(futuro), futuro.result())
+                for futuro in wait(en_vuelo).done:
+                    registrar(en_vuelo.pop(futuro), futuro.result())
+        else:
+            for rango in lotes(queryset, options["lote"], desde_id):
+                pendientes.append(rango)
+                registrar(rango, procesar_lote(filtros, rango[0], rango[1], dry_run, options["max_ids"]))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("Dry-run: no se escribió ningún cambio."))
+            self.stdout.write(f"  Platos que cambiarían: {resumen['platos_distintos']}")
+            self.stdout.write(f"  Ingredientes que cambiarían: {resumen['ingredientes_distintos']}")
+            for campo, diferencia in sorted(resumen["max_diferencia"].items()):
+                self.stdout.write(f"    {campo}: diferencia máxima {diferencia}")
+            if options["verbosity"] > 1 and resumen["ids_platos"]:
+                self.stdout.write(f"  Ids (hasta {options['max_ids']}): {sorted(resumen['ids_platos'])}")
+            return
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f"✓ Recalculados {procesados} platos."))
+
+    def _guardar_checkpoint(self, checkpoint, filtros, ultimo_id):
+        temporal = f"{checkpoint}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"filtros": filtros, "ultimo_id": ultimo_id}, f)
+        os.replace(temporal, checkpoint)
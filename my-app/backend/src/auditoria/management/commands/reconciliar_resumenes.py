@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from auditoria.models import VisitaAuditoria, ResumenDiario
+from auditoria.resumenes import reconciliar
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla de resúmenes diarios desde las visitas (pensado para correr cada noche)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=str, help="Fecha mínima (YYYY-MM-DD); por defecto la primera visita")
+        parser.add_argument("--hasta", type=str, help="Fecha máxima (YYYY-MM-DD); por defecto la última visita")
+        parser.add_argument("--dias", type=int, default=31, help="Días por lote")
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options["desde"]) if options["desde"] else None
+            hasta = date.fromisoformat(options["hasta"]) if options["hasta"] else None
+        except ValueError as e:
+            raise CommandError(f"Fecha inválida: {e}")
+
+        if desde is None or hasta is None:
+            # Se incluyen las fechas con resúmenes sin visitas, para borrarlos
+            limites = [
+                VisitaAuditoria.objects.aggregate(minima=Min("fecha"), maxima=Max("fecha")),
+                ResumenDiario.objects.aggregate(minima=Min("fecha"), maxima=Max("fecha")),
+            ]
+            minimas = [l["minima"] for l in limites if l["minima"]]
+            maximas = [l["maxima"] for l in limites if l["maxima"]]
+            if not minimas:
+                self.stdout.write("No hay visitas ni resúmenes.")
+                return
+            desde = desde or min(minimas)
+            hasta = hasta or max(maximas)
+
+        escritas = borradas = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=options["dias"] - 1), hasta)
+            n_escritas, n_borradas = reconciliar(inicio, fin)
+            escritas += n_escritas
+            borradas += n_borradas
+            self.stdout.write(f"  {inicio} a {fin}: {n_escritas} resúmenes, {n_borradas} borrados")
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {escritas} resúmenes reconciliados, {borradas} borrados."))
@@ -0,0 +1,242 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from decimal import Decimal, InvalidOperation
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from nutricion.matriz import CAMPOS_APORTE, CAMPOS_TOTAL
+from core.cache import marcar_modificados
+from auditoria.models import VisitaAuditoria, PlatoPlantilla, CAMPOS_VISITA
+from auditoria.nutrientes import (
+    INGREDIENTES_DE, TAG_PLANTILLAS, diferencias_platos, diferencias_visitas, queryset_platos, lotes,
+    recalcular_visitas,
+)
+
+
+# Las visitas van después de los platos: se comparan con los totales ya reparados
+TABLAS = {
+    "platos": {"plantillas": False},
+    "plantillas": {"plantillas": True},
+    "visitas": {"visitas": True},
+}
+
+
+def queryset_tabla(filtros):
+    if filtros.get("visitas"):
+        return VisitaAuditoria.objects.order_by()
+    return queryset_platos(filtros)
+
+
+def verificar_lote(filtros, primer_id, ultimo_id, tolerancia, reparar, max_ids):
+    """Compara totales y aportes guardados de un rango de ids; opcionalmente los corrige."""
+    if filtros.get("visitas"):
+        return verificar_lote_visitas(primer_id, ultimo_id, tolerancia, reparar, max_ids)
+    platos = list(
+        queryset_platos(filtros)
+        .filter(id__gte=primer_id, id__lte=ultimo_id)
+        .only('id', *CAMPOS_TOTAL)
+    )
+    diferencias = diferencias_platos(platos, Decimal(tolerancia))
+
+    if reparar and (diferencias["platos"] or diferencias["ingredientes"]):
+        modelo = type(platos[0])
+        with transaction.atomic():
+            INGREDIENTES_DE[modelo][0].objects.bulk_update(diferencias["ingredientes"], CAMPOS_APORTE, batch_size=500)
+            modelo.objects.bulk_update(diferencias["platos"], CAMPOS_TOTAL, batch_size=500)
+        if modelo is PlatoPlantilla:
+            # bulk_update no dispara señales
+            marcar_modificados(TAG_PLANTILLAS)
+        recalcular_visitas(diferencias["platos"])
+
+    return {
+        "platos_revisados": len(platos),
+        "ingredientes_revisados": diferencias["ingredientes_revisados"],
+        "platos_inconsistentes": len(diferencias["platos"]),
+        "ingredientes_inconsistentes": len(diferencias["ingredientes"]),
+        "ids_platos": [plato.id for plato in diferencias["platos"][:max_ids]],
+        "max_diferencia": {campo: str(valor) for campo, valor in diferencias["max_diferencia"].items()},
+    }
+
+
+def verificar_lote_visitas(primer_id, ultimo_id, tolerancia, reparar, max_ids):
+    """Compara los totales materializados de un rango de visitas con sus platos."""
+    visitas = list(
+        VisitaAuditoria.objects.order_by()
+        .filter(id__gte=primer_id, id__lte=ultimo_id)
+        .only('id', *CAMPOS_VISITA)
+    )
+    diferencias = diferencias_visitas(visitas, Decimal(tolerancia))
+
+    if reparar and diferencias["visitas"]:
+        VisitaAuditoria.recalcular_totales_de([visita.id for visita in diferencias["visitas"]])
+
+    return {
+        "visitas_revisadas": len(visitas),
+        "visitas_inconsistentes": len(diferencias["visitas"]),
+        "ids_visitas": [visita.id for visita in diferencias["visitas"][:max_ids]],
+        "max_diferencia": {campo: str(valor) for campo, valor in diferencias["max_diferencia"].items()},
+    }
+
+
+def inicializar_proceso():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica que los aportes coincidan con el catálogo de alimentos (salvo en las visitas "
+        "anteriores a hoy, congeladas) y que los totales de platos y visitas sean la suma de lo guardado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tabla",
+            choices=sorted(TABLAS),
+            action="append",
+            dest="tablas",
+            help="Tabla a verificar (se puede repetir; por defecto todas)",
+        )
+        parser.add_argument(
+            "--tolerancia",
+            type=str,
+            default="0.01",
+            help="Diferencia máxima aceptada por campo",
+        )
+        parser.add_argument(
+            "--reparar",
+            action="store_true",
+            help="Corrige los platos, ingredientes y visitas inconsistentes",
+        )
+        parser.add_argument("--lote", type=int, default=1000, help="Platos por lote")
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=1,
+            help="Cantidad de procesos en paralelo (1 = sin paralelismo)",
+        )
+        parser.add_argument(
+            "--max-ids",
+            type=int,
+            default=100,
+            help="Cantidad máxima de ids de ejemplo a informar por tabla",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Imprime solo el resumen en JSON (el progreso va a stderr)",
+        )
+        parser.add_argument(
+            "--fallar",
+            action="store_true",
+            help="Termina con error si se encuentran inconsistencias",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tolerancia = Decimal(options["tolerancia"])
+        except InvalidOperation:
+            raise CommandError(f"Tolerancia inválida: {options['tolerancia']}")
+
+        progreso = self.stderr if options["json"] else self.stdout
+        inicio = time.monotonic()
+        resumen = {
+            "tolerancia": str(tolerancia),
+            "reparado": options["reparar"],
+            "tablas": {},
+        }
+
+        if options["procesos"] > 1:
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=options["procesos"], initializer=inicializar_proceso)
+        else:
+            pool = None
+
+        try:
+            for tabla in options["tablas"] or sorted(TABLAS):
+                progreso.write(f"Verificando {tabla}...")
+                resumen["tablas"][tabla] = self._verificar(tabla, tolerancia, options, pool, progreso)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        resumen["duracion_s"] = round(time.monotonic() - inicio, 3)
+        inconsistentes = sum(
+            valor for datos in resumen["tablas"].values()
+            for clave, valor in datos.items() if clave.endswith("_inconsistentes")
+        )
+        resumen["inconsistentes"] = inconsistentes
+
+        if options["json"]:
+            self.stdout.write(json.dumps(resumen, ensure_ascii=False))
+        else:
+            for tabla, datos in resumen["tablas"].items():
+                if tabla == "visitas":
+                    self.stdout.write(
+                        f"  {tabla}: {datos['visitas_inconsistentes']}/{datos['visitas_revisadas']} visitas inconsistentes"
+                    )
+                else:
+                    self.stdout.write(
+                        f"  {tabla}: {datos['platos_inconsistentes']}/{datos['platos_revisados']} platos y "
+                        f"{datos['ingredientes_inconsistentes']}/{datos['ingredientes_revisados']} ingredientes inconsistentes"
+                    )
+                for campo, diferencia in sorted(datos["max_diferencia"].items()):
+                    self.stdout.write(f"    {campo}: diferencia máxima {diferencia}")
+            estilo = self.style.WARNING if inconsistentes else self.style.SUCCESS
+            self.stdout.write(estilo(f"Inconsistencias: {inconsistentes}" + (" (reparadas)" if options["reparar"] else "")))
+
+        if inconsistentes and options["fallar"] and not options["reparar"]:
+            raise CommandError(f"Se encontraron {inconsistentes} inconsistencias")
+
+    def _verificar(self, tabla, tolerancia, options, pool, progreso):
+        filtros = TABLAS[tabla]
+        queryset = queryset_tabla(filtros)
+        total = queryset.count()
+        if filtros.get("visitas"):
+            datos = {"visitas_revisadas": 0, "visitas_inconsistentes": 0, "ids_visitas": []}
+            revisados, unidad = "visitas_revisadas", "visitas revisadas"
+        else:
+            datos = {
+                "platos_revisados": 0,
+                "ingredientes_revisados": 0,
+                "platos_inconsistentes": 0,
+                "ingredientes_inconsistentes": 0,
+                "ids_platos": [],
+            }
+            revisados, unidad = "platos_revisados", "platos revisados"
+        datos["max_diferencia"] = {}
+
+        def acumular(resultado):
+            for clave, valor in resultado.items():
+                if clave == "max_diferencia":
+                    continue
+                if clave.startswith("ids_"):
+                    faltan = options["max_ids"] - len(datos[clave])
+                    datos[clave].extend(valor[:max(faltan, 0)])
+                else:
+                    datos[clave] += valor
+            for campo, diferencia in resultado["max_diferencia"].items():
+                actual = datos["max_diferencia"].get(campo)
+                if actual is None or Decimal(diferencia) > Decimal(actual):
+                    datos["max_diferencia"][campo] = diferencia
+            progreso.write(f"  {datos[revisados]}/{total} {unidad}")
+
+        argumentos = (str(tolerancia), options["reparar"], options["max_ids"])
+        if pool:
+            # Se mantienen pocos lotes en vuelo para acotar la memoria
+            en_vuelo = set()
+            for primer_id, ultimo_id, _ in lotes(queryset, options["lote"]):
+                en_vuelo.add(pool.submit(verificar_lote, filtros, primer_id, ultimo_id, *argumentos))
+                if len(en_vuelo) >= options["procesos"] * 2:
+                    hechos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for futuro in hechos:
+                        acumular(futuro.result())
+            for futuro in wait(en_vuelo).done:
+                acumular(futuro.result())
+        else:
+            for primer_id, ultimo_id, _ in lotes(queryset, options["lote"]):
+                acumular(verificar_lote(filtros, primer_id, ultimo_id, *argumentos))
+
+        return datos
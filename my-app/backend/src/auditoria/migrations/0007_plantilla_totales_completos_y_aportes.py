@@ -0,0 +1,172 @@
+# Generated by Django 5.0.14 on 2026-10-18 18:46
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def calcular_aportes_plantillas(apps, schema_editor):
+    """Completa aportes por ingrediente y los 16 totales de las plantillas existentes."""
+    from nutricion.matriz import NUTRIENTES, CAMPOS_APORTE
+
+    PlatoPlantilla = apps.get_model('auditoria', 'PlatoPlantilla')
+    IngredientePlantilla = apps.get_model('auditoria', 'IngredientePlantilla')
+
+    totales = {}
+    ingredientes = list(IngredientePlantilla.objects.select_related('alimento'))
+    for ing in ingredientes:
+        factor = (ing.cantidad or 0) / Decimal("100")
+        suma = totales.setdefault(ing.plato_plantilla_id, {campo: Decimal("0") for campo in CAMPOS_APORTE})
+        for campo, fuentes in NUTRIENTES:
+            valor = next((getattr(ing.alimento, f) for f in fuentes if getattr(ing.alimento, f) is not None), 0)
+            setattr(ing, campo, factor * valor)
+            suma[campo] += factor * valor
+    IngredientePlantilla.objects.bulk_update(ingredientes, CAMPOS_APORTE, batch_size=500)
+
+    plantillas = list(PlatoPlantilla.objects.all())
+    for plantilla in plantillas:
+        suma = totales.get(plantilla.id, {})
+        for campo in CAMPOS_APORTE:
+            setattr(plantilla, f'{campo}_total', suma.get(campo, Decimal("0")))
+    PlatoPlantilla.objects.bulk_update(plantillas, [f'{campo}_total' for campo in CAMPOS_APORTE], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0006_platoobservado_imagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='agua_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='calcio_mg',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='carbohidratos_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='energia_kcal',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='fibra_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='fosforo_mg',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='grasas_monoinsat_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='grasas_poliinsat_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='grasas_saturadas_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='grasas_totales_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='hierro_mg',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='potasio_mg',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='proteinas_g',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='sodio_mg',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='vitamina_c_mg',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredienteplantilla',
+            name='zinc_mg',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='agua_g_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='calcio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='fosforo_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='grasas_monoinsat_g_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='grasas_poliinsat_g_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='grasas_saturadas_g_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='hierro_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='potasio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='vitamina_c_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='platoplantilla',
+            name='zinc_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.RunPython(calcular_aportes_plantillas, migrations.RunPython.noop),
+    ]
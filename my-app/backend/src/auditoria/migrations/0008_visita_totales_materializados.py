@@ -0,0 +1,213 @@
+# Generated by Django 5.0.14 on 2026-10-18 18:55
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def calcular_totales_visitas(apps, schema_editor):
+    """Materializa cantidad de platos y totales nutricionales de las visitas existentes."""
+    from nutricion.matriz import CAMPOS_APORTE
+
+    VisitaAuditoria = apps.get_model('auditoria', 'VisitaAuditoria')
+    PlatoObservado = apps.get_model('auditoria', 'PlatoObservado')
+
+    # Alias con prefijo para no chocar con los campos del plato que se suman
+    agregados = {
+        'suma_cantidad_platos': Count('id'),
+        'suma_porciones_servidas_total': Sum('porciones_servidas'),
+    }
+    for campo in CAMPOS_APORTE:
+        agregados[f'suma_{campo}_total'] = Sum(f'{campo}_total')
+        agregados[f'suma_{campo}_servido'] = Sum(
+            F(f'{campo}_total') * F('porciones_servidas'), output_field=models.DecimalField()
+        )
+
+    visitas = []
+    for fila in PlatoObservado.objects.order_by().values('visita_id').annotate(**agregados):
+        visita = VisitaAuditoria(id=fila.pop('visita_id'))
+        for campo, valor in fila.items():
+            setattr(visita, campo.removeprefix('suma_'), valor or 0)
+        visitas.append(visita)
+    campos = [campo.removeprefix('suma_') for campo in agregados]
+    VisitaAuditoria.objects.bulk_update(visitas, campos, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0007_plantilla_totales_completos_y_aportes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='agua_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='agua_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='calcio_mg_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='calcio_mg_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='cantidad_platos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='carbohidratos_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='carbohidratos_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='energia_kcal_servido',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='energia_kcal_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='fibra_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='fibra_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='fosforo_mg_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='fosforo_mg_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_monoinsat_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_monoinsat_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_poliinsat_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_poliinsat_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_saturadas_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_saturadas_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_totales_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='grasas_totales_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='hierro_mg_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='hierro_mg_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='porciones_servidas_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='potasio_mg_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='potasio_mg_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='proteinas_g_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='proteinas_g_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='sodio_mg_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='sodio_mg_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='vitamina_c_mg_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='vitamina_c_mg_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='zinc_mg_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='zinc_mg_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=14),
+        ),
+        migrations.RunPython(calcular_totales_visitas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.0.14 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def calcular_resumenes(apps, schema_editor):
+    """Genera los resúmenes diarios a partir de las visitas existentes."""
+    from nutricion.matriz import CAMPOS_APORTE
+
+    VisitaAuditoria = apps.get_model('auditoria', 'VisitaAuditoria')
+    PlatoObservado = apps.get_model('auditoria', 'PlatoObservado')
+    ResumenDiario = apps.get_model('auditoria', 'ResumenDiario')
+    clave = ('institucion_id', 'fecha', 'tipo_comida')
+
+    resumenes = {}
+    for fila in VisitaAuditoria.objects.order_by().values(*clave).annotate(
+        suma_cantidad_visitas=Count('id'),
+        suma_cantidad_platos=Sum('cantidad_platos'),
+        suma_porciones_servidas=Sum('porciones_servidas_total'),
+        **{f'suma_{campo}_suma': Sum(f'{campo}_total') for campo in CAMPOS_APORTE},
+    ):
+        resumenes[tuple(fila[c] for c in clave)] = ResumenDiario(
+            **{c: fila[c] for c in clave},
+            **{campo.removeprefix('suma_'): valor or 0 for campo, valor in fila.items() if campo.startswith('suma_')},
+        )
+
+    for fila in PlatoObservado.objects.order_by().values(*(f'visita__{c}' for c in clave)).annotate(
+        **{
+            f'{campo}_suma_cuadrados': Sum(F(f'{campo}_total') * F(f'{campo}_total'), output_field=models.DecimalField())
+            for campo in CAMPOS_APORTE
+        }
+    ):
+        resumen = resumenes[tuple(fila.pop(f'visita__{c}') for c in clave)]
+        for campo, valor in fila.items():
+            setattr(resumen, campo, valor or 0)
+
+    ResumenDiario.objects.bulk_create(resumenes.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0008_visita_totales_materializados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo_comida', models.CharField(choices=[('desayuno', 'Desayuno'), ('almuerzo', 'Almuerzo'), ('merienda', 'Merienda'), ('cena', 'Cena'), ('vianda', 'Vianda')], max_length=20)),
+                ('cantidad_visitas', models.IntegerField(default=0)),
+                ('cantidad_platos', models.IntegerField(default=0)),
+                ('porciones_servidas', models.IntegerField(default=0)),
+                ('energia_kcal_suma', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('proteinas_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('grasas_totales_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('carbohidratos_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('agua_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('fibra_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('sodio_mg_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('calcio_mg_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('hierro_mg_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('zinc_mg_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('vitamina_c_mg_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('potasio_mg_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('fosforo_mg_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('grasas_saturadas_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('grasas_monoinsat_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('grasas_poliinsat_g_suma', models.DecimalField(decimal_places=3, default=0, max_digits=16)),
+                ('energia_kcal_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('proteinas_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('grasas_totales_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('carbohidratos_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('agua_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('fibra_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('sodio_mg_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('calcio_mg_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('hierro_mg_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('zinc_mg_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('vitamina_c_mg_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('potasio_mg_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('fosforo_mg_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('grasas_saturadas_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('grasas_monoinsat_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('grasas_poliinsat_g_suma_cuadrados', models.DecimalField(decimal_places=3, default=0, max_digits=24)),
+                ('institucion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='auditoria.institucion')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario',
+                'verbose_name_plural': 'Resúmenes diarios',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='auditoria_r_fecha_2c7cab_idx'), models.Index(fields=['tipo_comida', 'fecha'], name='auditoria_r_tipo_co_d1c718_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(fields=('institucion', 'fecha', 'tipo_comida'), name='resumen_diario_unico'),
+        ),
+        migrations.RunPython(calcular_resumenes, migrations.RunPython.noop),
+    ]
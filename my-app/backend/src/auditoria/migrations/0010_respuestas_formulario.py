@@ -0,0 +1,58 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def indexar_respuestas(apps, schema_editor):
+    """Indexa las respuestas de los formularios ya cargados."""
+    from auditoria.formularios import aplanar_respuestas
+
+    VisitaAuditoria = apps.get_model('auditoria', 'VisitaAuditoria')
+    RespuestaFormulario = apps.get_model('auditoria', 'RespuestaFormulario')
+
+    filas = []
+    visitas = VisitaAuditoria.objects.filter(formulario_respuestas__isnull=False).only('id', 'formulario_respuestas')
+    for visita in visitas.iterator(chunk_size=500):
+        for seccion, pregunta, texto, booleano, numero in aplanar_respuestas(visita.formulario_respuestas):
+            filas.append(RespuestaFormulario(
+                visita_id=visita.id,
+                seccion=seccion,
+                pregunta=pregunta,
+                valor_texto=texto,
+                valor_bool=booleano,
+                valor_numero=numero,
+            ))
+        if len(filas) >= 5000:
+            RespuestaFormulario.objects.bulk_create(filas)
+            filas = []
+    RespuestaFormulario.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0009_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespuestaFormulario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seccion', models.CharField(max_length=255)),
+                ('pregunta', models.CharField(max_length=255)),
+                ('valor_texto', models.CharField(blank=True, max_length=255)),
+                ('valor_bool', models.BooleanField(blank=True, null=True)),
+                ('valor_numero', models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True)),
+                ('visita', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='respuestas', to='auditoria.visitaauditoria')),
+            ],
+            options={
+                'verbose_name': 'Respuesta de formulario',
+                'verbose_name_plural': 'Respuestas de formulario',
+                'ordering': ['visita', 'seccion', 'pregunta'],
+                'indexes': [models.Index(fields=['pregunta', 'valor_texto'], name='auditoria_r_pregunt_1f6d0f_idx'), models.Index(fields=['pregunta', 'valor_bool'], name='auditoria_r_pregunt_02c42d_idx'), models.Index(fields=['visita', 'seccion'], name='auditoria_r_visita__b9c3c8_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_respuestas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:02
+
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+
+
+def calcular_frecuencias(apps, schema_editor):
+    """Genera el cubo de frecuencias desde las respuestas indexadas."""
+    RespuestaFormulario = apps.get_model('auditoria', 'RespuestaFormulario')
+    FrecuenciaRespuesta = apps.get_model('auditoria', 'FrecuenciaRespuesta')
+
+    respuestas = RespuestaFormulario.objects.filter(visita__formulario_completado=True).order_by()
+    dimensiones = {
+        'tipo_institucion': F('visita__institucion__tipo'),
+        'comuna': F('visita__institucion__comuna'),
+        'mes': TruncMonth('visita__fecha'),
+    }
+    conteos = {
+        'cantidad_visitas': Count('visita_id', distinct=True),
+        'cantidad_instituciones': Count('visita__institucion_id', distinct=True),
+    }
+    celdas = []
+    for valores in (
+        respuestas.values('seccion', 'pregunta', **dimensiones, valor=F('valor_texto')).annotate(**conteos),
+        respuestas.values('seccion', 'pregunta', **dimensiones).annotate(**conteos),
+    ):
+        for fila in valores:
+            celdas.append(FrecuenciaRespuesta(
+                tipo_institucion=fila['tipo_institucion'],
+                comuna=fila['comuna'],
+                mes=fila['mes'],
+                seccion=fila['seccion'],
+                pregunta=fila['pregunta'],
+                valor=fila.get('valor'),
+                visitas=fila['cantidad_visitas'],
+                instituciones=fila['cantidad_instituciones'],
+            ))
+    FrecuenciaRespuesta.objects.bulk_create(celdas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0010_respuestas_formulario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrecuenciaRespuesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_institucion', models.CharField(max_length=50)),
+                ('comuna', models.CharField(blank=True, max_length=50, null=True)),
+                ('mes', models.DateField()),
+                ('seccion', models.CharField(max_length=255)),
+                ('pregunta', models.CharField(max_length=255)),
+                ('valor', models.CharField(blank=True, max_length=255, null=True)),
+                ('visitas', models.IntegerField(default=0)),
+                ('instituciones', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Frecuencia de respuesta',
+                'verbose_name_plural': 'Frecuencias de respuestas',
+                'ordering': ['-mes', 'pregunta'],
+                'indexes': [models.Index(fields=['pregunta', 'mes'], name='auditoria_f_pregunt_f4de41_idx'), models.Index(fields=['tipo_institucion', 'comuna', 'mes'], name='auditoria_f_tipo_in_30699c_idx')],
+            },
+        ),
+        migrations.RunPython(calcular_frecuencias, migrations.RunPython.noop),
+    ]
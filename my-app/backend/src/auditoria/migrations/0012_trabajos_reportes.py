@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0011_frecuencia_respuestas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('comparativa_nutricional', 'Comparativa nutricional'), ('instituciones_filtros', 'Instituciones con filtros')], max_length=50)),
+                ('parametros', models.JSONField(default=dict)),
+                ('clave', models.CharField(max_length=64)),
+                ('version', models.CharField(max_length=32)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('ejecutando', 'Ejecutando'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('finalizado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de reporte',
+                'verbose_name_plural': 'Trabajos de reportes',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['clave', 'version'], name='auditoria_t_clave_aecd20_idx'), models.Index(fields=['estado', 'creado'], name='auditoria_t_estado_0ba563_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:42
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def contar_platos_con_totales(apps, schema_editor):
+    """Cuenta los platos con totales calculados de las visitas y de los resúmenes existentes."""
+    from nutricion.matriz import CAMPOS_TOTAL
+
+    VisitaAuditoria = apps.get_model('auditoria', 'VisitaAuditoria')
+    PlatoObservado = apps.get_model('auditoria', 'PlatoObservado')
+    ResumenDiario = apps.get_model('auditoria', 'ResumenDiario')
+    con_totales = Q(**{f'{campo}__isnull': False for campo in CAMPOS_TOTAL})
+
+    visitas = [
+        VisitaAuditoria(id=fila['visita_id'], cantidad_platos_con_totales=fila['n'])
+        for fila in PlatoObservado.objects.filter(con_totales).order_by().values('visita_id').annotate(n=Count('id'))
+    ]
+    VisitaAuditoria.objects.bulk_update(visitas, ['cantidad_platos_con_totales'], batch_size=500)
+
+    clave = ('institucion_id', 'fecha', 'tipo_comida')
+    resumenes = {
+        tuple(fila[c] for c in clave): fila['n']
+        for fila in VisitaAuditoria.objects.order_by().values(*clave).annotate(n=Sum('cantidad_platos_con_totales'))
+    }
+    filas = []
+    for resumen in ResumenDiario.objects.order_by().only('id', *clave):
+        resumen.cantidad_platos_con_totales = resumenes.get(tuple(getattr(resumen, c) for c in clave)) or 0
+        filas.append(resumen)
+    ResumenDiario.objects.bulk_update(filas, ['cantidad_platos_con_totales'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0012_trabajos_reportes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumendiario',
+            name='cantidad_platos_con_totales',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='visitaauditoria',
+            name='cantidad_platos_con_totales',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(contar_platos_con_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,380 @@
+# Generated by Django 5.0.14 on 2026-10-18 19:52
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def _suma(modelo, fk, expresion):
+    return Coalesce(
+        Subquery(
+            modelo.objects.filter(**{fk: OuterRef('pk')})
+            .order_by()
+            .values(fk)
+            .annotate(suma=Sum(expresion, output_field=DecimalField()))
+            .values('suma'),
+            output_field=DecimalField(),
+        ),
+        Value(0),
+        output_field=DecimalField(),
+    )
+
+
+def sumar_aportes_guardados(apps, schema_editor):
+    """Deja los totales de platos y visitas como la suma exacta de los aportes guardados."""
+    from nutricion.matriz import CAMPOS_APORTE
+
+    tablas = [
+        ('PlatoObservado', 'IngredientePlato', 'plato', 'ingredientes'),
+        ('PlatoPlantilla', 'IngredientePlantilla', 'plato_plantilla', 'ingredientes_plantilla'),
+    ]
+    for plato, ingrediente, fk, relacion in tablas:
+        Plato = apps.get_model('auditoria', plato)
+        Ingrediente = apps.get_model('auditoria', ingrediente)
+        # Los platos sin totales o con aportes incompletos se dejan para recalcular_nutrientes
+        con_totales = Q(**{f'{campo}_total__isnull': False for campo in CAMPOS_APORTE})
+        incompletos = Q()
+        for campo in CAMPOS_APORTE:
+            incompletos |= Q(**{f'{relacion}__{campo}__isnull': True})
+        Plato.objects.filter(con_totales).exclude(incompletos).update(**{
+            f'{campo}_total': _suma(Ingrediente, fk, F(campo)) for campo in CAMPOS_APORTE
+        })
+
+    VisitaAuditoria = apps.get_model('auditoria', 'VisitaAuditoria')
+    PlatoObservado = apps.get_model('auditoria', 'PlatoObservado')
+    cambios = {}
+    for campo in CAMPOS_APORTE:
+        cambios[f'{campo}_total'] = _suma(PlatoObservado, 'visita', F(f'{campo}_total'))
+        cambios[f'{campo}_servido'] = _suma(PlatoObservado, 'visita', F(f'{campo}_total') * F('porciones_servidas'))
+    VisitaAuditoria.objects.update(**cambios)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0013_platos_con_totales'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='agua_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='calcio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='carbohidratos_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='energia_kcal_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='fibra_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='fosforo_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='grasas_monoinsat_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='grasas_poliinsat_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='grasas_saturadas_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='grasas_totales_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='hierro_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='potasio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='proteinas_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='sodio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='vitamina_c_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoobservado',
+            name='zinc_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='agua_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='calcio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='carbohidratos_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='energia_kcal_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='fibra_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='fosforo_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='grasas_monoinsat_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='grasas_poliinsat_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='grasas_saturadas_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='grasas_totales_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='hierro_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='potasio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='proteinas_g_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='sodio_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='vitamina_c_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='platoplantilla',
+            name='zinc_mg_total',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=14, null=True),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='agua_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='agua_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='calcio_mg_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='calcio_mg_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='carbohidratos_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='carbohidratos_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='energia_kcal_servido',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='energia_kcal_total',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='fibra_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='fibra_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='fosforo_mg_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='fosforo_mg_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_monoinsat_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_monoinsat_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_poliinsat_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_poliinsat_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_saturadas_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_saturadas_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_totales_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='grasas_totales_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='hierro_mg_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='hierro_mg_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='potasio_mg_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='potasio_mg_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='proteinas_g_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='proteinas_g_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='sodio_mg_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='sodio_mg_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='vitamina_c_mg_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='vitamina_c_mg_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='zinc_mg_servido',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.AlterField(
+            model_name='visitaauditoria',
+            name='zinc_mg_total',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=16),
+        ),
+        migrations.RunPython(sumar_aportes_guardados, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,95 @@
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.db import models
-from decimal import Decimal
+from django.db.models import Count, F, Q, Sum
 from nutricion.models import AlimentoNutricional
+from nutricion.matriz import CAMPOS_APORTE, CAMPOS_TOTAL, obtener_matriz, a_decimales
+
+
+# Claves que devuelve PlatoObservado.recalcular_totales (respuesta de la API)
+CLAVES_RESPUESTA_TOTALES = {
+    'energia_kcal_total': 'energia_total', 'proteinas_g_total': 'prot_total',
+    'grasas_totales_g_total': 'grasa_total', 'carbohidratos_g_total': 'cho_total',
+    'agua_g_total': 'agua_total', 'fibra_g_total': 'fibra_total',
+    'sodio_mg_total': 'sodio_total', 'calcio_mg_total': 'calcio_total',
+    'hierro_mg_total': 'hierro_total', 'zinc_mg_total': 'zinc_total',
+    'vitamina_c_mg_total': 'vitamina_c_total', 'potasio_mg_total': 'potasio_total',
+    'fosforo_mg_total': 'fosforo_total', 'grasas_saturadas_g_total': 'grasas_sat_total',
+    'grasas_monoinsat_g_total': 'grasas_mono_total', 'grasas_poliinsat_g_total': 'grasas_poli_total',
+}
+
+
+# Totales materializados en VisitaAuditoria
+CAMPOS_SERVIDO = tuple(f'{campo}_servido' for campo in CAMPOS_APORTE)
+CAMPOS_VISITA = (
+    'cantidad_platos', 'cantidad_platos_con_totales', 'porciones_servidas_total', *CAMPOS_TOTAL, *CAMPOS_SERVIDO,
+)
+
+# Acumulados de ResumenDiario
+CAMPOS_SUMA = tuple(f'{campo}_suma' for campo in CAMPOS_APORTE)
+CAMPOS_SUMA_CUADRADOS = tuple(f'{campo}_suma_cuadrados' for campo in CAMPOS_APORTE)
+CAMPOS_RESUMEN = (
+    'cantidad_visitas', 'cantidad_platos', 'cantidad_platos_con_totales', 'porciones_servidas',
+    *CAMPOS_SUMA, *CAMPOS_SUMA_CUADRADOS,
+)
+
+# Platos con los totales calculados (los que promedian los reportes)
+CON_TOTALES = Q(**{f'{campo}__isnull': False for campo in CAMPOS_TOTAL})
+
+
+def redondear_aportes(vector):
+    """Aporte (dict campo -> Decimal) de un vector de nutrientes, con los decimales de las columnas.
+
+    Se redondea acá (mitad hacia arriba, como MySQL) y no al guardar: los totales
+    tienen los mismos decimales y son la suma exacta de los aportes guardados, y
+    los deltas son diferencias de valores guardados, sin redondeos que se acumulen.
+    """
+    return {campo: valor.quantize(ESCALAS_APORTE[campo], ROUND_HALF_UP) for campo, valor in a_decimales(vector).items()}
+
+
+def sumar_aportes(aportes):
+    """Totales (dict campo_total -> Decimal) de un plato: la suma de los aportes de sus ingredientes."""
+    totales = dict.fromkeys(CAMPOS_TOTAL, Decimal(0))
+    for aporte in aportes:
+        for campo, valor in aporte.items():
+            totales[f'{campo}_total'] += valor
+    return totales
+
+
+def calcular_totales(filas):
+    """Totales (dict campo_total -> Decimal) para filas (alimento_id, cantidad) de un plato."""
+    alimento_ids = [alimento_id for alimento_id, _ in filas]
+    cantidades = [cantidad for _, cantidad in filas]
+    aportes = obtener_matriz(alimento_ids).aportes(alimento_ids, cantidades)
+    return sumar_aportes(redondear_aportes(vector) for vector in aportes)
+
+
+def vector_aporte(alimento_id, cantidad):
+    """Vector de nutrientes (float) que aporta una cantidad de un alimento."""
+    return obtener_matriz([alimento_id]).aportes([alimento_id], [cantidad])[0]
+
+
+def aporte_guardado(ingrediente):
+    """Aporte persistido del ingrediente (el que suman los totales del plato).
+
+    Si el ingrediente no tiene el aporte completo se calcula desde el catálogo.
+    """
+    aporte = {campo: getattr(ingrediente, campo) for campo in CAMPOS_APORTE}
+    if None in aporte.values():
+        return redondear_aportes(vector_aporte(ingrediente.alimento_id, ingrediente.cantidad))
+    return aporte
+
+
+def aplicar_delta_totales(modelo, plato_id, delta):
+    """Suma un delta (dict campo de aporte -> Decimal) a los totales de un plato con un único UPDATE atómico.
+
+    Los incrementos conmutan, así que dos ediciones concurrentes del mismo plato
+    no se pisan. Devuelve False si el plato no tiene todos sus totales calculados,
+    en cuyo caso hay que recalcular completo.
+    """
+    cambios = {f'{campo}_total': F(f'{campo}_total') + valor for campo, valor in delta.items()}
+    sin_nulos = {f'{campo}__isnull': False for campo in CAMPOS_TOTAL}
+    return modelo.objects.filter(pk=plato_id, **sin_nulos).update(**cambios) > 0
 
 
 class PlatoPlantilla(models.Model):
@@ -18,12 +107,25 @@ class PlatoPlantilla(models.Model):
     descripcion = models.TextField(null=True, blank=True)
     activo = models.BooleanField(default=True)
     
-    energia_kcal_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
-    proteinas_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    grasas_totales_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    carbohidratos_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    fibra_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    sodio_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    # Totales comunes
+    energia_kcal_total = models.DecimalField(max_digits=14, decimal_places=3, null=True, blank=True)
+    proteinas_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_totales_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    carbohidratos_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    agua_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+
+    # Totales adicionales
+    fibra_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    sodio_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    calcio_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    hierro_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    zinc_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    vitamina_c_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    potasio_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    fosforo_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_saturadas_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_monoinsat_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_poliinsat_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
 
     class Meta:
         verbose_name = "Plato plantilla"
@@ -38,50 +140,33 @@ class PlatoPlantilla(models.Model):
         return self.nombre
 
     def recalcular_totales(self, save=True):
-        energia = Decimal("0")
-        prot = Decimal("0")
-        grasa = Decimal("0")
-        cho = Decimal("0")
-        fibra = Decimal("0")
-        sodio = Decimal("0")
-
-        for ing in self.ingredientes_plantilla.select_related('alimento').all():
-            factor = (ing.cantidad or 0) / Decimal("100")
-            alimento = ing.alimento
-
-            if alimento.energia_kcal is not None:
-                energia += factor * alimento.energia_kcal
-            if alimento.proteinas_g is not None:
-                prot += factor * alimento.proteinas_g
-            if alimento.grasas_totales_g is not None:
-                grasa += factor * alimento.grasas_totales_g
-            if alimento.carbohidratos_disponibles_g is not None:
-                cho += factor * alimento.carbohidratos_disponibles_g
-            elif alimento.carbohidratos_totales_g is not None:
-                cho += factor * alimento.carbohidratos_totales_g
-            if alimento.fibra_g is not None:
-                fibra += factor * alimento.fibra_g
-            if alimento.sodio_mg is not None:
-                sodio += factor * alimento.sodio_mg
-
-        self.energia_kcal_total = energia
-        self.proteinas_g_total = prot
-        self.grasas_totales_g_total = grasa
-        self.carbohidratos_g_total = cho
-        self.fibra_g_total = fibra
-        self.sodio_mg_total = sodio
+        filas = list(self.ingredientes_plantilla.values_list('alimento_id', 'cantidad'))
+        totales = calcular_totales(filas)
+
+        for campo, valor in totales.items():
+            setattr(self, campo, valor)
 
         if save:
             self.save()
 
-        return {
-            "energia_kcal_total": energia,
-            "proteinas_g_total": prot,
-            "grasas_totales_g_total": grasa,
-            "carbohidratos_g_total": cho,
-            "fibra_g_total": fibra,
-            "sodio_mg_total": sodio,
-        }
+        return totales
+
+    @classmethod
+    def aplicar_delta(cls, plato_id, delta):
+        return aplicar_delta_totales(cls, plato_id, delta)
+
+    @classmethod
+    def actualizar_totales(cls, plato_id, delta):
+        """Aplica el delta o, si no es posible, recalcula los totales desde los ingredientes."""
+        if not cls.aplicar_delta(plato_id, delta):
+            plato = cls.objects.get(pk=plato_id)
+            plato.recalcular_totales(save=False)
+            plato.save(update_fields=CAMPOS_TOTAL)
+
+    def clonar_a_visita(self, visita):
+        """Crea un PlatoObservado con los ingredientes y aportes de esta plantilla."""
+        from .nutrientes import clonar_plantillas
+        return clonar_plantillas([(self.id, visita.id)])[0]
 
 
 class IngredientePlantilla(models.Model):
@@ -92,6 +177,24 @@ class IngredientePlantilla(models.Model):
     unidad = models.CharField(max_length=20, default="g")
     orden = models.IntegerField(null=True, blank=True)
 
+    # Aporte nutricional (mismos campos que IngredientePlato)
+    energia_kcal = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    proteinas_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    grasas_totales_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    carbohidratos_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    agua_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    fibra_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    sodio_mg = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    calcio_mg = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    hierro_mg = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    zinc_mg = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    vitamina_c_mg = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    potasio_mg = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    fosforo_mg = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    grasas_saturadas_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    grasas_monoinsat_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+    grasas_poliinsat_g = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
+
     class Meta:
         verbose_name = "Ingrediente plantilla"
         verbose_name_plural = "Ingredientes plantilla"
@@ -103,6 +206,18 @@ class IngredientePlantilla(models.Model):
     def __str__(self):
         return f"{self.alimento.nombre} ({self.cantidad}{self.unidad})"
 
+    def recalcular_aporte(self, save=True):
+        """Calcula y guarda el aporte nutricional de este ingrediente."""
+        aporte = redondear_aportes(vector_aporte(self.alimento_id, self.cantidad))
+
+        for campo, valor in aporte.items():
+            setattr(self, campo, valor)
+
+        if save:
+            self.save()
+
+        return aporte
+
 
 class Institucion(models.Model):
     TIPO_CHOICES = [
@@ -158,6 +273,47 @@ class VisitaAuditoria(models.Model):
     formulario_completado = models.BooleanField(default=False)
     formulario_respuestas = models.JSONField(null=True, blank=True)
 
+    # Totales materializados de la visita (suma de sus platos), se mantienen al
+    # modificar platos o ingredientes; ver VisitaAuditoria.recalcular_totales_de
+    cantidad_platos = models.IntegerField(default=0)
+    # Platos con totales calculados (sin ingredientes los totales quedan en NULL)
+    cantidad_platos_con_totales = models.IntegerField(default=0)
+    porciones_servidas_total = models.IntegerField(default=0)
+    energia_kcal_total = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    proteinas_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_totales_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    carbohidratos_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    agua_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    fibra_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    sodio_mg_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    calcio_mg_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    hierro_mg_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    zinc_mg_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    vitamina_c_mg_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    potasio_mg_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    fosforo_mg_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_saturadas_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_monoinsat_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_poliinsat_g_total = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+
+    # Totales ponderados por porciones_servidas de cada plato
+    energia_kcal_servido = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    proteinas_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_totales_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    carbohidratos_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    agua_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    fibra_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    sodio_mg_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    calcio_mg_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    hierro_mg_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    zinc_mg_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    vitamina_c_mg_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    potasio_mg_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    fosforo_mg_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_saturadas_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_monoinsat_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+    grasas_poliinsat_g_servido = models.DecimalField(max_digits=16, decimal_places=5, default=0)
+
     class Meta:
         verbose_name = "Visita de auditoría"
         verbose_name_plural = "Visitas de auditoría"
@@ -172,6 +328,69 @@ class VisitaAuditoria(models.Model):
     def __str__(self):
         return f"{self.institucion.nombre} - {self.fecha} - {self.get_tipo_comida_display()}"
 
+    @classmethod
+    def aplicar_delta(cls, visita_id, delta, porciones):
+        """Suma el delta de un plato (y el ponderado por sus porciones) con un único UPDATE."""
+        cambios = {}
+        for campo, valor in delta.items():
+            cambios[f'{campo}_total'] = F(f'{campo}_total') + valor
+            if porciones:
+                cambios[f'{campo}_servido'] = F(f'{campo}_servido') + valor * porciones
+        cls.objects.filter(pk=visita_id).update(**cambios)
+        cls._refrescar_resumenes([visita_id])
+
+    @classmethod
+    def recalcular_totales_de(cls, visita_ids, batch_size=500):
+        """Recalcula los totales materializados de las visitas indicadas desde sus platos.
+
+        Una consulta agregada para todas las visitas y un bulk_update.
+        """
+        visita_ids = sorted(set(visita_ids))
+        for i in range(0, len(visita_ids), batch_size):
+            cls._recalcular_lote(visita_ids[i:i + batch_size])
+        cls._refrescar_resumenes(visita_ids)
+
+    @staticmethod
+    def _refrescar_resumenes(visita_ids):
+        from .resumenes import programar_refresco
+        programar_refresco(visita_ids)
+
+    @classmethod
+    def calcular_totales_de(cls, visita_ids):
+        """Totales que corresponden a las visitas según sus platos: {visita_id: {campo: valor}}.
+
+        Una consulta agregada para todas las visitas.
+        """
+        # Los alias llevan prefijo para no chocar con los campos del plato que se suman
+        agregados = {
+            'suma_cantidad_platos': Count('id'),
+            'suma_cantidad_platos_con_totales': Count('id', filter=CON_TOTALES),
+            'suma_porciones_servidas_total': Sum('porciones_servidas'),
+        }
+        for campo in CAMPOS_APORTE:
+            agregados[f'suma_{campo}_total'] = Sum(f'{campo}_total')
+            agregados[f'suma_{campo}_servido'] = Sum(
+                F(f'{campo}_total') * F('porciones_servidas'), output_field=models.DecimalField()
+            )
+        filas = {
+            fila.pop('visita_id'): fila
+            for fila in PlatoObservado.objects.filter(visita_id__in=visita_ids)
+            .order_by()
+            .values('visita_id')
+            .annotate(**agregados)
+        }
+        return {
+            visita_id: {campo: filas.get(visita_id, {}).get(f'suma_{campo}') or 0 for campo in CAMPOS_VISITA}
+            for visita_id in visita_ids
+        }
+
+    @classmethod
+    def _recalcular_lote(cls, visita_ids):
+        visitas = []
+        for visita_id, totales in cls.calcular_totales_de(visita_ids).items():
+            visitas.append(cls(id=visita_id, **totales))
+        cls.objects.bulk_update(visitas, CAMPOS_VISITA)
+
 
 class PlatoObservado(models.Model):
     TIPO_PLATO_CHOICES = [
@@ -199,24 +418,24 @@ class PlatoObservado(models.Model):
     imagen = models.ImageField(upload_to='platos/', null=True, blank=True)
 
     # Totales comunes
-    energia_kcal_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
-    proteinas_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    grasas_totales_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    carbohidratos_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    agua_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    energia_kcal_total = models.DecimalField(max_digits=14, decimal_places=3, null=True, blank=True)
+    proteinas_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_totales_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    carbohidratos_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    agua_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
     
     # Totales adicionales
-    fibra_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    sodio_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    calcio_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    hierro_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    zinc_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    vitamina_c_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    potasio_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    fosforo_mg_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    grasas_saturadas_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    grasas_monoinsat_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
-    grasas_poliinsat_g_total = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    fibra_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    sodio_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    calcio_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    hierro_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    zinc_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    vitamina_c_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    potasio_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    fosforo_mg_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_saturadas_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_monoinsat_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
+    grasas_poliinsat_g_total = models.DecimalField(max_digits=14, decimal_places=5, null=True, blank=True)
 
     class Meta:
         verbose_name = "Plato observado"
@@ -232,57 +451,33 @@ class PlatoObservado(models.Model):
 
     def recalcular_totales(self, save=True):
         """Recalcula los totales nutricionales del plato sumando todos sus ingredientes."""
-        totales = {
-            'energia': Decimal("0"), 'prot': Decimal("0"), 'grasa': Decimal("0"),
-            'cho': Decimal("0"), 'agua': Decimal("0"), 'fibra': Decimal("0"),
-            'sodio': Decimal("0"), 'calcio': Decimal("0"), 'hierro': Decimal("0"),
-            'zinc': Decimal("0"), 'vitamina_c': Decimal("0"), 'potasio': Decimal("0"),
-            'fosforo': Decimal("0"), 'grasas_sat': Decimal("0"), 'grasas_mono': Decimal("0"),
-            'grasas_poli': Decimal("0")
-        }
+        filas = list(self.ingredientes.values_list('alimento_id', 'cantidad'))
+        totales = calcular_totales(filas)
 
-        for ing in self.ingredientes.select_related('alimento').all():
-            factor = (ing.cantidad or 0) / Decimal("100")
-            a = ing.alimento
-
-            totales['energia'] += factor * (a.energia_kcal or 0)
-            totales['prot'] += factor * (a.proteinas_g or 0)
-            totales['grasa'] += factor * (a.grasas_totales_g or 0)
-            totales['agua'] += factor * (a.agua_g or 0)
-            totales['cho'] += factor * (a.carbohidratos_disponibles_g or a.carbohidratos_totales_g or 0)
-            totales['fibra'] += factor * (a.fibra_g or 0)
-            totales['sodio'] += factor * (a.sodio_mg or 0)
-            totales['calcio'] += factor * (a.calcio_mg or 0)
-            totales['hierro'] += factor * (a.hierro_mg or 0)
-            totales['zinc'] += factor * (a.zinc_mg or 0)
-            totales['vitamina_c'] += factor * (a.vitamina_c_mg or 0)
-            totales['potasio'] += factor * (a.potasio_mg or 0)
-            totales['fosforo'] += factor * (a.fosforo_mg or 0)
-            totales['grasas_sat'] += factor * (a.grasas_saturadas_g or 0)
-            totales['grasas_mono'] += factor * (a.grasas_monoinsat_g or 0)
-            totales['grasas_poli'] += factor * (a.grasas_poliinsat_g or 0)
-
-        self.energia_kcal_total = totales['energia']
-        self.proteinas_g_total = totales['prot']
-        self.grasas_totales_g_total = totales['grasa']
-        self.carbohidratos_g_total = totales['cho']
-        self.agua_g_total = totales['agua']
-        self.fibra_g_total = totales['fibra']
-        self.sodio_mg_total = totales['sodio']
-        self.calcio_mg_total = totales['calcio']
-        self.hierro_mg_total = totales['hierro']
-        self.zinc_mg_total = totales['zinc']
-        self.vitamina_c_mg_total = totales['vitamina_c']
-        self.potasio_mg_total = totales['potasio']
-        self.fosforo_mg_total = totales['fosforo']
-        self.grasas_saturadas_g_total = totales['grasas_sat']
-        self.grasas_monoinsat_g_total = totales['grasas_mono']
-        self.grasas_poliinsat_g_total = totales['grasas_poli']
+        for campo, valor in totales.items():
+            setattr(self, campo, valor)
 
         if save:
             self.save()
+            VisitaAuditoria.recalcular_totales_de([self.visita_id])
 
-        return {k + '_total': v for k, v in totales.items()}
+        return {clave: totales[campo] for campo, clave in CLAVES_RESPUESTA_TOTALES.items()}
+
+    @classmethod
+    def aplicar_delta(cls, plato_id, delta):
+        return aplicar_delta_totales(cls, plato_id, delta)
+
+    @classmethod
+    def actualizar_totales(cls, plato_id, delta):
+        """Aplica el delta al plato y a su visita o, si no es posible, recalcula desde los ingredientes."""
+        visita_id, porciones = cls.objects.filter(pk=plato_id).values_list('visita_id', 'porciones_servidas').get()
+        if cls.aplicar_delta(plato_id, delta):
+            VisitaAuditoria.aplicar_delta(visita_id, delta, porciones)
+        else:
+            plato = cls.objects.get(pk=plato_id)
+            plato.recalcular_totales(save=False)
+            plato.save(update_fields=CAMPOS_TOTAL)
+            VisitaAuditoria.recalcular_totales_de([visita_id])
 
 
 class IngredientePlato(models.Model):
@@ -334,51 +529,194 @@ class IngredientePlato(models.Model):
 
     def recalcular_aporte(self, save=True):
         """Calcula y guarda el aporte nutricional de ESTE ingrediente."""
-        factor = self.cantidad / Decimal("100")
-        a = self.alimento
-
-        # Campos comunes
-        self.energia_kcal = factor * (a.energia_kcal or 0)
-        self.proteinas_g = factor * (a.proteinas_g or 0)
-        self.grasas_totales_g = factor * (a.grasas_totales_g or 0)
-        self.agua_g = factor * (a.agua_g or 0)
+        aporte = redondear_aportes(vector_aporte(self.alimento_id, self.cantidad))
 
-        if a.carbohidratos_disponibles_g is not None:
-            self.carbohidratos_g = factor * a.carbohidratos_disponibles_g
-        else:
-            self.carbohidratos_g = factor * (a.carbohidratos_totales_g or 0)
-
-        # Campos adicionales
-        self.fibra_g = factor * (a.fibra_g or 0)
-        self.sodio_mg = factor * (a.sodio_mg or 0)
-        self.calcio_mg = factor * (a.calcio_mg or 0)
-        self.hierro_mg = factor * (a.hierro_mg or 0)
-        self.zinc_mg = factor * (a.zinc_mg or 0)
-        self.vitamina_c_mg = factor * (a.vitamina_c_mg or 0)
-        self.potasio_mg = factor * (a.potasio_mg or 0)
-        self.fosforo_mg = factor * (a.fosforo_mg or 0)
-        self.grasas_saturadas_g = factor * (a.grasas_saturadas_g or 0)
-        self.grasas_monoinsat_g = factor * (a.grasas_monoinsat_g or 0)
-        self.grasas_poliinsat_g = factor * (a.grasas_poliinsat_g or 0)
+        for campo, valor in aporte.items():
+            setattr(self, campo, valor)
 
         if save:
             self.save()
 
-        return {
-            "energia_kcal": self.energia_kcal,
-            "proteinas_g": self.proteinas_g,
-            "grasas_totales_g": self.grasas_totales_g,
-            "carbohidratos_g": self.carbohidratos_g,
-            "agua_g": self.agua_g,
-            "fibra_g": self.fibra_g,
-            "sodio_mg": self.sodio_mg,
-            "calcio_mg": self.calcio_mg,
-            "hierro_mg": self.hierro_mg,
-            "zinc_mg": self.zinc_mg,
-            "vitamina_c_mg": self.vitamina_c_mg,
-            "potasio_mg": self.potasio_mg,
-            "fosforo_mg": self.fosforo_mg,
-            "grasas_saturadas_g": self.grasas_saturadas_g,
-            "grasas_monoinsat_g": self.grasas_monoinsat_g,
-            "grasas_poliinsat_g": self.grasas_poliinsat_g,
-        }
+        return aporte
+
+
+# Unidad de redondeo de cada aporte (mismos decimales en IngredientePlato e IngredientePlantilla)
+ESCALAS_APORTE = {
+    campo: Decimal(1).scaleb(-IngredientePlato._meta.get_field(campo).decimal_places) for campo in CAMPOS_APORTE
+}
+
+
+class ResumenDiario(models.Model):
+    """Acumulados por institución, fecha y tipo de comida para los reportes.
+
+    Se refresca por clave al modificar visitas o platos (ver auditoria.resumenes)
+    y se reconcilia completo con el comando `reconciliar_resumenes`.
+    """
+    institucion = models.ForeignKey(
+        Institucion,
+        on_delete=models.CASCADE,
+        related_name="resumenes_diarios",
+    )
+    fecha = models.DateField()
+    tipo_comida = models.CharField(max_length=20, choices=VisitaAuditoria.TIPO_COMIDA_CHOICES)
+
+    cantidad_visitas = models.IntegerField(default=0)
+    cantidad_platos = models.IntegerField(default=0)
+    cantidad_platos_con_totales = models.IntegerField(default=0)
+    porciones_servidas = models.IntegerField(default=0)
+
+    # Suma de los totales de los platos
+    energia_kcal_suma = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    proteinas_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    grasas_totales_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    carbohidratos_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    agua_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    fibra_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    sodio_mg_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    calcio_mg_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    hierro_mg_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    zinc_mg_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    vitamina_c_mg_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    potasio_mg_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    fosforo_mg_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    grasas_saturadas_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    grasas_monoinsat_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+    grasas_poliinsat_g_suma = models.DecimalField(max_digits=16, decimal_places=3, default=0)
+
+    # Suma de los cuadrados de los totales de cada plato (para desvíos)
+    energia_kcal_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    proteinas_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    grasas_totales_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    carbohidratos_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    agua_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    fibra_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    sodio_mg_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    calcio_mg_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    hierro_mg_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    zinc_mg_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    vitamina_c_mg_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    potasio_mg_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    fosforo_mg_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    grasas_saturadas_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    grasas_monoinsat_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+    grasas_poliinsat_g_suma_cuadrados = models.DecimalField(max_digits=24, decimal_places=3, default=0)
+
+    class Meta:
+        verbose_name = "Resumen diario"
+        verbose_name_plural = "Resúmenes diarios"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['institucion', 'fecha', 'tipo_comida'], name='resumen_diario_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha']),
+            models.Index(fields=['tipo_comida', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.institucion_id} - {self.fecha} - {self.tipo_comida}"
+
+
+class RespuestaFormulario(models.Model):
+    """Una respuesta del formulario de relevamiento de una visita, indexada para filtrar.
+
+    Se regenera desde VisitaAuditoria.formulario_respuestas cada vez que se guarda
+    la visita (ver auditoria.formularios).
+    """
+    visita = models.ForeignKey(
+        VisitaAuditoria,
+        on_delete=models.CASCADE,
+        related_name="respuestas",
+    )
+    seccion = models.CharField(max_length=255)
+    pregunta = models.CharField(max_length=255)
+    # Valor como texto en minúsculas (str del valor original), y tipado si corresponde
+    valor_texto = models.CharField(max_length=255, blank=True)
+    valor_bool = models.BooleanField(null=True, blank=True)
+    valor_numero = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Respuesta de formulario"
+        verbose_name_plural = "Respuestas de formulario"
+        ordering = ['visita', 'seccion', 'pregunta']
+        indexes = [
+            models.Index(fields=['pregunta', 'valor_texto']),
+            models.Index(fields=['pregunta', 'valor_bool']),
+            models.Index(fields=['visita', 'seccion']),
+        ]
+
+    def __str__(self):
+        return f"{self.visita_id} - {self.seccion}.{self.pregunta} = {self.valor_texto}"
+
+
+class FrecuenciaRespuesta(models.Model):
+    """Cubo de frecuencias de respuestas de formularios completados.
+
+    Una fila por (tipo de institución, comuna, mes, sección, pregunta, valor) con la
+    cantidad de visitas y de instituciones distintas que dieron esa respuesta. Las
+    filas con `valor` nulo cuentan a quienes respondieron la pregunta con cualquier
+    valor (denominador de los porcentajes). Se refresca por (tipo, comuna, mes) al
+    guardar formularios (ver auditoria.frecuencias).
+    """
+    tipo_institucion = models.CharField(max_length=50)
+    comuna = models.CharField(max_length=50, null=True, blank=True)
+    mes = models.DateField()
+    seccion = models.CharField(max_length=255)
+    pregunta = models.CharField(max_length=255)
+    valor = models.CharField(max_length=255, null=True, blank=True)
+    visitas = models.IntegerField(default=0)
+    instituciones = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Frecuencia de respuesta"
+        verbose_name_plural = "Frecuencias de respuestas"
+        ordering = ['-mes', 'pregunta']
+        indexes = [
+            models.Index(fields=['pregunta', 'mes']),
+            models.Index(fields=['tipo_institucion', 'comuna', 'mes']),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} {self.tipo_institucion}/{self.comuna} {self.pregunta}={self.valor}: {self.visitas}"
+
+
+class TrabajoReporte(models.Model):
+    """Reporte pesado que se calcula en segundo plano (ver auditoria.trabajos).
+
+    `clave` identifica los parámetros normalizados y `version` la de los datos de
+    los que depende: un pedido igual a uno pendiente, en curso o terminado con la
+    misma versión reutiliza ese trabajo en lugar de crear otro.
+    """
+    TIPO_CHOICES = [
+        ("comparativa_nutricional", "Comparativa nutricional"),
+        ("instituciones_filtros", "Instituciones con filtros"),
+    ]
+    ESTADO_CHOICES = [
+        ("pendiente", "Pendiente"),
+        ("ejecutando", "Ejecutando"),
+        ("completado", "Completado"),
+        ("error", "Error"),
+    ]
+
+    tipo = models.CharField(max_length=50, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict)
+    clave = models.CharField(max_length=64)
+    version = models.CharField(max_length=32)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default="pendiente")
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    finalizado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de reporte"
+        verbose_name_plural = "Trabajos de reportes"
+        ordering = ['-creado']
+        indexes = [
+            models.Index(fields=['clave', 'version']),
+            models.Index(fields=['estado', 'creado']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.estado})"
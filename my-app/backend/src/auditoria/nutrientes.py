@@ -0,0 +1,451 @@
+"""Recalculo masivo de aportes y totales usando la matriz nutricional."""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Round
+from django.utils import timezone
+from nutricion.matriz import CAMPOS_APORTE, CAMPOS_TOTAL, obtener_matriz, valores_nutrientes
+from core.cache import marcar_modificados
+from .models import (
+    VisitaAuditoria, PlatoObservado, IngredientePlato, PlatoPlantilla, IngredientePlantilla, CAMPOS_VISITA,
+    redondear_aportes, sumar_aportes,
+)
+
+
+def queryset_platos(filtros):
+    """Platos a procesar según los filtros (dict serializable, se envía a los procesos)."""
+    if filtros.get('plantillas'):
+        return PlatoPlantilla.objects.order_by()
+
+    queryset = PlatoObservado.objects.order_by()
+    if filtros.get('instituciones'):
+        queryset = queryset.filter(visita__institucion_id__in=filtros['instituciones'])
+    if filtros.get('desde'):
+        queryset = queryset.filter(visita__fecha__gte=filtros['desde'])
+    if filtros.get('hasta'):
+        queryset = queryset.filter(visita__fecha__lte=filtros['hasta'])
+    return queryset
+
+
+def lotes(queryset, tamano, desde_id=0):
+    """Recorre los ids por rangos (keyset): (primer_id, ultimo_id, cantidad)."""
+    ultimo = desde_id
+    while True:
+        ids = list(queryset.filter(id__gt=ultimo).order_by('id').values_list('id', flat=True)[:tamano])
+        if not ids:
+            return
+        yield ids[0], ids[-1], len(ids)
+        ultimo = ids[-1]
+
+
+# Tag de caché (core.cache) de los platos plantilla y sus ingredientes
+TAG_PLANTILLAS = 'plantillas'
+
+# Modelo de ingrediente y FK al plato para cada modelo de plato
+INGREDIENTES_DE = {
+    PlatoObservado: (IngredientePlato, 'plato_id'),
+    PlatoPlantilla: (IngredientePlantilla, 'plato_plantilla_id'),
+}
+
+
+def _calcular(platos):
+    """Lee los ingredientes de `platos` en una consulta y calcula aportes y totales.
+
+    Devuelve (ingredientes, aportes, totales): los ingredientes conservan los
+    valores guardados; aportes (redondeados como se guardan) y totales (su suma
+    por plato) son dicts en el orden de las listas.
+    """
+    modelo_ingrediente, fk = INGREDIENTES_DE[type(platos[0])]
+    ingredientes = list(
+        modelo_ingrediente.objects.filter(**{f'{fk}__in': [plato.id for plato in platos]})
+        .order_by()
+        .only('id', fk, 'alimento_id', 'cantidad', *CAMPOS_APORTE)
+    )
+    alimento_ids = [ing.alimento_id for ing in ingredientes]
+    cantidades = [ing.cantidad for ing in ingredientes]
+
+    aportes = [redondear_aportes(vector) for vector in obtener_matriz(alimento_ids).aportes(alimento_ids, cantidades)]
+    por_plato = defaultdict(list)
+    for ingrediente, aporte in zip(ingredientes, aportes):
+        por_plato[getattr(ingrediente, fk)].append(aporte)
+    totales = [sumar_aportes(por_plato[plato.id]) for plato in platos]
+    return ingredientes, aportes, totales
+
+
+def recalcular_platos(platos, save=True, batch_size=500):
+    """Recalcula aportes de ingredientes y totales de muchos platos a la vez.
+
+    `platos` son PlatoObservado o PlatoPlantilla (todos del mismo modelo). Lee los
+    ingredientes en una sola consulta, calcula con un producto matricial y escribe
+    con bulk_update. Devuelve los platos actualizados.
+    """
+    platos = list(platos)
+    if not platos:
+        return platos
+
+    ingredientes, aportes, totales = _calcular(platos)
+
+    for plato, valores in zip(platos, totales):
+        for campo, valor in valores.items():
+            setattr(plato, campo, valor)
+
+    if save:
+        for ingrediente, aporte in zip(ingredientes, aportes):
+            for campo, valor in aporte.items():
+                setattr(ingrediente, campo, valor)
+
+        modelo_ingrediente = INGREDIENTES_DE[type(platos[0])][0]
+        with transaction.atomic():
+            modelo_ingrediente.objects.bulk_update(ingredientes, CAMPOS_APORTE, batch_size=batch_size)
+            type(platos[0]).objects.bulk_update(platos, CAMPOS_TOTAL, batch_size=batch_size)
+        if isinstance(platos[0], PlatoPlantilla):
+            # bulk_update no dispara señales
+            marcar_modificados(TAG_PLANTILLAS)
+        recalcular_visitas(platos)
+
+    return platos
+
+
+def recalcular_visitas(platos):
+    """Recalcula los totales materializados de las visitas de los platos observados indicados.
+
+    Se llama después del commit de los platos: si dos lotes tocan la misma visita,
+    el último en leer ve los cambios de ambos.
+    """
+    if not platos or not isinstance(platos[0], PlatoObservado):
+        return
+    VisitaAuditoria.recalcular_totales_de(
+        PlatoObservado.objects.filter(id__in=[plato.id for plato in platos]).values_list('visita_id', flat=True)
+    )
+
+
+def _refrescar_historico(valor):
+    """Si los cambios del catálogo alcanzan a las visitas anteriores a hoy (settings.NUTRICION_REFRESCAR_HISTORICO)."""
+    if valor is None:
+        return getattr(settings, 'NUTRICION_REFRESCAR_HISTORICO', False)
+    return valor
+
+
+def _congelados(platos, refrescar_historico):
+    """Ids de los platos observados de visitas anteriores a hoy, que no siguen al catálogo."""
+    if refrescar_historico or not isinstance(platos[0], PlatoObservado):
+        return set()
+    return set(
+        PlatoObservado.objects.filter(id__in=[plato.id for plato in platos], visita__fecha__lt=timezone.localdate())
+        .values_list('id', flat=True)
+    )
+
+
+def diferencias_platos(platos, tolerancia=Decimal("0"), refrescar_historico=None):
+    """Compara los aportes y totales guardados con los que corresponden.
+
+    El aporte esperado de un ingrediente es el del catálogo, redondeado a la
+    precisión de la columna; el total esperado de un plato es la suma de los
+    aportes esperados de sus ingredientes. Los platos de visitas anteriores a hoy
+    están congelados como en propagar_cambio_alimento (salvo `refrescar_historico`,
+    por defecto settings.NUTRICION_REFRESCAR_HISTORICO): sus aportes guardados son
+    los esperados y solo se verifica que los totales sean su suma.
+
+    Un campo es distinto si difiere más que `tolerancia` (o si está en NULL; un
+    plato sin ingredientes puede tener todos sus totales en NULL). Devuelve un
+    dict con los platos e ingredientes distintos (con el valor esperado ya
+    asignado, listos para bulk_update) y la máxima diferencia encontrada por campo.
+    """
+    resultado = {'platos': [], 'ingredientes': [], 'max_diferencia': {}, 'ingredientes_revisados': 0}
+    platos = list(platos)
+    if not platos:
+        return resultado
+
+    ingredientes, aportes, _ = _calcular(platos)
+    resultado['ingredientes_revisados'] = len(ingredientes)
+    congelados = _congelados(platos, _refrescar_historico(refrescar_historico))
+    fk = INGREDIENTES_DE[type(platos[0])][1]
+
+    def comparar(objeto, esperados, clave):
+        distinto = False
+        for campo, esperado in esperados.items():
+            guardado = getattr(objeto, campo)
+            diferencia = abs(esperado - guardado) if guardado is not None else abs(esperado)
+            if guardado is None or diferencia > tolerancia:
+                distinto = True
+                maxima = resultado['max_diferencia'].get(campo, Decimal("0"))
+                resultado['max_diferencia'][campo] = max(maxima, diferencia)
+                setattr(objeto, campo, esperado)
+        if distinto:
+            resultado[clave].append(objeto)
+
+    por_plato = defaultdict(list)
+    for ingrediente, esperados in zip(ingredientes, aportes):
+        guardados = {campo: getattr(ingrediente, campo) for campo in CAMPOS_APORTE}
+        if getattr(ingrediente, fk) in congelados and None not in guardados.values():
+            esperados = guardados
+        else:
+            comparar(ingrediente, esperados, 'ingredientes')
+        por_plato[getattr(ingrediente, fk)].append(esperados)
+
+    for plato in platos:
+        if plato.id not in por_plato and all(getattr(plato, campo) is None for campo in CAMPOS_TOTAL):
+            continue
+        comparar(plato, sumar_aportes(por_plato[plato.id]), 'platos')
+    return resultado
+
+
+def diferencias_visitas(visitas, tolerancia=Decimal("0")):
+    """Compara los totales materializados de las visitas con la suma de sus platos.
+
+    Devuelve las visitas distintas y la máxima diferencia por campo, como
+    diferencias_platos (la reparación es VisitaAuditoria.recalcular_totales_de).
+    """
+    resultado = {'visitas': [], 'max_diferencia': {}}
+    visitas = list(visitas)
+    if not visitas:
+        return resultado
+
+    esperados = VisitaAuditoria.calcular_totales_de([visita.id for visita in visitas])
+    escalas = {
+        campo: _escala(VisitaAuditoria, campo) for campo in CAMPOS_VISITA
+        if isinstance(VisitaAuditoria._meta.get_field(campo), DecimalField)
+    }
+    for visita in visitas:
+        distinto = False
+        for campo, esperado in esperados[visita.id].items():
+            if campo in escalas:
+                esperado = Decimal(esperado).quantize(escalas[campo])
+            diferencia = abs(esperado - getattr(visita, campo))
+            if diferencia > (tolerancia if campo in escalas else 0):
+                distinto = True
+                maxima = resultado['max_diferencia'].get(campo, Decimal("0"))
+                resultado['max_diferencia'][campo] = max(maxima, diferencia)
+        if distinto:
+            resultado['visitas'].append(visita)
+    return resultado
+
+
+def _escala(modelo, campo):
+    return Decimal(1).scaleb(-modelo._meta.get_field(campo).decimal_places)
+
+
+def clonar_plantillas(asignaciones, batch_size=500):
+    """Clona plantillas en visitas a partir de pares (plantilla_id, visita_id).
+
+    Aportes y totales se copian de la plantilla (o se calculan una sola vez por
+    plantilla si faltan) y todos los platos e ingredientes se insertan con
+    bulk_create en una transacción. Devuelve los PlatoObservado creados, en el
+    orden de `asignaciones`.
+    """
+    asignaciones = [(int(plantilla_id), int(visita_id)) for plantilla_id, visita_id in asignaciones]
+    if not asignaciones:
+        return []
+
+    plantillas = PlatoPlantilla.objects.in_bulk({p for p, _ in asignaciones})
+    faltantes = {p for p, _ in asignaciones} - set(plantillas)
+    if faltantes:
+        raise PlatoPlantilla.DoesNotExist(f'Plantillas no encontradas: {sorted(faltantes)}')
+
+    visita_ids = {v for _, v in asignaciones}
+    faltantes = visita_ids - set(VisitaAuditoria.objects.filter(id__in=visita_ids).values_list('id', flat=True))
+    if faltantes:
+        raise VisitaAuditoria.DoesNotExist(f'Visitas no encontradas: {sorted(faltantes)}')
+
+    ingredientes = defaultdict(list)
+    for fila in (
+        IngredientePlantilla.objects.filter(plato_plantilla_id__in=plantillas)
+        .order_by('plato_plantilla_id', 'orden', 'id')
+        .values_list('plato_plantilla_id', 'alimento_id', 'cantidad', 'unidad', 'orden', *CAMPOS_APORTE)
+    ):
+        ingredientes[fila[0]].append(fila[1:])
+
+    # Las plantillas guardan aportes y totales: clonar es copiar. Solo se recalcula
+    # (una vez por plantilla) si a alguna le faltan valores.
+    calculos = {}
+    for plantilla_id, plantilla in plantillas.items():
+        filas = ingredientes[plantilla_id]
+        totales = {campo: getattr(plantilla, campo) for campo in CAMPOS_TOTAL}
+        aportes = [dict(zip(CAMPOS_APORTE, fila[4:])) for fila in filas]
+        if None in totales.values() or any(None in aporte.values() for aporte in aportes):
+            vectores = obtener_matriz([f[0] for f in filas]).aportes([f[0] for f in filas], [f[1] for f in filas])
+            aportes = [redondear_aportes(vector) for vector in vectores]
+            totales = sumar_aportes(aportes)
+        calculos[plantilla_id] = (totales, aportes)
+
+    platos = [
+        PlatoObservado(
+            visita_id=visita_id,
+            nombre=plantillas[plantilla_id].nombre,
+            tipo_plato=plantillas[plantilla_id].tipo_plato,
+            **calculos[plantilla_id][0],
+        )
+        for plantilla_id, visita_id in asignaciones
+    ]
+
+    with transaction.atomic():
+        _insertar_platos(platos, batch_size)
+
+        IngredientePlato.objects.bulk_create(
+            [
+                IngredientePlato(
+                    plato_id=plato.id,
+                    alimento_id=alimento_id,
+                    cantidad=cantidad,
+                    unidad=unidad,
+                    orden=orden,
+                    **aporte,
+                )
+                for plato, (plantilla_id, _) in zip(platos, asignaciones)
+                for (alimento_id, cantidad, unidad, orden, *_), aporte in zip(
+                    ingredientes[plantilla_id], calculos[plantilla_id][1]
+                )
+            ],
+            batch_size=batch_size,
+        )
+    VisitaAuditoria.recalcular_totales_de(visita_ids)
+
+    return platos
+
+
+def _insertar_platos(platos, batch_size):
+    """bulk_create de los platos dejando sus ids asignados, también en MySQL.
+
+    MySQL no devuelve los ids de un INSERT múltiple: cada lote se inserta y sus
+    ids se leen en una consulta desde LAST_INSERT_ID() (el primero que generó el
+    último INSERT de la conexión), verificando que sean los del lote.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        PlatoObservado.objects.bulk_create(platos, batch_size=batch_size)
+        return
+    for i in range(0, len(platos), batch_size):
+        lote = platos[i:i + batch_size]
+        PlatoObservado.objects.bulk_create(lote, batch_size=len(lote))
+        filas = list(
+            PlatoObservado.objects.filter(
+                id__gte=RawSQL('LAST_INSERT_ID()', ()), visita_id__in={plato.visita_id for plato in lote}
+            )
+            .order_by('id')
+            .values_list('id', 'visita_id', 'nombre')[:len(lote)]
+        )
+        if [fila[1:] for fila in filas] != [(plato.visita_id, plato.nombre) for plato in lote]:
+            raise DatabaseError('No se pudieron leer los ids de los platos insertados')
+        for plato, fila in zip(lote, filas):
+            plato.id = fila[0]
+
+
+def guardar_ingredientes(plato, filas, reemplazar=True, batch_size=500):
+    """Escribe la lista de ingredientes de un plato en una transacción.
+
+    `filas` son dicts con alimento_id, cantidad, unidad, orden y opcionalmente id
+    (ingrediente existente a actualizar). Con `reemplazar` se borran los
+    ingredientes del plato que no vienen en `filas`. Los aportes se calculan en
+    memoria y los totales se recalculan una sola vez al final.
+    """
+    existentes = set(plato.ingredientes.values_list('id', flat=True))
+    ajenos = {fila['id'] for fila in filas if fila.get('id') is not None} - existentes
+    if ajenos:
+        raise IngredientePlato.DoesNotExist(f'Ingredientes que no pertenecen al plato: {sorted(ajenos)}')
+
+    alimento_ids = [fila['alimento_id'] for fila in filas]
+    aportes = obtener_matriz(alimento_ids).aportes(alimento_ids, [fila['cantidad'] for fila in filas])
+
+    nuevos = []
+    actualizados = []
+    for fila, aporte in zip(filas, aportes):
+        ingrediente = IngredientePlato(
+            id=fila.get('id'),
+            plato_id=plato.id,
+            alimento_id=fila['alimento_id'],
+            cantidad=fila['cantidad'],
+            unidad=fila.get('unidad') or 'g',
+            orden=fila.get('orden'),
+            **redondear_aportes(aporte),
+        )
+        (actualizados if ingrediente.id else nuevos).append(ingrediente)
+
+    with transaction.atomic():
+        if reemplazar:
+            conservar = {ing.id for ing in actualizados}
+            plato.ingredientes.exclude(id__in=conservar).delete()
+        if actualizados:
+            IngredientePlato.objects.bulk_update(
+                actualizados, ['alimento', 'cantidad', 'unidad', 'orden', *CAMPOS_APORTE], batch_size=batch_size
+            )
+        IngredientePlato.objects.bulk_create(nuevos, batch_size=batch_size)
+
+        plato.recalcular_totales(save=False)
+        plato.save(update_fields=CAMPOS_TOTAL)
+    VisitaAuditoria.recalcular_totales_de([plato.visita_id])
+
+    return plato
+
+
+def propagar_cambio_alimento(alimento_id, anteriores, nuevos, refrescar_historico=None):
+    """Actualiza aportes y totales que dependen de un alimento cuyo valor cambió.
+
+    `anteriores` y `nuevos` son los valores del alimento (campo -> valor) antes y
+    después del cambio. Solo se tocan los ingredientes que usan el alimento (índice
+    por `alimento`): a los totales de cada plato se les suma la diferencia entre los
+    aportes nuevos (redondeados como se guardan) y los guardados de esos ingredientes,
+    y después se reescriben los aportes, con un UPDATE por tabla. Las visitas anteriores a hoy se dejan congeladas salvo que
+    `refrescar_historico` (por defecto settings.NUTRICION_REFRESCAR_HISTORICO) sea True.
+    Devuelve la cantidad de platos observados y plantillas actualizados.
+    """
+    anteriores = valores_nutrientes(anteriores)
+    nuevos = valores_nutrientes(nuevos)
+    diferencias = {campo: nuevos[campo] - anteriores[campo] for campo in CAMPOS_APORTE}
+    if not any(diferencias.values()):
+        return 0, 0
+
+    ingredientes = IngredientePlato.objects.filter(alimento_id=alimento_id)
+    platos = PlatoObservado.objects.filter(ingredientes__alimento_id=alimento_id)
+    if not _refrescar_historico(refrescar_historico):
+        desde = timezone.localdate()
+        ingredientes = ingredientes.filter(plato__visita__fecha__gte=desde)
+        platos = platos.filter(visita__fecha__gte=desde)
+
+    visita_ids = set(platos.values_list('visita_id', flat=True))
+    with transaction.atomic():
+        n_platos = _propagar(ingredientes, platos, 'plato', alimento_id, nuevos, diferencias)
+        n_plantillas = _propagar(
+            IngredientePlantilla.objects.filter(alimento_id=alimento_id),
+            PlatoPlantilla.objects.filter(ingredientes_plantilla__alimento_id=alimento_id),
+            'plato_plantilla',
+            alimento_id,
+            nuevos,
+            diferencias,
+        )
+    if n_plantillas:
+        # UPDATE sobre las plantillas: sin señales
+        marcar_modificados(TAG_PLANTILLAS)
+    VisitaAuditoria.recalcular_totales_de(visita_ids)
+    return n_platos, n_plantillas
+
+
+def _propagar(ingredientes, platos, campo_plato, alimento_id, nuevos, diferencias):
+    # El redondeo se hace en la base: el total suma exactamente la diferencia de lo guardado
+    aportes = {
+        campo: Round(
+            F('cantidad') * Value(nuevos[campo] / 100, output_field=DecimalField()),
+            ingredientes.model._meta.get_field(campo).decimal_places,
+        )
+        for campo in CAMPOS_APORTE
+    }
+
+    def delta(campo):
+        return Subquery(
+            ingredientes.model.objects.filter(**{campo_plato: OuterRef('pk'), 'alimento_id': alimento_id})
+            .order_by()
+            .values(campo_plato)
+            .annotate(total=Sum(aportes[campo] - F(campo), output_field=DecimalField()))
+            .values('total'),
+            output_field=DecimalField(),
+        )
+
+    n = platos.update(**{
+        f'{campo}_total': F(f'{campo}_total') + delta(campo)
+        for campo, diferencia in diferencias.items()
+        if diferencia
+    })
+    ingredientes.update(**aportes)
+    return n
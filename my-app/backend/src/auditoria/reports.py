@@ -1,24 +1,188 @@
-from django.db.models import Count, Avg, Sum, Q
-from django.db.models.functions import TruncDate
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
 from django.core.cache import cache
-from .models import Institucion, VisitaAuditoria, PlatoObservado
+from django.db.models import Count, Max, Min, Sum, Q
+from core.cache import claves_versionadas, obtener_o_calcular
+from .models import Institucion, VisitaAuditoria, ResumenDiario, RespuestaFormulario, FrecuenciaRespuesta
+from .formularios import filtro_respuesta
+from .frecuencias import inicio_de_mes, mes_siguiente
+
+
+# Clave en la respuesta -> nutriente acumulado en ResumenDiario
+PROMEDIOS_NUTRICIONALES = {
+    'energia': 'energia_kcal',
+    'proteinas': 'proteinas_g',
+    'grasas': 'grasas_totales_g',
+    'carbohidratos': 'carbohidratos_g',
+    'fibra': 'fibra_g',
+    'sodio': 'sodio_mg',
+}
+
+
+def _resumenes(fecha_inicio=None, fecha_fin=None):
+    """Filas de ResumenDiario del rango: una por institución, día y tipo de comida."""
+    queryset = ResumenDiario.objects.order_by()
+    if fecha_inicio:
+        queryset = queryset.filter(fecha__gte=fecha_inicio)
+    if fecha_fin:
+        queryset = queryset.filter(fecha__lte=fecha_fin)
+    return queryset
+
+
+def _sumas_promedios():
+    sumas = {'platos_con_totales': Sum('cantidad_platos_con_totales')}
+    for clave, campo in PROMEDIOS_NUTRICIONALES.items():
+        sumas[f'suma_{clave}'] = Sum(f'{campo}_suma')
+        sumas[f'cuadrados_{clave}'] = Sum(f'{campo}_suma_cuadrados')
+    return sumas
+
+
+def _promedios(sumas):
+    """Promedio por plato a partir de las sumas de los totales de los platos.
+
+    Como Avg(), no cuenta los platos sin totales (NULL, p. ej. sin ingredientes).
+    """
+    platos = sumas['platos_con_totales']
+    return {
+        clave: sumas[f'suma_{clave}'] / platos if platos else None
+        for clave in PROMEDIOS_NUTRICIONALES
+    }
+
+
+def _porcentaje(parte, total):
+    return round(parte * 100 / total, 2) if total else None
+
+
+def _desvios(sumas):
+    """Desvío estándar (poblacional) por plato a partir de sumas y sumas de cuadrados."""
+    platos = sumas['platos_con_totales']
+    desvios = {}
+    for clave in PROMEDIOS_NUTRICIONALES:
+        if not platos:
+            desvios[clave] = None
+            continue
+        promedio = sumas[f'suma_{clave}'] / platos
+        varianza = sumas[f'cuadrados_{clave}'] / platos - promedio * promedio
+        desvios[clave] = max(varianza, Decimal(0)).sqrt()
+    return desvios
+
+
+# Las entradas se invalidan por tags al cambiar los datos, así que pueden durar horas
+TIMEOUT_REPORTES = 6 * 60 * 60
+
+TAG_INSTITUCIONES = 'instituciones'
+TAG_VISITAS = 'visitas'
+# Rangos más largos dependen del tag general de visitas en lugar de uno por mes
+MAX_TAGS_PERIODO = 36
+
+
+def tag_institucion(institucion_id):
+    return f'institucion:{institucion_id}'
+
+
+def tag_mes(fecha):
+    return f'visitas:mes:{fecha:%Y-%m}'
+
+
+def tags_periodo(fecha_inicio=None, fecha_fin=None):
+    """Tags de los meses del rango; sin rango acotado, el tag de todas las visitas."""
+    try:
+        desde = date.fromisoformat(str(fecha_inicio))
+        hasta = date.fromisoformat(str(fecha_fin))
+    except ValueError:
+        return [TAG_VISITAS]
+    tags = []
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        tags.append(tag_mes(mes))
+        mes = mes_siguiente(mes)
+        if len(tags) > MAX_TAGS_PERIODO:
+            return [TAG_VISITAS]
+    return tags
+
+
+def tags_de_visitas(claves):
+    """Tags a invalidar cuando cambian las visitas de las claves (institucion_id, fecha, ...)."""
+    tags = {TAG_VISITAS}
+    for institucion_id, fecha, *_ in claves:
+        tags.add(tag_institucion(institucion_id))
+        tags.add(tag_mes(fecha))
+    return tags
+
+
+# Agrupaciones de visitas_por_periodo: inicio del período que contiene una fecha
+# (las semanas empiezan el lunes, como TruncWeek)
+GRANULARIDADES = {
+    'dia': lambda fecha: fecha,
+    'semana': lambda fecha: fecha - timedelta(days=fecha.weekday()),
+    'mes': inicio_de_mes,
+}
+
+
+def _rango_visitas():
+    """Primera y última fecha con visitas (None si no hay ninguna)."""
+    def calcular():
+        rango = ResumenDiario.objects.aggregate(desde=Min('fecha'), hasta=Max('fecha'))
+        return rango['desde'], rango['hasta']
+
+    return obtener_o_calcular('visitas_rango_fechas', [TAG_VISITAS], TIMEOUT_REPORTES, calcular)
+
+
+def _visitas_por_dia(meses):
+    """Conteo diario de visitas de cada mes indicado: {mes: [(dia, cantidad), ...]}.
+
+    Cada mes es una entrada de caché propia ligada a su tag. Los meses cerrados
+    ya no cambian salvo que se editen visitas viejas, que invalidan su tag, así
+    que se guardan sin vencimiento; el mes en curso vence como los demás reportes.
+    Los meses que faltan se calculan juntos en una sola consulta.
+    """
+    claves = dict(zip(meses, claves_versionadas([(f'visitas_dia_{mes:%Y-%m}', [tag_mes(mes)]) for mes in meses])))
+    guardados = cache.get_many(claves.values())
+    por_mes = {mes: guardados[clave] for mes, clave in claves.items() if clave in guardados}
+
+    faltantes = [mes for mes in meses if mes not in por_mes]
+    if faltantes:
+        for mes in faltantes:
+            por_mes[mes] = []
+        filas = (
+            ResumenDiario.objects.order_by()
+            .filter(reduce(or_, (Q(fecha__gte=mes, fecha__lt=mes_siguiente(mes)) for mes in faltantes)))
+            .values('fecha')
+            .annotate(count=Sum('cantidad_visitas'))
+            .order_by('fecha')
+        )
+        for fila in filas:
+            por_mes[inicio_de_mes(fila['fecha'])].append((fila['fecha'], fila['count']))
+
+        mes_actual = inicio_de_mes(date.today())
+        cache.set_many({claves[mes]: por_mes[mes] for mes in faltantes if mes < mes_actual}, None)
+        cache.set_many({claves[mes]: por_mes[mes] for mes in faltantes if mes >= mes_actual}, TIMEOUT_REPORTES)
+    return por_mes
+
+
+# Dimensiones por las que se puede agrupar el cubo de frecuencias
+DIMENSIONES_FRECUENCIA = ('tipo_institucion', 'comuna', 'mes', 'seccion')
 
 
 class ReportService:
     @staticmethod
     def get_dashboard_stats():
         """Estadísticas generales del dashboard - CON CACHÉ"""
-        cache_key = 'dashboard_stats'
-        stats = cache.get(cache_key)
-        
-        if stats is None:
+        def calcular():
+            totales = _resumenes().aggregate(
+                total_visitas=Sum('cantidad_visitas'),
+                total_platos=Sum('cantidad_platos'),
+            )
             stats = {
                 'total_instituciones': Institucion.objects.filter(activo=True).count(),
-                'total_visitas': VisitaAuditoria.objects.count(),
-                'total_platos': PlatoObservado.objects.count(),
+                'total_visitas': totales['total_visitas'] or 0,
+                'total_platos': totales['total_platos'] or 0,
                 'visitas_por_tipo': list(
-                    VisitaAuditoria.objects.values('tipo_comida')
-                    .annotate(count=Count('id'))
+                    _resumenes().values('tipo_comida')
+                    .annotate(count=Sum('cantidad_visitas'))
                     .order_by('-count')
                 ),
                 'instituciones_por_tipo': list(
@@ -28,43 +192,44 @@ class ReportService:
                     .order_by('-count')
                 ),
             }
-            # Caché por 5 minutos
-            cache.set(cache_key, stats, 300)
-        
-        return stats
+            return stats
+
+        # Caché por 6 horas, invalidada por tags
+        return obtener_o_calcular('dashboard_stats', [TAG_VISITAS, TAG_INSTITUCIONES], TIMEOUT_REPORTES, calcular)
 
     @staticmethod
-    def get_visitas_por_periodo(fecha_inicio=None, fecha_fin=None):
-        """Visitas agrupadas por fecha - CON CACHÉ"""
-        cache_key = f'visitas_periodo_{fecha_inicio}_{fecha_fin}'
-        visitas = cache.get(cache_key)
-        
-        if visitas is None:
-            queryset = VisitaAuditoria.objects.all()
-            
-            if fecha_inicio:
-                queryset = queryset.filter(fecha__gte=fecha_inicio)
-            if fecha_fin:
-                queryset = queryset.filter(fecha__lte=fecha_fin)
-            
-            visitas = list(
-                queryset.annotate(dia=TruncDate('fecha'))
-                .values('dia')
-                .annotate(count=Count('id'))
-                .order_by('dia')
-            )
-            # Caché por 10 minutos
-            cache.set(cache_key, visitas, 600)
-        
-        return visitas
+    def get_visitas_por_periodo(fecha_inicio=None, fecha_fin=None, granularidad='dia'):
+        """Visitas agrupadas por día, semana o mes - CON CACHÉ POR MES
+
+        El rango se arma con los conteos diarios cacheados de cada mes, así
+        cualquier rango reutiliza los meses ya calculados. Las semanas de los
+        bordes solo cuentan los días dentro del rango.
+        """
+        primera, ultima = _rango_visitas()
+        if primera is None:
+            return []
+        desde = max(date.fromisoformat(str(fecha_inicio)), primera) if fecha_inicio else primera
+        hasta = min(date.fromisoformat(str(fecha_fin)), ultima) if fecha_fin else ultima
+
+        meses = []
+        mes = inicio_de_mes(desde)
+        while mes <= hasta:
+            meses.append(mes)
+            mes = mes_siguiente(mes)
+
+        periodo_de = GRANULARIDADES[granularidad]
+        conteos = {}
+        for dias in _visitas_por_dia(meses).values():
+            for dia, cantidad in dias:
+                if desde <= dia <= hasta:
+                    periodo = periodo_de(dia)
+                    conteos[periodo] = conteos.get(periodo, 0) + cantidad
+        return [{granularidad: periodo, 'count': conteos[periodo]} for periodo in sorted(conteos)]
 
     @staticmethod
     def get_reporte_institucion(institucion_id, fecha_inicio=None, fecha_fin=None):
         """Reporte detallado de una institución - CON CACHÉ"""
-        cache_key = f'reporte_inst_{institucion_id}_{fecha_inicio}_{fecha_fin}'
-        reporte = cache.get(cache_key)
-        
-        if reporte is None:
+        def calcular():
             institucion = Institucion.objects.get(id=institucion_id)
             visitas = VisitaAuditoria.objects.filter(institucion=institucion)
             
@@ -73,7 +238,13 @@ class ReportService:
             if fecha_fin:
                 visitas = visitas.filter(fecha__lte=fecha_fin)
             
-            platos = PlatoObservado.objects.filter(visita__in=visitas).select_related('visita')
+            resumenes = _resumenes(fecha_inicio, fecha_fin).filter(institucion=institucion)
+            sumas = resumenes.aggregate(
+                total_visitas=Sum('cantidad_visitas'),
+                total_platos=Sum('cantidad_platos'),
+                **_sumas_promedios(),
+            )
+            total_platos = sumas['total_platos'] or 0
             
             reporte = {
                 'institucion': {
@@ -82,78 +253,64 @@ class ReportService:
                     'codigo': institucion.codigo,
                     'tipo': institucion.tipo,
                 },
-                'total_visitas': visitas.count(),
+                'total_visitas': sumas['total_visitas'] or 0,
                 'visitas_por_tipo_comida': list(
-                    visitas.values('tipo_comida')
-                    .annotate(count=Count('id'))
-                ),
-                'total_platos': platos.count(),
-                'promedios_nutricionales': platos.aggregate(
-                    energia_promedio=Avg('energia_kcal_total'),
-                    proteinas_promedio=Avg('proteinas_g_total'),
-                    grasas_promedio=Avg('grasas_totales_g_total'),
-                    carbohidratos_promedio=Avg('carbohidratos_g_total'),
-                    fibra_promedio=Avg('fibra_g_total'),
-                    sodio_promedio=Avg('sodio_mg_total'),
+                    resumenes.values('tipo_comida')
+                    .annotate(count=Sum('cantidad_visitas'))
                 ),
+                'total_platos': total_platos,
+                'promedios_nutricionales': {
+                    f'{clave}_promedio': valor
+                    for clave, valor in _promedios(sumas).items()
+                },
                 'ultimas_visitas': list(
                     visitas.order_by('-fecha')[:10]
                     .values('id', 'fecha', 'tipo_comida', 'observaciones')
                 ),
             }
-            # Caché por 5 minutos
-            cache.set(cache_key, reporte, 300)
-        
-        return reporte
+            return reporte
+
+        # Caché por 6 horas, invalidada por tags
+        return obtener_o_calcular(
+            f'reporte_inst_{institucion_id}_{fecha_inicio}_{fecha_fin}',
+            [tag_institucion(institucion_id)],
+            TIMEOUT_REPORTES,
+            calcular,
+        )
 
     @staticmethod
     def get_ranking_instituciones(fecha_inicio=None, fecha_fin=None, limit=10):
         """Ranking de instituciones por cantidad de visitas - CON CACHÉ"""
-        cache_key = f'ranking_{fecha_inicio}_{fecha_fin}_{limit}'
-        ranking = cache.get(cache_key)
-        
-        if ranking is None:
-            queryset = VisitaAuditoria.objects.all()
-            
-            if fecha_inicio:
-                queryset = queryset.filter(fecha__gte=fecha_inicio)
-            if fecha_fin:
-                queryset = queryset.filter(fecha__lte=fecha_fin)
-            
-            ranking = list(
-                queryset.values('institucion__id', 'institucion__nombre', 'institucion__tipo')
-                .annotate(total_visitas=Count('id'))
+        def calcular():
+            return list(
+                _resumenes(fecha_inicio, fecha_fin)
+                .values('institucion__id', 'institucion__nombre', 'institucion__tipo')
+                .annotate(total_visitas=Sum('cantidad_visitas'))
                 .order_by('-total_visitas')[:limit]
             )
-            # Caché por 10 minutos
-            cache.set(cache_key, ranking, 600)
-        
-        return ranking
+
+        # Caché por 6 horas, invalidada por tags
+        return obtener_o_calcular(
+            f'ranking_{fecha_inicio}_{fecha_fin}_{limit}',
+            [*tags_periodo(fecha_inicio, fecha_fin), TAG_INSTITUCIONES],
+            TIMEOUT_REPORTES,
+            calcular,
+        )
 
     @staticmethod
     def get_comparativa_nutricional(institucion_ids, fecha_inicio=None, fecha_fin=None):
         """Comparativa nutricional entre instituciones - OPTIMIZADO"""
         from django.db.models import F, Subquery, OuterRef
         
-        # Filtrar visitas
-        visitas_qs = VisitaAuditoria.objects.filter(institucion_id__in=institucion_ids)
-        if fecha_inicio:
-            visitas_qs = visitas_qs.filter(fecha__gte=fecha_inicio)
-        if fecha_fin:
-            visitas_qs = visitas_qs.filter(fecha__lte=fecha_fin)
-        
-        # Una sola query con aggregates por institución
-        resultados = visitas_qs.values(
+        # Una sola query con aggregates por institución sobre los resúmenes diarios
+        resultados = _resumenes(fecha_inicio, fecha_fin).filter(
+            institucion_id__in=institucion_ids
+        ).values(
             'institucion__id', 'institucion__nombre'
         ).annotate(
-            total_visitas=Count('id', distinct=True),
-            total_platos=Count('platos', distinct=True),
-            energia=Avg('platos__energia_kcal_total'),
-            proteinas=Avg('platos__proteinas_g_total'),
-            grasas=Avg('platos__grasas_totales_g_total'),
-            carbohidratos=Avg('platos__carbohidratos_g_total'),
-            fibra=Avg('platos__fibra_g_total'),
-            sodio=Avg('platos__sodio_mg_total'),
+            total_visitas=Sum('cantidad_visitas'),
+            total_platos=Sum('cantidad_platos'),
+            **_sumas_promedios(),
         ).order_by('institucion__nombre')
         
         # Formatear respuesta
@@ -162,96 +319,113 @@ class ReportService:
                 'institucion_id': r['institucion__id'],
                 'institucion_nombre': r['institucion__nombre'],
                 'total_visitas': r['total_visitas'],
-                'total_platos': r['total_platos'],
-                'promedios': {
-                    'energia': r['energia'],
-                    'proteinas': r['proteinas'],
-                    'grasas': r['grasas'],
-                    'carbohidratos': r['carbohidratos'],
-                    'fibra': r['fibra'],
-                    'sodio': r['sodio'],
-                }
+                'total_platos': r['total_platos'] or 0,
+                'promedios': _promedios(r),
+                'desvios': _desvios(r),
             }
             for r in resultados
         ]
 
     @staticmethod
     def get_instituciones_con_filtros(fecha_inicio=None, fecha_fin=None, filtros=None):
-        """Instituciones que cumplen con filtros del formulario"""
-        from django.db.models import Q, Count
-        
-        # Filtrar visitas por fecha
-        visitas_qs = VisitaAuditoria.objects.select_related('institucion')
+        """Instituciones que cumplen con filtros del formulario.
+
+        Cada criterio es un subquery sobre las visitas o las respuestas indexadas
+        (RespuestaFormulario); se intersectan en una sola consulta.
+        """
+        visitas_qs = VisitaAuditoria.objects.order_by()
         if fecha_inicio:
             visitas_qs = visitas_qs.filter(fecha__gte=fecha_inicio)
         if fecha_fin:
             visitas_qs = visitas_qs.filter(fecha__lte=fecha_fin)
+        visitas_con_formulario = visitas_qs.filter(formulario_completado=True)
+        
+        # Instituciones con visitas en el rango, con su cantidad de visitas
+        instituciones = (
+            _resumenes(fecha_inicio, fecha_fin)
+            .values('institucion__id', 'institucion__nombre', 'institucion__codigo', 'institucion__tipo')
+            .annotate(total_visitas=Sum('cantidad_visitas'))
+            .order_by('institucion__nombre', 'institucion__id')
+        )
         
-        # Obtener todas las instituciones con visitas
-        instituciones_ids = visitas_qs.values_list('institucion_id', flat=True).distinct()
-        instituciones = Institucion.objects.filter(id__in=instituciones_ids)
+        cumplen = None
+        if filtros:
+            # Se exige al menos una visita con formulario completado
+            queryset = Institucion.objects.filter(id__in=visitas_con_formulario.values('institucion_id'))
+            for campo, valor_esperado in filtros.items():
+                # Filtros especiales
+                if campo == 'tipo_institucion':
+                    queryset = queryset.filter(tipo__iexact=valor_esperado)
+                elif campo == 'tipo_comida':
+                    queryset = queryset.filter(
+                        id__in=visitas_qs.filter(tipo_comida__icontains=valor_esperado).values('institucion_id')
+                    )
+                else:
+                    # Buscar en las respuestas del formulario
+                    queryset = queryset.filter(
+                        id__in=RespuestaFormulario.objects.filter(
+                            filtro_respuesta(campo, valor_esperado),
+                            visita__in=visitas_con_formulario,
+                        ).values('visita__institucion_id')
+                    )
+            cumplen = set(queryset.order_by().values_list('id', flat=True))
+        
+        return [
+            {
+                'id': inst['institucion__id'],
+                'nombre': inst['institucion__nombre'],
+                'codigo': inst['institucion__codigo'],
+                'tipo': inst['institucion__tipo'],
+                'total_visitas': inst['total_visitas'],
+                'cumple_criterios': cumplen is None or inst['institucion__id'] in cumplen,
+            }
+            for inst in instituciones
+        ]
+
+    @staticmethod
+    def get_frecuencias_respuestas(pregunta, por=(), seccion=None, valor=None, tipo_institucion=None,
+                                   comuna=None, fecha_inicio=None, fecha_fin=None):
+        """Frecuencia de cada respuesta a una pregunta, agrupada por las dimensiones de `por`.
+
+        Lee el cubo FrecuenciaRespuesta. Los porcentajes son sobre quienes respondieron
+        la pregunta en el mismo grupo. Las fechas se redondean al mes, y las
+        instituciones se cuentan por mes: sin agrupar por `mes` se suman instituciones-mes.
+        """
+        por = [dimension for dimension in DIMENSIONES_FRECUENCIA if dimension in por]
+        
+        cubo = FrecuenciaRespuesta.objects.filter(pregunta=pregunta).order_by()
+        if seccion:
+            cubo = cubo.filter(seccion=seccion)
+        if tipo_institucion:
+            cubo = cubo.filter(tipo_institucion__iexact=tipo_institucion)
+        if comuna:
+            cubo = cubo.filter(comuna=comuna)
+        if fecha_inicio:
+            cubo = cubo.filter(mes__gte=inicio_de_mes(date.fromisoformat(fecha_inicio)))
+        if fecha_fin:
+            cubo = cubo.filter(mes__lte=inicio_de_mes(date.fromisoformat(fecha_fin)))
+        
+        respuestas = cubo.filter(valor__isnull=False)
+        if valor is not None:
+            respuestas = respuestas.filter(valor=valor.lower())
+        
+        conteos = {'total_visitas': Sum('visitas'), 'total_instituciones': Sum('instituciones')}
+        totales = {
+            tuple(fila[d] for d in por): fila
+            for fila in cubo.filter(valor__isnull=True).values(*por).annotate(**conteos)
+        }
         
-        # Construir respuesta
         resultados = []
-        for inst in instituciones:
-            visitas_inst = visitas_qs.filter(institucion=inst)
-            total_visitas = visitas_inst.count()
-            
-            # Verificar cumplimiento de criterios
-            cumple = True
-            visitas_con_formulario = visitas_inst.filter(formulario_completado=True)
-            
-            if filtros and visitas_con_formulario.exists():
-                for campo, valor_esperado in filtros.items():
-                    campo_encontrado = False
-                    
-                    # Filtros especiales
-                    if campo == 'tipo_institucion':
-                        if inst.tipo.lower() != valor_esperado.lower():
-                            cumple = False
-                            break
-                        campo_encontrado = True
-                    elif campo == 'tipo_comida':
-                        if not visitas_inst.filter(tipo_comida__icontains=valor_esperado).exists():
-                            cumple = False
-                            break
-                        campo_encontrado = True
-                    else:
-                        # Buscar en formulario_respuestas
-                        for visita in visitas_con_formulario:
-                            if visita.formulario_respuestas:
-                                for seccion, respuestas in visita.formulario_respuestas.items():
-                                    if campo in respuestas:
-                                        valor_real = respuestas[campo]
-                                        
-                                        # Comparar valores
-                                        if isinstance(valor_real, bool):
-                                            valor_esperado_bool = valor_esperado.lower() in ['true', 'si', 'sí', '1', 'yes']
-                                            if valor_real == valor_esperado_bool:
-                                                campo_encontrado = True
-                                                break
-                                        else:
-                                            if str(valor_real).lower() == valor_esperado.lower():
-                                                campo_encontrado = True
-                                                break
-                                
-                                if campo_encontrado:
-                                    break
-                    
-                    if not campo_encontrado:
-                        cumple = False
-                        break
-            elif filtros:
-                # Si hay filtros pero no hay formularios completados
-                cumple = False
-            
+        for fila in respuestas.values(*por, 'valor').annotate(**conteos).order_by(*por, 'valor'):
+            total = totales.get(tuple(fila[d] for d in por), {})
             resultados.append({
-                'id': inst.id,
-                'nombre': inst.nombre,
-                'codigo': inst.codigo,
-                'tipo': inst.tipo,
-                'total_visitas': total_visitas,
-                'cumple_criterios': cumple,
+                **{d: fila[d] for d in por},
+                'valor': fila['valor'],
+                'visitas': fila['total_visitas'],
+                'instituciones': fila['total_instituciones'],
+                'porcentaje_visitas': _porcentaje(fila['total_visitas'], total.get('total_visitas')),
+                'porcentaje_instituciones': _porcentaje(
+                    fila['total_instituciones'], total.get('total_instituciones')
+                ),
             })
-        
         return resultados
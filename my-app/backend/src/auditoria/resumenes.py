@@ -0,0 +1,128 @@
+"""Mantenimiento de ResumenDiario, la tabla de acumulados que leen los reportes.
+
+Cada fila resume las visitas de una (institución, fecha, tipo de comida). Al
+modificar visitas o platos se recalculan solo las claves afectadas; el comando
+`reconciliar_resumenes` recalcula rangos completos.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from nutricion.matriz import CAMPOS_APORTE
+from core.cache import invalidar
+from .models import VisitaAuditoria, PlatoObservado, ResumenDiario, CAMPOS_RESUMEN
+from .reports import tags_de_visitas
+
+CLAVE = ('institucion_id', 'fecha', 'tipo_comida')
+
+
+def claves_de_visitas(visita_ids, batch_size=1000):
+    """Claves (institucion_id, fecha, tipo_comida) de las visitas indicadas."""
+    visita_ids = sorted(set(visita_ids))
+    claves = set()
+    for i in range(0, len(visita_ids), batch_size):
+        claves.update(
+            VisitaAuditoria.objects.filter(id__in=visita_ids[i:i + batch_size])
+            .order_by()
+            .values_list(*CLAVE)
+            .distinct()
+        )
+    return claves
+
+
+def programar_refresco(visita_ids=(), claves=()):
+    """Refresca los resúmenes afectados cuando se confirma la transacción en curso.
+
+    Esperar al commit garantiza que el recálculo lea los datos definitivos: si dos
+    escrituras tocan la misma clave, la última en refrescar ve ambas.
+    """
+    claves = set(claves) | claves_de_visitas(visita_ids)
+    if claves:
+        transaction.on_commit(lambda: refrescar_resumenes(claves))
+
+
+def refrescar_resumenes(claves, batch_size=200):
+    """Recalcula las filas de ResumenDiario de las claves indicadas."""
+    claves = sorted(set(claves))
+    for i in range(0, len(claves), batch_size):
+        lote = claves[i:i + batch_size]
+        filtro = reduce(or_, (Q(institucion_id=inst, fecha=fecha, tipo_comida=tipo) for inst, fecha, tipo in lote))
+        _guardar(agregar(VisitaAuditoria.objects.filter(filtro)), lote)
+        invalidar(*tags_de_visitas(lote))
+
+
+def reconciliar(desde, hasta):
+    """Recalcula todas las filas con fecha entre `desde` y `hasta` (inclusive).
+
+    Devuelve la cantidad de filas escritas y borradas.
+    """
+    resumenes = agregar(VisitaAuditoria.objects.filter(fecha__gte=desde, fecha__lte=hasta))
+    sobrantes = {
+        pk: tuple(clave)
+        for pk, *clave in ResumenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        .order_by()
+        .values_list('id', *CLAVE)
+        if tuple(clave) not in resumenes
+    }
+    with transaction.atomic():
+        ResumenDiario.objects.filter(id__in=list(sobrantes)).delete()
+        _escribir(resumenes.values())
+    invalidar(*tags_de_visitas(resumenes), *tags_de_visitas(sobrantes.values()))
+    return len(resumenes), len(sobrantes)
+
+
+def agregar(visitas):
+    """Resúmenes (sin guardar) de un queryset de visitas, indexados por clave.
+
+    Dos consultas agrupadas: una sobre las visitas (cantidades y sumas ya
+    materializadas en cada visita) y otra sobre sus platos para las sumas de
+    cuadrados.
+    """
+    resumenes = {}
+    for fila in visitas.order_by().values(*CLAVE).annotate(
+        suma_cantidad_visitas=Count('id'),
+        suma_cantidad_platos=Sum('cantidad_platos'),
+        suma_cantidad_platos_con_totales=Sum('cantidad_platos_con_totales'),
+        suma_porciones_servidas=Sum('porciones_servidas_total'),
+        **{f'suma_{campo}_suma': Sum(f'{campo}_total') for campo in CAMPOS_APORTE},
+    ):
+        clave = tuple(fila[c] for c in CLAVE)
+        resumenes[clave] = ResumenDiario(
+            **dict(zip(CLAVE, clave)),
+            **{campo.removeprefix('suma_'): valor or 0 for campo, valor in fila.items() if campo.startswith('suma_')},
+        )
+
+    cuadrados = {
+        f'{campo}_suma_cuadrados': Sum(F(f'{campo}_total') * F(f'{campo}_total'), output_field=DecimalField())
+        for campo in CAMPOS_APORTE
+    }
+    for fila in (
+        PlatoObservado.objects.filter(visita__in=visitas.values('id'))
+        .order_by()
+        .values(*(f'visita__{c}' for c in CLAVE))
+        .annotate(**cuadrados)
+    ):
+        resumen = resumenes[tuple(fila.pop(f'visita__{c}') for c in CLAVE)]
+        for campo, valor in fila.items():
+            setattr(resumen, campo, valor or 0)
+
+    return resumenes
+
+
+def _guardar(resumenes, claves):
+    with transaction.atomic():
+        vacias = [clave for clave in claves if clave not in resumenes]
+        if vacias:
+            ResumenDiario.objects.filter(
+                reduce(or_, (Q(**dict(zip(CLAVE, clave))) for clave in vacias))
+            ).delete()
+        _escribir(resumenes.values())
+
+
+def _escribir(resumenes, batch_size=500):
+    """Inserta o actualiza (upsert) las filas por su clave única."""
+    opciones = {'update_conflicts': True, 'update_fields': list(CAMPOS_RESUMEN)}
+    if connection.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = ['institucion', 'fecha', 'tipo_comida']
+    ResumenDiario.objects.bulk_create(list(resumenes), batch_size=batch_size, **opciones)
@@ -1,61 +1,89 @@
 from rest_framework import serializers
-from .models import Institucion, VisitaAuditoria, PlatoObservado, IngredientePlato, PlatoPlantilla, IngredientePlantilla
+from core.campos import CamposDinamicosMixin
+from nutricion.serializers import AlimentoNutricionalSerializer
+from .models import (
+    Institucion, VisitaAuditoria, PlatoObservado, IngredientePlato, PlatoPlantilla, IngredientePlantilla, TrabajoReporte,
+    CAMPOS_VISITA,
+)
 
 
-class InstitucionSerializer(serializers.ModelSerializer):
+class InstitucionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Institucion
         fields = '__all__'
 
 
-class IngredientePlatoSerializer(serializers.ModelSerializer):
+class IngredientePlatoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     alimento_nombre = serializers.CharField(source='alimento.nombre', read_only=True)
     
     class Meta:
         model = IngredientePlato
         fields = '__all__'
-        read_only_fields = ['energia_kcal', 'proteinas_g', 'grasas_totales_g', 
-                           'carbohidratos_g', 'fibra_g', 'sodio_mg']
+        expandibles = {'alimento': AlimentoNutricionalSerializer}
+        read_only_fields = ['energia_kcal', 'proteinas_g', 'grasas_totales_g', 'carbohidratos_g', 'agua_g',
+                           'fibra_g', 'sodio_mg', 'calcio_mg', 'hierro_mg', 'zinc_mg', 'vitamina_c_mg',
+                           'potasio_mg', 'fosforo_mg', 'grasas_saturadas_g', 'grasas_monoinsat_g',
+                           'grasas_poliinsat_g']
 
 
-class PlatoObservadoSerializer(serializers.ModelSerializer):
+class IngredientePlatoLoteSerializer(serializers.ModelSerializer):
+    """Fila de la carga masiva de ingredientes de un plato (sin consultas por fila)"""
+    id = serializers.IntegerField(required=False)
+    alimento = serializers.IntegerField(source='alimento_id')
+    
+    class Meta:
+        model = IngredientePlato
+        fields = ['id', 'alimento', 'cantidad', 'unidad', 'orden']
+
+
+class PlatoObservadoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     ingredientes = IngredientePlatoSerializer(many=True, read_only=True)
     
     class Meta:
         model = PlatoObservado
         fields = '__all__'
         read_only_fields = ['energia_kcal_total', 'proteinas_g_total', 'grasas_totales_g_total',
-                           'carbohidratos_g_total', 'fibra_g_total', 'sodio_mg_total']
+                           'carbohidratos_g_total', 'agua_g_total', 'fibra_g_total', 'sodio_mg_total',
+                           'calcio_mg_total', 'hierro_mg_total', 'zinc_mg_total', 'vitamina_c_mg_total',
+                           'potasio_mg_total', 'fosforo_mg_total', 'grasas_saturadas_g_total',
+                           'grasas_monoinsat_g_total', 'grasas_poliinsat_g_total']
 
 
-class VisitaAuditoriaSerializer(serializers.ModelSerializer):
+class VisitaAuditoriaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     platos = PlatoObservadoSerializer(many=True, read_only=True)
     institucion_nombre = serializers.CharField(source='institucion.nombre', read_only=True)
     
     class Meta:
         model = VisitaAuditoria
         fields = '__all__'
-        read_only_fields = []
+        read_only_fields = list(CAMPOS_VISITA)
+        expandibles = {'institucion': InstitucionSerializer}
 
 
-class VisitaAuditoriaListSerializer(serializers.ModelSerializer):
+class VisitaAuditoriaListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     institucion_nombre = serializers.CharField(source='institucion.nombre', read_only=True)
-    cantidad_platos = serializers.IntegerField(read_only=True)  # Ya viene del annotate
+    cantidad_platos = serializers.IntegerField(read_only=True)  # Materializado en la visita
     
     class Meta:
         model = VisitaAuditoria
         fields = ['id', 'institucion', 'institucion_nombre', 'fecha', 'tipo_comida', 'cantidad_platos']
+        expandibles = {'institucion': InstitucionSerializer}
 
 
-class IngredientePlantillaSerializer(serializers.ModelSerializer):
+class IngredientePlantillaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     alimento_nombre = serializers.CharField(source='alimento.nombre', read_only=True)
     
     class Meta:
         model = IngredientePlantilla
         fields = '__all__'
+        expandibles = {'alimento': AlimentoNutricionalSerializer}
+        read_only_fields = ['energia_kcal', 'proteinas_g', 'grasas_totales_g', 'carbohidratos_g', 'agua_g',
+                           'fibra_g', 'sodio_mg', 'calcio_mg', 'hierro_mg', 'zinc_mg', 'vitamina_c_mg',
+                           'potasio_mg', 'fosforo_mg', 'grasas_saturadas_g', 'grasas_monoinsat_g',
+                           'grasas_poliinsat_g']
 
 
-class PlatoPlantillaSerializer(serializers.ModelSerializer):
+class PlatoPlantillaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     ingredientes_plantilla = IngredientePlantillaSerializer(many=True, read_only=True)
     cantidad_ingredientes = serializers.IntegerField(source='ingredientes_plantilla.count', read_only=True)
     
@@ -63,4 +91,15 @@ class PlatoPlantillaSerializer(serializers.ModelSerializer):
         model = PlatoPlantilla
         fields = '__all__'
         read_only_fields = ['energia_kcal_total', 'proteinas_g_total', 'grasas_totales_g_total',
-                           'carbohidratos_g_total', 'fibra_g_total', 'sodio_mg_total']
+                           'carbohidratos_g_total', 'agua_g_total', 'fibra_g_total', 'sodio_mg_total',
+                           'calcio_mg_total', 'hierro_mg_total', 'zinc_mg_total', 'vitamina_c_mg_total',
+                           'potasio_mg_total', 'fosforo_mg_total', 'grasas_saturadas_g_total',
+                           'grasas_monoinsat_g_total', 'grasas_poliinsat_g_total']
+
+
+class TrabajoReporteSerializer(serializers.ModelSerializer):
+    """Estado de un trabajo; el resultado se pide aparte (puede ser grande)."""
+    class Meta:
+        model = TrabajoReporte
+        fields = ['id', 'tipo', 'parametros', 'estado', 'error', 'creado', 'iniciado', 'finalizado']
+        read_only_fields = fields
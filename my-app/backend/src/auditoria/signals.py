@@ -0,0 +1,135 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from nutricion.models import AlimentoNutricional
+from nutricion.matriz import CAMPOS_ALIMENTO
+from .models import Institucion, VisitaAuditoria, PlatoPlantilla, IngredientePlantilla
+from .formularios import indexar_visitas
+from .nutrientes import TAG_PLANTILLAS, propagar_cambio_alimento
+from .resumenes import CLAVE, programar_refresco
+from core.cache import invalidar, marcar_modificados
+from . import frecuencias
+from .reports import TAG_INSTITUCIONES, tag_institucion
+
+
+@receiver(pre_save, sender=AlimentoNutricional)
+def guardar_valores_anteriores(sender, instance, **kwargs):
+    """Recuerda los nutrientes que tenía el alimento antes de guardarse."""
+    if instance.pk:
+        instance._nutrientes_anteriores = (
+            AlimentoNutricional.objects.filter(pk=instance.pk).values(*CAMPOS_ALIMENTO).first()
+        )
+
+
+@receiver(post_save, sender=AlimentoNutricional)
+def propagar_nutrientes(sender, instance, created, **kwargs):
+    """Refresca aportes y totales que usan el alimento si cambiaron sus nutrientes."""
+    anteriores = getattr(instance, '_nutrientes_anteriores', None)
+    if created or not anteriores:
+        return
+    nuevos = {campo: getattr(instance, campo) for campo in CAMPOS_ALIMENTO}
+    propagar_cambio_alimento(instance.pk, anteriores, nuevos)
+
+
+@receiver(pre_save, sender=VisitaAuditoria)
+def guardar_clave_anterior(sender, instance, **kwargs):
+    """Recuerda las claves de resumen y de frecuencias previas de la visita."""
+    if instance.pk:
+        anterior = (
+            VisitaAuditoria.objects.filter(pk=instance.pk)
+            .values_list(*CLAVE, 'formulario_completado', 'institucion__tipo', 'institucion__comuna')
+            .first()
+        )
+        if anterior:
+            instance._clave_anterior = anterior[:3]
+            # Celda del cubo de frecuencias a la que contribuía el formulario
+            if anterior[3]:
+                instance._celda_anterior = (anterior[4], anterior[5], frecuencias.inicio_de_mes(anterior[1]))
+
+
+def _fecha(visita):
+    # La fecha puede venir como texto si la visita se creó sin pasar por un serializer
+    return VisitaAuditoria._meta.get_field('fecha').to_python(visita.fecha)
+
+
+def _clave(visita):
+    return (visita.institucion_id, _fecha(visita), visita.tipo_comida)
+
+
+@receiver(post_save, sender=VisitaAuditoria)
+def refrescar_resumen_visita(sender, instance, **kwargs):
+    claves = {_clave(instance)}
+    if getattr(instance, '_clave_anterior', None):
+        claves.add(instance._clave_anterior)
+    programar_refresco(claves=claves)
+
+
+@receiver(post_delete, sender=VisitaAuditoria)
+def refrescar_resumen_visita_borrada(sender, instance, **kwargs):
+    programar_refresco(claves={_clave(instance)})
+
+
+@receiver(post_save, sender=VisitaAuditoria)
+def indexar_respuestas_formulario(sender, instance, created, update_fields, **kwargs):
+    """Regenera las respuestas indexadas del formulario de la visita."""
+    if update_fields is not None and 'formulario_respuestas' not in update_fields:
+        return
+    if created and not instance.formulario_respuestas:
+        return
+    indexar_visitas([instance])
+
+
+def _celda(visita):
+    return (visita.institucion.tipo, visita.institucion.comuna, frecuencias.inicio_de_mes(_fecha(visita)))
+
+
+@receiver(post_save, sender=VisitaAuditoria)
+def refrescar_frecuencias_visita(sender, instance, **kwargs):
+    """Refresca las celdas del cubo de frecuencias de la visita (la anterior y la actual)."""
+    celdas = set()
+    if getattr(instance, '_celda_anterior', None):
+        celdas.add(instance._celda_anterior)
+    if instance.formulario_completado:
+        celdas.add(_celda(instance))
+    frecuencias.programar_refresco(claves=celdas)
+
+
+@receiver(post_delete, sender=VisitaAuditoria)
+def refrescar_frecuencias_visita_borrada(sender, instance, **kwargs):
+    if instance.formulario_completado:
+        frecuencias.programar_refresco(claves={_celda(instance)})
+
+
+@receiver(pre_save, sender=Institucion)
+def guardar_dimensiones_anteriores(sender, instance, **kwargs):
+    if instance.pk:
+        instance._dimensiones_anteriores = (
+            Institucion.objects.filter(pk=instance.pk).values_list('tipo', 'comuna').first()
+        )
+
+
+@receiver(post_save, sender=Institucion)
+def refrescar_frecuencias_institucion(sender, instance, created, **kwargs):
+    """Mueve las respuestas de la institución en el cubo si cambió su tipo o comuna."""
+    anteriores = getattr(instance, '_dimensiones_anteriores', None)
+    if created or not anteriores or anteriores == (instance.tipo, instance.comuna):
+        return
+    meses = instance.visitas.filter(formulario_completado=True).dates('fecha', 'month')
+    celdas = set()
+    for mes in meses:
+        celdas.add((*anteriores, mes))
+        celdas.add((instance.tipo, instance.comuna, mes))
+    frecuencias.programar_refresco(claves=celdas)
+
+
+@receiver([post_save, post_delete], sender=Institucion)
+def invalidar_cache_institucion(sender, instance, **kwargs):
+    """Invalida los reportes que muestran datos de la institución y la versión del catálogo."""
+    invalidar(tag_institucion(instance.pk))
+    marcar_modificados(TAG_INSTITUCIONES)
+
+
+@receiver([post_save, post_delete], sender=PlatoPlantilla)
+@receiver([post_save, post_delete], sender=IngredientePlantilla)
+def plantilla_modificada(sender, **kwargs):
+    marcar_modificados(TAG_PLANTILLAS)
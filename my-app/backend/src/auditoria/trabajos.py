@@ -0,0 +1,157 @@
+"""Ejecución en segundo plano de reportes pesados.
+
+Un pedido crea un TrabajoReporte y se ejecuta en un pool de hilos del propio
+proceso (sin broker externo): el estado vive en la base, así cualquier worker
+puede responder la consulta por id. Los parámetros se normalizan y, junto con
+la versión de los tags de los datos que usa el reporte, identifican el trabajo:
+un pedido igual a uno pendiente, en curso o terminado sobre los mismos datos
+devuelve ese trabajo en lugar de calcular de nuevo.
+
+Si el proceso se reinicia con trabajos sin terminar, quedan abandonados: el
+próximo pedido igual crea uno nuevo, y `manage.py ejecutar_trabajos` los corre.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from core.cache import version_tags
+from .models import TrabajoReporte
+from .reports import ReportService, TAG_INSTITUCIONES, TAG_VISITAS, tag_institucion
+
+logger = logging.getLogger(__name__)
+
+# Un trabajo sin terminar después de este tiempo se considera abandonado
+TIMEOUT_TRABAJO = timedelta(minutes=30)
+
+
+def _fecha(valor):
+    return date.fromisoformat(str(valor)).isoformat() if valor else None
+
+
+def _normalizar_comparativa(parametros):
+    institucion_ids = sorted({int(i) for i in parametros.get('institucion_ids') or []})
+    if not institucion_ids:
+        raise ValueError('institucion_ids es requerido')
+    return {
+        'institucion_ids': institucion_ids,
+        'fecha_inicio': _fecha(parametros.get('fecha_inicio')),
+        'fecha_fin': _fecha(parametros.get('fecha_fin')),
+    }
+
+
+def _normalizar_filtros(parametros):
+    filtros = parametros.get('filtros') or {}
+    if not isinstance(filtros, dict):
+        raise ValueError('filtros debe ser un objeto {campo: valor}')
+    return {
+        'fecha_inicio': _fecha(parametros.get('fecha_inicio')),
+        'fecha_fin': _fecha(parametros.get('fecha_fin')),
+        'filtros': {str(campo): str(valor) for campo, valor in filtros.items()},
+    }
+
+
+# Por tipo: normalización de parámetros, tags de los datos que usa y cálculo
+TIPOS = {
+    'comparativa_nutricional': {
+        'normalizar': _normalizar_comparativa,
+        'tags': lambda p: [tag_institucion(i) for i in p['institucion_ids']],
+        'calcular': lambda p: ReportService.get_comparativa_nutricional(
+            p['institucion_ids'], p['fecha_inicio'], p['fecha_fin']
+        ),
+    },
+    'instituciones_filtros': {
+        'normalizar': _normalizar_filtros,
+        'tags': lambda p: [TAG_VISITAS, TAG_INSTITUCIONES],
+        'calcular': lambda p: ReportService.get_instituciones_con_filtros(
+            p['fecha_inicio'], p['fecha_fin'], p['filtros']
+        ),
+    },
+}
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORTES_TRABAJOS_HILOS', 2),
+                thread_name_prefix='trabajos-reporte',
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _abandonado(trabajo):
+    if trabajo.estado not in ('pendiente', 'ejecutando'):
+        return False
+    return (trabajo.iniciado or trabajo.creado) < timezone.now() - TIMEOUT_TRABAJO
+
+
+def encolar(tipo, parametros):
+    """Crea (o reutiliza) el trabajo para el pedido. Devuelve (trabajo, creado).
+
+    Lanza ValueError/TypeError si los parámetros no son válidos.
+    """
+    definicion = TIPOS[tipo]
+    parametros = definicion['normalizar'](parametros)
+    clave = hashlib.sha256(json.dumps([tipo, parametros], sort_keys=True).encode()).hexdigest()
+    version = version_tags(definicion['tags'](parametros))
+
+    existente = (
+        TrabajoReporte.objects.filter(clave=clave, version=version)
+        .exclude(estado='error')
+        .order_by('-creado')
+        .first()
+    )
+    if existente is not None:
+        if not _abandonado(existente):
+            return existente, False
+        TrabajoReporte.objects.filter(pk=existente.pk, estado=existente.estado).update(
+            estado='error', error='Trabajo abandonado', finalizado=timezone.now()
+        )
+
+    trabajo = TrabajoReporte.objects.create(tipo=tipo, parametros=parametros, clave=clave, version=version)
+    transaction.on_commit(lambda: _obtener_pool().submit(_ejecutar_en_hilo, trabajo.pk))
+    return trabajo, True
+
+
+def _ejecutar_en_hilo(trabajo_id):
+    try:
+        ejecutar(trabajo_id)
+    finally:
+        # Cada hilo abre su propia conexión; se cierra al terminar el trabajo
+        connection.close()
+
+
+def ejecutar(trabajo_id):
+    """Ejecuta el trabajo si sigue pendiente (lo toma con un UPDATE condicional)."""
+    tomado = TrabajoReporte.objects.filter(pk=trabajo_id, estado='pendiente').update(
+        estado='ejecutando', iniciado=timezone.now()
+    )
+    if not tomado:
+        return
+    trabajo = TrabajoReporte.objects.get(pk=trabajo_id)
+    try:
+        resultado = TIPOS[trabajo.tipo]['calcular'](trabajo.parametros)
+        # Mismo formato que la respuesta síncrona de la API
+        trabajo.resultado = json.loads(json.dumps(resultado, cls=JSONEncoder))
+        trabajo.estado = 'completado'
+    except Exception as e:
+        logger.exception('Falló el trabajo de reporte %s', trabajo_id)
+        trabajo.estado = 'error'
+        trabajo.error = str(e)
+    trabajo.finalizado = timezone.now()
+    trabajo.save(update_fields=['resultado', 'estado', 'error', 'finalizado'])
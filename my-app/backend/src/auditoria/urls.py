@@ -7,12 +7,15 @@ from .views import (
     IngredientePlatoViewSet,
     PlatoPlantillaViewSet,
     IngredientePlantillaViewSet,
+    TrabajoReporteViewSet,
     dashboard_stats,
     visitas_por_periodo,
     reporte_institucion,
     ranking_instituciones,
     comparativa_nutricional,
     instituciones_con_filtros,
+    frecuencias_respuestas,
+    exportar_visitas,
 )
 
 router = DefaultRouter()
@@ -22,6 +25,7 @@ router.register(r'platos', PlatoObservadoViewSet)
 router.register(r'ingredientes', IngredientePlatoViewSet)
 router.register(r'platos-plantilla', PlatoPlantillaViewSet)
 router.register(r'ingredientes-plantilla', IngredientePlantillaViewSet)
+router.register(r'trabajos-reportes', TrabajoReporteViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -31,4 +35,6 @@ urlpatterns = [
     path('reportes/ranking/', ranking_instituciones, name='ranking-instituciones'),
     path('reportes/comparativa/', comparativa_nutricional, name='comparativa-nutricional'),
     path('reportes/instituciones-filtros/', instituciones_con_filtros, name='instituciones-filtros'),
+    path('reportes/frecuencias-respuestas/', frecuencias_respuestas, name='frecuencias-respuestas'),
+    path('exportar/visitas/', exportar_visitas, name='exportar-visitas'),
 ]
@@ -3,48 +3,61 @@ from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
-from django.core.cache import cache
-from django.db.models import Count
 from django.db import transaction
-from .models import Institucion, VisitaAuditoria, PlatoObservado, IngredientePlato, PlatoPlantilla, IngredientePlantilla
+from django.http import StreamingHttpResponse
+from core.campos import CamposDinamicosViewSetMixin, proyectar
+from core.condicional import GetCondicionalMixin
+from core.listados import ListadoRapidoMixin
+from nutricion.models import AlimentoNutricional
+from nutricion.matriz import TAG_CATALOGO
+from .models import (
+    Institucion, VisitaAuditoria, PlatoObservado, IngredientePlato, PlatoPlantilla, IngredientePlantilla, TrabajoReporte,
+    vector_aporte, aporte_guardado, redondear_aportes,
+)
 from .serializers import (
     InstitucionSerializer,
     VisitaAuditoriaSerializer,
     VisitaAuditoriaListSerializer,
     PlatoObservadoSerializer,
     IngredientePlatoSerializer,
+    IngredientePlatoLoteSerializer,
     PlatoPlantillaSerializer,
-    IngredientePlantillaSerializer
+    IngredientePlantillaSerializer,
+    TrabajoReporteSerializer,
 )
-from .reports import ReportService
+from .reports import ReportService, DIMENSIONES_FRECUENCIA, GRANULARIDADES, TAG_INSTITUCIONES
+from .nutrientes import TAG_PLANTILLAS, clonar_plantillas, guardar_ingredientes
+from .exportacion import FORMATOS, exportar, filtrar_visitas
+from .trabajos import TIPOS as TIPOS_TRABAJO, encolar
 
 
-class InstitucionViewSet(viewsets.ModelViewSet):
+class InstitucionViewSet(GetCondicionalMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = Institucion.objects.all()
     serializer_class = InstitucionSerializer
+    tags_catalogo = [TAG_INSTITUCIONES]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['tipo', 'activo', 'comuna']
     search_fields = ['nombre', 'codigo', 'barrio']
 
 
-class VisitaAuditoriaViewSet(viewsets.ModelViewSet):
+class VisitaAuditoriaViewSet(CamposDinamicosViewSetMixin, ListadoRapidoMixin, viewsets.ModelViewSet):
     queryset = VisitaAuditoria.objects.select_related('institucion').all()
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['institucion', 'tipo_comida', 'fecha']
     ordering_fields = ['fecha']
     ordering = ['-fecha']
+    # ?paginacion=cursor: keyset sobre el índice de fecha
+    orden_cursor = ('-fecha', 'id')
 
     def get_queryset(self):
         queryset = VisitaAuditoria.objects.select_related('institucion')
         
         if self.action == 'list':
-            return queryset.annotate(
-                cantidad_platos=Count('platos')
-            )
+            # cantidad_platos y los totales están materializados en la visita
+            return queryset
         
-        return queryset.prefetch_related(
-            'platos__ingredientes__alimento'
-        )
+        # Platos e ingredientes con las columnas que lee el serializer (del alimento, solo el nombre)
+        return proyectar(queryset, self.get_serializer_class()(), completo=True)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -52,11 +65,29 @@ class VisitaAuditoriaViewSet(viewsets.ModelViewSet):
         return VisitaAuditoriaSerializer
 
 
-class PlatoObservadoViewSet(viewsets.ModelViewSet):
-    queryset = PlatoObservado.objects.select_related('visita').prefetch_related('ingredientes__alimento').all()
+class PlatoObservadoViewSet(CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
+    queryset = PlatoObservado.objects.all()
     serializer_class = PlatoObservadoSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['visita']
+    orden_cursor = ('id',)
+
+    def get_queryset(self):
+        return proyectar(PlatoObservado.objects.all(), PlatoObservadoSerializer(), completo=True)
+
+    def perform_create(self, serializer):
+        plato = serializer.save()
+        VisitaAuditoria.recalcular_totales_de([plato.visita_id])
+
+    def perform_update(self, serializer):
+        visita_anterior = serializer.instance.visita_id
+        plato = serializer.save()
+        VisitaAuditoria.recalcular_totales_de({visita_anterior, plato.visita_id})
+
+    def perform_destroy(self, instance):
+        visita_id = instance.visita_id
+        instance.delete()
+        VisitaAuditoria.recalcular_totales_de([visita_id])
 
     @action(detail=True, methods=['post'])
     def recalcular(self, request, pk=None):
@@ -65,46 +96,106 @@ class PlatoObservadoViewSet(viewsets.ModelViewSet):
         totales = plato.recalcular_totales(save=True)
         return Response(totales)
 
+    @action(detail=True, methods=['put', 'patch'], url_path='ingredientes')
+    def guardar_ingredientes(self, request, pk=None):
+        """Guarda todos los ingredientes del plato en una sola request.
+
+        PUT reemplaza la lista completa; PATCH actualiza las filas con id y crea
+        las demás, sin borrar las existentes.
+        """
+        plato = self.get_object()
+        serializer = IngredientePlatoLoteSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        filas = serializer.validated_data
+        
+        alimento_ids = {fila['alimento_id'] for fila in filas}
+        faltantes = alimento_ids - set(
+            AlimentoNutricional.objects.filter(id__in=alimento_ids).values_list('id', flat=True)
+        )
+        if faltantes:
+            return Response(
+                {'error': f'Alimentos no encontrados: {sorted(faltantes)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            guardar_ingredientes(plato, filas, reemplazar=request.method == 'PUT')
+        except IngredientePlato.DoesNotExist as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        plato = self.get_queryset().get(pk=plato.pk)
+        return Response(PlatoObservadoSerializer(plato).data)
 
-class IngredientePlatoViewSet(viewsets.ModelViewSet):
-    queryset = IngredientePlato.objects.select_related('plato', 'alimento').all()
-    serializer_class = IngredientePlatoSerializer
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['plato']
+
+def _negativo(aporte):
+    return {campo: -valor for campo, valor in aporte.items()}
+
+
+class TotalesIncrementalesMixin:
+    """perform_* que mantienen los totales del plato aplicando solo el delta del ingrediente.
+
+    El aporte se calcula antes de guardar (un solo INSERT/UPDATE del ingrediente) y
+    la diferencia con el aporte guardado se suma a los totales con un UPDATE atómico.
+    Los deltas son diferencias exactas de valores redondeados como se guardan, así
+    los totales siguen siendo la suma de los aportes de sus ingredientes.
+    """
+    modelo_plato = None
+    campo_plato = None
 
     def perform_create(self, serializer):
+        alimento = serializer.validated_data['alimento']
+        cantidad = serializer.validated_data['cantidad']
+        aporte = redondear_aportes(vector_aporte(alimento.id, cantidad))
+
         with transaction.atomic():
-            ingrediente = serializer.save()
-            ingrediente.recalcular_aporte(save=False)
-            
-            plato = ingrediente.plato
-            plato.recalcular_totales(save=False)
-            
-            ingrediente.save()
-            plato.save()
-        
-        cache.delete('dashboard_stats')
+            ingrediente = serializer.save(**aporte)
+            self.modelo_plato.actualizar_totales(self._plato_id(ingrediente), aporte)
 
     def perform_update(self, serializer):
         with transaction.atomic():
-            ingrediente = serializer.save()
-            ingrediente.recalcular_aporte(save=False)
-            
-            plato = ingrediente.plato
-            plato.recalcular_totales(save=False)
-            
-            ingrediente.save()
-            plato.save()
-        
-        cache.delete('dashboard_stats')
+            # El aporte anterior sale de la fila bloqueada: dos PATCH simultáneos
+            # no restan el mismo aporte
+            anterior = type(serializer.instance).objects.select_for_update().get(pk=serializer.instance.pk)
+            serializer.instance = anterior
+            plato_anterior = self._plato_id(anterior)
+            aporte_anterior = aporte_guardado(anterior)
+
+            alimento = serializer.validated_data.get('alimento')
+            alimento_id = alimento.id if alimento is not None else anterior.alimento_id
+            cantidad = serializer.validated_data.get('cantidad', anterior.cantidad)
+            aporte = redondear_aportes(vector_aporte(alimento_id, cantidad))
+
+            ingrediente = serializer.save(**aporte)
+            plato_id = self._plato_id(ingrediente)
+            if plato_id == plato_anterior:
+                delta = {campo: valor - aporte_anterior[campo] for campo, valor in aporte.items()}
+                self.modelo_plato.actualizar_totales(plato_id, delta)
+            else:
+                self.modelo_plato.actualizar_totales(plato_anterior, _negativo(aporte_anterior))
+                self.modelo_plato.actualizar_totales(plato_id, aporte)
 
     def perform_destroy(self, instance):
+        aporte = aporte_guardado(instance)
+
         with transaction.atomic():
-            plato = instance.plato
+            plato_id = self._plato_id(instance)
             instance.delete()
-            plato.recalcular_totales(save=True)
-        
-        cache.delete('dashboard_stats')
+            self.modelo_plato.actualizar_totales(plato_id, _negativo(aporte))
+
+    def _plato_id(self, ingrediente):
+        return getattr(ingrediente, f'{self.campo_plato}_id')
+
+
+class IngredientePlatoViewSet(CamposDinamicosViewSetMixin, TotalesIncrementalesMixin, viewsets.ModelViewSet):
+    queryset = IngredientePlato.objects.all()
+    serializer_class = IngredientePlatoSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['plato']
+    modelo_plato = PlatoObservado
+    campo_plato = 'plato'
+
+    def get_queryset(self):
+        return proyectar(IngredientePlato.objects.all(), IngredientePlatoSerializer(), completo=True)
 
 
 @api_view(['GET'])
@@ -116,10 +207,20 @@ def dashboard_stats(request):
 
 @api_view(['GET'])
 def visitas_por_periodo(request):
-    """Visitas agrupadas por período"""
+    """Visitas agrupadas por período (granularidad: dia, semana o mes)"""
     fecha_inicio = request.query_params.get('fecha_inicio')
     fecha_fin = request.query_params.get('fecha_fin')
-    data = ReportService.get_visitas_por_periodo(fecha_inicio, fecha_fin)
+    granularidad = request.query_params.get('granularidad', 'dia')
+    if granularidad not in GRANULARIDADES:
+        return Response(
+            {'error': f'Granularidad inválida, opciones: {list(GRANULARIDADES)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        data = ReportService.get_visitas_por_periodo(fecha_inicio, fecha_fin, granularidad)
+    except ValueError:
+        return Response({'error': 'Formato de fecha inválido (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
     return Response(data)
 
 
@@ -175,13 +276,115 @@ def instituciones_con_filtros(request):
     return Response(data)
 
 
-class PlatoPlantillaViewSet(viewsets.ModelViewSet):
-    queryset = PlatoPlantilla.objects.prefetch_related('ingredientes_plantilla__alimento').all()
+@api_view(['GET'])
+def frecuencias_respuestas(request):
+    """Frecuencia de respuestas de una pregunta del formulario, por tipo, comuna y mes"""
+    pregunta = request.query_params.get('pregunta')
+    if not pregunta:
+        return Response({'error': 'El parámetro pregunta es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    por = [d for d in request.query_params.get('por', '').split(',') if d]
+    invalidas = set(por) - set(DIMENSIONES_FRECUENCIA)
+    if invalidas:
+        return Response(
+            {'error': f'Dimensiones inválidas: {sorted(invalidas)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        data = ReportService.get_frecuencias_respuestas(
+            pregunta,
+            por=por,
+            seccion=request.query_params.get('seccion'),
+            valor=request.query_params.get('valor'),
+            tipo_institucion=request.query_params.get('tipo_institucion'),
+            comuna=request.query_params.get('comuna'),
+            fecha_inicio=request.query_params.get('fecha_inicio'),
+            fecha_fin=request.query_params.get('fecha_fin'),
+        )
+    except ValueError:
+        return Response({'error': 'Formato de fecha inválido (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
+
+
+@api_view(['GET'])
+def exportar_visitas(request):
+    """Exportación completa de visitas, platos e ingredientes en CSV o JSON lines (streaming)"""
+    formato = request.query_params.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return Response(
+            {'error': f'Formato inválido, opciones: {list(FORMATOS)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        visitas = filtrar_visitas(
+            fecha_inicio=request.query_params.get('fecha_inicio'),
+            fecha_fin=request.query_params.get('fecha_fin'),
+            institucion_ids=[int(i) for i in request.query_params.getlist('institucion')],
+            tipo_comida=request.query_params.get('tipo_comida'),
+        )
+    except ValueError:
+        return Response(
+            {'error': 'Filtros inválidos (fechas YYYY-MM-DD, institucion numérica)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    tipo_contenido = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(exportar(visitas, formato), content_type=f'{tipo_contenido}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="visitas.{formato}"'
+    return response
+
+
+class TrabajoReporteViewSet(viewsets.ReadOnlyModelViewSet):
+    """Reportes pesados en segundo plano: POST crea el trabajo, GET consulta su estado"""
+    queryset = TrabajoReporte.objects.all()
+    serializer_class = TrabajoReporteSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['tipo', 'estado']
+
+    def create(self, request):
+        tipo = request.data.get('tipo')
+        if tipo not in TIPOS_TRABAJO:
+            return Response(
+                {'error': f'Tipo inválido, opciones: {list(TIPOS_TRABAJO)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            trabajo, creado = encolar(tipo, request.data.get('parametros') or {})
+        except (ValueError, TypeError, AttributeError) as e:
+            return Response({'error': f'Parámetros inválidos: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # 202 si se encoló un trabajo nuevo; 200 si se reutilizó uno igual
+        return Response(
+            self.get_serializer(trabajo).data,
+            status=status.HTTP_202_ACCEPTED if creado else status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['get'])
+    def resultado(self, request, pk=None):
+        """Resultado del trabajo terminado"""
+        trabajo = self.get_object()
+        if trabajo.estado == 'completado':
+            return Response(trabajo.resultado)
+        if trabajo.estado == 'error':
+            return Response({'error': trabajo.error}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(self.get_serializer(trabajo).data, status=status.HTTP_202_ACCEPTED)
+
+
+class PlatoPlantillaViewSet(GetCondicionalMixin, CamposDinamicosViewSetMixin, ListadoRapidoMixin, viewsets.ModelViewSet):
+    queryset = PlatoPlantilla.objects.all()
     serializer_class = PlatoPlantillaSerializer
+    # Los ingredientes muestran el nombre del alimento
+    tags_catalogo = [TAG_PLANTILLAS, TAG_CATALOGO]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['tipo_plato', 'activo']
     search_fields = ['nombre', 'descripcion']
 
+    def get_queryset(self):
+        return proyectar(PlatoPlantilla.objects.all(), PlatoPlantillaSerializer(), completo=True)
+
     @action(detail=True, methods=['post'])
     def recalcular(self, request, pk=None):
         plato = self.get_object()
@@ -202,56 +405,50 @@ class PlatoPlantillaViewSet(viewsets.ModelViewSet):
         except VisitaAuditoria.DoesNotExist:
             return Response({'error': 'Visita no encontrada'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Crear plato observado desde plantilla
-        plato = PlatoObservado.objects.create(
-            visita=visita,
-            nombre=plantilla.nombre,
-            tipo_plato=plantilla.tipo_plato,
-            energia_kcal_total=plantilla.energia_kcal_total,
-            proteinas_g_total=plantilla.proteinas_g_total,
-            grasas_totales_g_total=plantilla.grasas_totales_g_total,
-            carbohidratos_g_total=plantilla.carbohidratos_g_total,
-            fibra_g_total=plantilla.fibra_g_total,
-            sodio_mg_total=plantilla.sodio_mg_total
-        )
-        
-        # Copiar ingredientes con bulk_create (optimizado)
-        ingredientes_bulk = [
-            IngredientePlato(
-                plato=plato,
-                alimento=ing.alimento,
-                cantidad=ing.cantidad,
-                unidad=ing.unidad,
-                orden=ing.orden
-            )
-            for ing in plantilla.ingredientes_plantilla.all()
-        ]
-        IngredientePlato.objects.bulk_create(ingredientes_bulk)
-        
-        # Recalcular aportes y totales
-        for ing in plato.ingredientes.all():
-            ing.recalcular_aporte(save=True)
-        plato.recalcular_totales(save=True)
+        plato = plantilla.clonar_a_visita(visita)
+        plato = proyectar(PlatoObservado.objects.all(), PlatoObservadoSerializer(), completo=True).get(pk=plato.pk)
         
         serializer = PlatoObservadoSerializer(plato)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'])
+    def clonar_lote(self, request):
+        """Clona muchas plantillas en muchas visitas en una sola transacción.
+
+        Espera {"asignaciones": [{"plantilla_id": 1, "visita_id": 2}, ...]}.
+        """
+        asignaciones = request.data.get('asignaciones')
+        
+        if not isinstance(asignaciones, list) or not asignaciones:
+            return Response({'error': 'asignaciones requerido'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            pares = [(a['plantilla_id'], a['visita_id']) for a in asignaciones]
+            platos = clonar_plantillas(pares)
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {'error': 'Cada asignación requiere plantilla_id y visita_id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except (PlatoPlantilla.DoesNotExist, VisitaAuditoria.DoesNotExist) as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'platos_creados': len(platos),
+            'platos': [
+                {'id': plato.id, 'plantilla_id': plantilla_id, 'visita_id': plato.visita_id}
+                for plato, (plantilla_id, _) in zip(platos, pares)
+            ],
+        }, status=status.HTTP_201_CREATED)
+
 
-class IngredientePlantillaViewSet(viewsets.ModelViewSet):
-    queryset = IngredientePlantilla.objects.select_related('plato_plantilla', 'alimento').all()
+class IngredientePlantillaViewSet(CamposDinamicosViewSetMixin, TotalesIncrementalesMixin, viewsets.ModelViewSet):
+    queryset = IngredientePlantilla.objects.all()
     serializer_class = IngredientePlantillaSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['plato_plantilla']
+    modelo_plato = PlatoPlantilla
+    campo_plato = 'plato_plantilla'
 
-    def perform_create(self, serializer):
-        ingrediente = serializer.save()
-        ingrediente.plato_plantilla.recalcular_totales(save=True)
-
-    def perform_update(self, serializer):
-        ingrediente = serializer.save()
-        ingrediente.plato_plantilla.recalcular_totales(save=True)
-
-    def perform_destroy(self, instance):
-        plato = instance.plato_plantilla
-        instance.delete()
-        plato.recalcular_totales(save=True)
+    def get_queryset(self):
+        return proyectar(IngredientePlantilla.objects.all(), IngredientePlantillaSerializer(), completo=True)
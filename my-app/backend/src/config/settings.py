@@ -104,15 +104,18 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    # limit/offset; ?paginacion=cursor en las vistas con orden_cursor (core/paginacion.py)
+    'DEFAULT_PAGINATION_CLASS': 'core.paginacion.PaginacionSeleccionable',
     'PAGE_SIZE': 20,
     'MAX_PAGE_SIZE': 100,
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.ORJSONRenderer',
     ],
+    # API_DECIMALES_COMO_NUMERO=1: los decimales salen como número en lugar de string
+    'COERCE_DECIMAL_TO_STRING': os.getenv('API_DECIMALES_COMO_NUMERO', '0') != '1',
     'DEFAULT_THROTTLE_CLASSES': [],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '10000/hour',
@@ -135,13 +138,33 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Al editar un alimento del catálogo se refrescan los aportes de plantillas y de
+# visitas de hoy en adelante; con 1 también se recalculan las visitas históricas.
+NUTRICION_REFRESCAR_HISTORICO = os.getenv('NUTRICION_REFRESCAR_HISTORICO', '0') == '1'
+
+# Hilos por proceso para los reportes en segundo plano (auditoria.trabajos)
+REPORTES_TRABAJOS_HILOS = int(os.getenv('REPORTES_TRABAJOS_HILOS', '2'))
+
 # Cache Configuration
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000
+# Por defecto la caché es un archivo SQLite compartido por todos los workers del
+# host (con una LRU chica en cada proceso), así las invalidaciones de un worker
+# llegan a los demás. Con REDIS_URL se usa Redis (requiere instalar redis).
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
         }
     }
-}
\ No newline at end of file
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.CacheCompartida',
+            'LOCATION': os.getenv('CACHE_PATH', os.path.join(BASE_DIR, 'cache', 'cache.sqlite3')),
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+                'L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', '500')),
+                'COMPRIMIR_DESDE': 4096,
+            }
+        }
+    }
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""Caché con invalidación por tags versionados.
+
+Cada tag (p. ej. 'institucion:3' o 'visitas:mes:2025-04') tiene una generación
+guardada en la caché. La clave real de una entrada incluye las generaciones de
+sus tags, así que invalidar un tag es incrementar su generación: las entradas que
+dependen de él dejan de encontrarse y las demás siguen sirviéndose.
+
+`obtener_o_calcular` además evita que muchos requests recalculen a la vez el mismo
+valor (p. ej. todos los dashboards al vencer la entrada): uno solo calcula y el
+resto espera o recibe el valor anterior mientras tanto.
+"""
+import hashlib
+import math
+import random
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIJO_TAG = 'tag:'
+PREFIJO_MODIFICADO = 'modificado:'
+
+
+def _nueva_generacion():
+    # Si la generación se pierde (desalojo), la nueva no coincide con ninguna anterior
+    return time.time_ns()
+
+
+def generaciones(tags):
+    """Generación actual de cada tag (se inicializan las que falten)."""
+    claves = [f'{PREFIJO_TAG}{tag}' for tag in tags]
+    actuales = cache.get_many(claves)
+    faltantes = {clave: _nueva_generacion() for clave in claves if clave not in actuales}
+    if faltantes:
+        cache.set_many(faltantes, None)
+        actuales.update(faltantes)
+    return [actuales[clave] for clave in claves]
+
+
+def invalidar(*tags):
+    """Incrementa la generación de los tags indicados."""
+    for tag in set(tags):
+        clave = f'{PREFIJO_TAG}{tag}'
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, _nueva_generacion(), None)
+
+
+def marcar_modificados(*tags):
+    """Invalida los tags y registra cuándo cambiaron sus datos (para Last-Modified).
+
+    Se invalidan otra vez al confirmar la transacción, así una versión leída
+    antes del commit no queda asociada a los datos nuevos.
+    """
+    def al_confirmar():
+        invalidar(*tags)
+        cache.set_many({f'{PREFIJO_MODIFICADO}{tag}': time.time() for tag in tags}, None)
+
+    invalidar(*tags)
+    transaction.on_commit(al_confirmar)
+
+
+def ultima_modificacion(tags):
+    """Timestamp del último cambio de cualquiera de los tags (los que no tienen, desde ahora)."""
+    claves = [f'{PREFIJO_MODIFICADO}{tag}' for tag in tags]
+    actuales = cache.get_many(claves)
+    faltantes = {clave: time.time() for clave in claves if clave not in actuales}
+    if faltantes:
+        cache.set_many(faltantes, None)
+        actuales.update(faltantes)
+    return max(actuales.values())
+
+
+def _hash(generaciones_tags):
+    return hashlib.md5('.'.join(str(g) for g in generaciones_tags).encode()).hexdigest()
+
+
+def version_tags(tags):
+    """Hash de las generaciones actuales de los tags: cambia al invalidar cualquiera."""
+    return _hash(generaciones(sorted(set(tags))))
+
+
+def clave_versionada(clave, tags):
+    return f'{clave}@{version_tags(tags)}'
+
+
+def claves_versionadas(entradas):
+    """clave_versionada de varias (clave, tags) leyendo todas las generaciones de una vez."""
+    todos = sorted({tag for _, tags in entradas for tag in tags})
+    actuales = dict(zip(todos, generaciones(todos)))
+    return [f'{clave}@{_hash(actuales[tag] for tag in sorted(set(tags)))}' for clave, tags in entradas]
+
+
+# Tiempo extra que se conserva una entrada vencida para servirla mientras se recalcula
+MARGEN_OBSOLETO = 60 * 60
+# Vida máxima del bloqueo de recálculo y espera máxima de quien no tiene valor anterior
+TIMEOUT_BLOQUEO = 30
+INTERVALO_ESPERA = 0.05
+# Agresividad del refresco anticipado (1 según Vattani et al., "Optimal Probabilistic Cache Stampede Prevention")
+BETA_REFRESCO = 1.0
+
+
+def _refrescar_antes(entrada, ahora):
+    """Decide al azar refrescar antes de vencer; la probabilidad crece al acercarse el vencimiento
+    y con lo que tardó el último cálculo."""
+    if entrada['vence'] is None:
+        return False
+    return ahora - entrada['duracion'] * BETA_REFRESCO * math.log(1 - random.random()) >= entrada['vence']
+
+
+def obtener_o_calcular(clave, tags, timeout, calcular):
+    """Devuelve el valor cacheado para la clave y sus tags, o lo calcula y lo guarda.
+
+    La entrada se guarda bajo la clave sin versionar junto con la versión de sus
+    tags y su vencimiento lógico. Si está vigente se devuelve (salvo que toque
+    refrescarla antes de tiempo); si venció o cambiaron los tags, solo el primero
+    que toma el bloqueo recalcula. Los demás reciben el valor anterior si solo
+    venció; si cambiaron los tags (los datos se modificaron) o no hay valor,
+    esperan a que se guarde el nuevo.
+    """
+    version = version_tags(tags)
+    entrada = cache.get(clave)
+    ahora = time.time()
+    vigente = entrada is not None and entrada['version'] == version and (
+        entrada['vence'] is None or ahora < entrada['vence']
+    )
+    if vigente and not _refrescar_antes(entrada, ahora):
+        return entrada['valor']
+
+    clave_bloqueo = f'bloqueo:{clave}'
+    dueno = uuid.uuid4().hex
+    if not cache.add(clave_bloqueo, dueno, TIMEOUT_BLOQUEO):
+        # Otro proceso está recalculando: un valor vencido de la misma versión sirve
+        # mientras tanto, uno de otra versión no (sería anterior a una escritura)
+        if entrada is not None and entrada['version'] == version:
+            return entrada['valor']
+        limite = ahora + TIMEOUT_BLOQUEO
+        while time.time() < limite:
+            time.sleep(INTERVALO_ESPERA)
+            entrada = cache.get(clave)
+            if entrada is not None and entrada['version'] == version:
+                return entrada['valor']
+            if not cache.has_key(clave_bloqueo):
+                break
+        # El otro cálculo falló o tarda demasiado: se calcula aquí sin bloqueo
+
+    try:
+        inicio = time.time()
+        valor = calcular()
+        fin = time.time()
+        cache.set(
+            clave,
+            {
+                'valor': valor,
+                'version': version,
+                'duracion': fin - inicio,
+                'vence': fin + timeout if timeout is not None else None,
+            },
+            timeout + MARGEN_OBSOLETO if timeout is not None else None,
+        )
+    finally:
+        if cache.get(clave_bloqueo) == dueno:
+            cache.delete(clave_bloqueo)
+    return valor
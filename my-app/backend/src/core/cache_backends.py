@@ -0,0 +1,280 @@
+"""Backend de caché compartido entre los workers de un mismo host.
+
+Los datos viven en un archivo SQLite (modo WAL) que leen y escriben todos los
+procesos, así una invalidación hecha por un worker la ven los demás. Delante hay
+una LRU chica por proceso: cada fila guarda una versión que cambia en cada
+escritura, y si la versión coincide con la de la copia local se devuelve esa
+copia sin leer ni deserializar el valor. Los valores grandes se comprimen.
+
+Configuración (settings.CACHES):
+
+    'BACKEND': 'core.cache_backends.CacheCompartida',
+    'LOCATION': '/ruta/al/archivo.sqlite3',
+    'OPTIONS': {
+        'MAX_ENTRIES': 10000,      # filas en el archivo antes de purgar
+        'CULL_FREQUENCY': 3,       # al purgar se borra 1/3 de las filas
+        'L1_MAX_ENTRIES': 500,     # entradas de la LRU de cada proceso
+        'COMPRIMIR_DESDE': 4096,   # bytes a partir de los cuales se comprime
+    }
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Primer byte del valor guardado
+SIN_COMPRIMIR = b'0'
+COMPRIMIDO = b'1'
+
+# Cada cuántas escrituras se revisa si hay que purgar, y cada cuántas operaciones
+# se vuelcan las estadísticas del proceso al archivo
+REVISAR_PURGA_CADA = 100
+VOLCAR_ESTADISTICAS_CADA = 200
+
+CONTADORES = ('aciertos_l1', 'aciertos_l2', 'fallos', 'escrituras', 'desalojos_l1', 'desalojos_l2')
+
+
+class CacheCompartida(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        opciones = params.get('OPTIONS', {})
+        self.ruta = location
+        self.l1_max_entries = int(opciones.get('L1_MAX_ENTRIES', 500))
+        self.comprimir_desde = int(opciones.get('COMPRIMIR_DESDE', 4096))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._l1 = OrderedDict()
+        self._pid = None
+        self._contadores = dict.fromkeys(CONTADORES, 0)
+        self._operaciones = 0
+        self._escrituras = 0
+
+    # Conexión y esquema
+
+    def _conexion(self):
+        if self._pid != os.getpid():
+            # Proceso nuevo (fork): no se heredan conexiones ni la LRU
+            with self._lock:
+                self._local = threading.local()
+                self._l1.clear()
+                self._contadores = dict.fromkeys(CONTADORES, 0)
+                self._pid = os.getpid()
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.ruta, timeout=10, isolation_level=None, check_same_thread=False)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'clave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira REAL, version INTEGER NOT NULL)'
+            )
+            conexion.execute('CREATE INDEX IF NOT EXISTS cache_expira ON cache (expira)')
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS estadisticas (contador TEXT PRIMARY KEY, valor INTEGER NOT NULL)'
+            )
+            self._local.conexion = conexion
+        return conexion
+
+    # Serialización
+
+    def _serializar(self, valor):
+        datos = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        if len(datos) >= self.comprimir_desde:
+            return COMPRIMIDO + zlib.compress(datos)
+        return SIN_COMPRIMIR + datos
+
+    def _deserializar(self, datos):
+        datos = bytes(datos)
+        if datos[:1] == COMPRIMIDO:
+            return pickle.loads(zlib.decompress(datos[1:]))
+        return pickle.loads(datos[1:])
+
+    # LRU local
+
+    def _l1_get(self, clave):
+        with self._lock:
+            entrada = self._l1.get(clave)
+            if entrada is not None:
+                self._l1.move_to_end(clave)
+            return entrada
+
+    def _l1_set(self, clave, version, valor):
+        with self._lock:
+            self._l1[clave] = (version, valor)
+            self._l1.move_to_end(clave)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+                self._contadores['desalojos_l1'] += 1
+
+    def _l1_delete(self, clave):
+        with self._lock:
+            self._l1.pop(clave, None)
+
+    # Estadísticas
+
+    def _contar(self, contador, cantidad=1):
+        with self._lock:
+            self._contadores[contador] += cantidad
+            self._operaciones += 1
+            volcar = self._operaciones >= VOLCAR_ESTADISTICAS_CADA
+        if volcar:
+            self.volcar_estadisticas()
+
+    def volcar_estadisticas(self):
+        """Suma los contadores del proceso a los compartidos del archivo."""
+        with self._lock:
+            contadores, self._contadores = self._contadores, dict.fromkeys(CONTADORES, 0)
+            self._operaciones = 0
+        self._conexion().executemany(
+            'INSERT INTO estadisticas (contador, valor) VALUES (?, ?) '
+            'ON CONFLICT(contador) DO UPDATE SET valor = valor + excluded.valor',
+            [(contador, valor) for contador, valor in contadores.items() if valor],
+        )
+
+    def estadisticas(self):
+        """Contadores acumulados de todos los procesos, más el tamaño actual."""
+        self.volcar_estadisticas()
+        conexion = self._conexion()
+        resultado = dict.fromkeys(CONTADORES, 0)
+        resultado.update(conexion.execute('SELECT contador, valor FROM estadisticas').fetchall())
+        lecturas = resultado['aciertos_l1'] + resultado['aciertos_l2'] + resultado['fallos']
+        resultado['tasa_aciertos'] = (
+            round((resultado['aciertos_l1'] + resultado['aciertos_l2']) / lecturas, 4) if lecturas else None
+        )
+        resultado['entradas'] = conexion.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        resultado['entradas_l1'] = len(self._l1)
+        return resultado
+
+    # API de BaseCache
+
+    def get(self, key, default=None, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        local = self._l1_get(clave)
+        fila = self._conexion().execute(
+            'SELECT version, expira, CASE WHEN version = ? THEN NULL ELSE valor END FROM cache WHERE clave = ?',
+            (local[0] if local else None, clave),
+        ).fetchone()
+
+        if fila is None or (fila[1] is not None and fila[1] <= time.time()):
+            self._l1_delete(clave)
+            self._contar('fallos')
+            return default
+        if local is not None and fila[0] == local[0]:
+            self._contar('aciertos_l1')
+            return local[1]
+
+        valor = self._deserializar(fila[2])
+        self._l1_set(clave, fila[0], valor)
+        self._contar('aciertos_l2')
+        return valor
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        self._escribir(clave, value, timeout, 'INSERT OR REPLACE')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        conexion = self._conexion()
+        # Una fila vencida no impide agregar
+        conexion.execute('DELETE FROM cache WHERE clave = ? AND expira <= ?', (clave, time.time()))
+        return self._escribir(clave, value, timeout, 'INSERT OR IGNORE')
+
+    def _escribir(self, clave, valor, timeout, instruccion):
+        version = random.getrandbits(62)
+        cursor = self._conexion().execute(
+            f'{instruccion} INTO cache (clave, valor, expira, version) VALUES (?, ?, ?, ?)',
+            (clave, self._serializar(valor), self.get_backend_timeout(timeout), version),
+        )
+        escrito = cursor.rowcount > 0
+        if escrito:
+            self._l1_set(clave, version, valor)
+            self._contar('escrituras')
+            self._purgar_si_corresponde()
+        return escrito
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        cursor = self._conexion().execute(
+            'UPDATE cache SET expira = ? WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+            (self.get_backend_timeout(timeout), clave, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        self._l1_delete(clave)
+        cursor = self._conexion().execute('DELETE FROM cache WHERE clave = ?', (clave,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        fila = self._conexion().execute(
+            'SELECT 1 FROM cache WHERE clave = ? AND (expira IS NULL OR expira > ?)', (clave, time.time())
+        ).fetchone()
+        return fila is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Incremento atómico entre procesos (una transacción con bloqueo de escritura)."""
+        clave = self.make_and_validate_key(key, version=version)
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            fila = conexion.execute(
+                'SELECT valor, expira FROM cache WHERE clave = ?', (clave,)
+            ).fetchone()
+            if fila is None or (fila[1] is not None and fila[1] <= time.time()):
+                raise ValueError("Key '%s' not found." % key)
+            valor = self._deserializar(fila[0]) + delta
+            nueva_version = random.getrandbits(62)
+            conexion.execute(
+                'UPDATE cache SET valor = ?, version = ? WHERE clave = ?',
+                (self._serializar(valor), nueva_version, clave),
+            )
+            conexion.execute('COMMIT')
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        self._l1_set(clave, nueva_version, valor)
+        return valor
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self._conexion().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # La conexión se mantiene abierta entre requests; solo se vuelcan las estadísticas
+        if self._operaciones:
+            self.volcar_estadisticas()
+
+    # Purga
+
+    def _purgar_si_corresponde(self):
+        with self._lock:
+            self._escrituras += 1
+            revisar = self._escrituras % REVISAR_PURGA_CADA == 0
+        if not revisar:
+            return
+        conexion = self._conexion()
+        vencidas = conexion.execute('DELETE FROM cache WHERE expira <= ?', (time.time(),)).rowcount
+        total = conexion.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        desalojadas = 0
+        if total > self._max_entries:
+            # Como Django: se descarta 1/CULL_FREQUENCY de las entradas, las que vencen antes
+            cantidad = total // self._cull_frequency if self._cull_frequency else total
+            desalojadas = conexion.execute(
+                'DELETE FROM cache WHERE clave IN ('
+                'SELECT clave FROM cache ORDER BY expira IS NULL, expira LIMIT ?)',
+                (cantidad,),
+            ).rowcount
+        if vencidas or desalojadas:
+            self._contar('desalojos_l2', vencidas + desalojadas)
@@ -0,0 +1,196 @@
+"""Selección de campos (?fields=) y expansión de relaciones (?expand=) en la API.
+
+`?fields=id,fecha,platos.nombre` limita la respuesta a esos campos: los de un
+serializer anidado se eligen con la ruta separada por puntos, y `platos` solo
+incluye todos los de los platos. `?expand=institucion` reemplaza el id de una FK
+por el objeto (las FK expandibles de cada serializer están en Meta.expandibles);
+dentro de anidados también va con la ruta, p. ej. `?expand=platos.ingredientes.alimento`.
+Sin estos parámetros las respuestas no cambian.
+
+Los viewsets con CamposDinamicosViewSetMixin arman el queryset de las lecturas
+según lo que va a leer el serializer (con o sin ?fields=): only() de las
+columnas, select_related de las FK leídas y Prefetch con only() para las
+relaciones anidadas. Así, p. ej., de cada alimento de un ingrediente se trae
+solo el nombre y no sus ~40 columnas de nutrientes.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def parsear_rutas(valor):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}; None si no hay valor."""
+    if valor is None:
+        return None
+    arbol = {}
+    for ruta in valor.split(','):
+        nodo = arbol
+        for parte in ruta.strip().split('.'):
+            if parte:
+                nodo = nodo.setdefault(parte, {})
+    return arbol
+
+
+class CamposDinamicosMixin:
+    """Serializer con campos elegibles y FK expandibles (ver el docstring del módulo)."""
+
+    def __init__(self, *args, campos=None, expandir=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._campos = campos
+        self._expandir = expandir or {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        expandibles = getattr(self.Meta, 'expandibles', {})
+        for nombre in self._expandir:
+            if nombre in expandibles:
+                fields[nombre] = expandibles[nombre](read_only=True)
+
+        if self._campos is not None:
+            fields = {nombre: campo for nombre, campo in fields.items() if nombre in self._campos}
+
+        # Los anidados reciben su parte de las rutas
+        for nombre, campo in fields.items():
+            anidado = campo.child if isinstance(campo, ListSerializer) else campo
+            if isinstance(anidado, CamposDinamicosMixin):
+                anidado._campos = (self._campos.get(nombre) or None) if self._campos is not None else None
+                anidado._expandir = self._expandir.get(nombre, {})
+        return fields
+
+
+def _campo_relacion(modelo, nombre):
+    try:
+        return modelo._meta.get_field(nombre)
+    except FieldDoesNotExist:
+        return None
+
+
+def proyeccion(serializer, modelo):
+    """Columnas, select_related y prefetch que necesita el serializer para leer `modelo`.
+
+    Devuelve (only, select_related, prefetch) con prefetch = {lookup: Prefetch}, o
+    None si algún campo lee algo que no se puede deducir (p. ej. un método), en
+    cuyo caso el queryset se deja como está.
+    """
+    only = {modelo._meta.pk.name}
+    select = set()
+    prefetch = {}
+
+    for campo in serializer.fields.values():
+        if campo.write_only:
+            continue
+
+        if isinstance(campo, BaseSerializer):
+            anidado = campo.child if isinstance(campo, ListSerializer) else campo
+            relacion = _campo_relacion(modelo, campo.source)
+            if relacion is None or not relacion.is_relation:
+                return None
+            sub = proyeccion(anidado, relacion.related_model)
+            if sub is None:
+                return None
+            sub_only, sub_select, sub_prefetch = sub
+
+            if relacion.many_to_one or (relacion.one_to_one and relacion.concrete):
+                # FK expandida: se trae en el mismo JOIN
+                select.add(relacion.name)
+                select.update(f'{relacion.name}__{s}' for s in sub_select)
+                only.add(relacion.name)
+                only.update(f'{relacion.name}__{c}' for c in sub_only)
+                for lookup, p in sub_prefetch.items():
+                    prefetch[f'{relacion.name}__{lookup}'] = Prefetch(
+                        f'{relacion.name}__{lookup}', queryset=p.queryset
+                    )
+            elif relacion.one_to_many:
+                # Relación inversa: Prefetch con solo las columnas que se leen
+                sub_only.add(relacion.field.name)
+                accesor = relacion.get_accessor_name()
+                queryset = _aplicar(relacion.related_model._default_manager.all(), sub_only, sub_select, sub_prefetch)
+                prefetch[accesor] = Prefetch(accesor, queryset=queryset)
+            else:
+                return None
+            continue
+
+        if campo.source == '*':
+            return None
+        partes = campo.source.split('.')
+        actual = modelo
+        ruta = []
+        for i, parte in enumerate(partes):
+            field = _campo_relacion(actual, parte)
+            ultima = i == len(partes) - 1
+            if field is None:
+                return None
+            if field.is_relation and (field.many_to_one or field.one_to_one) and field.concrete:
+                only.add('__'.join(ruta + [parte]))
+                if ultima:
+                    break
+                ruta.append(parte)
+                select.add('__'.join(ruta))
+                actual = field.related_model
+            elif field.one_to_many and not ruta and partes[i + 1:] == ['count']:
+                # p. ej. 'ingredientes.count': alcanza con prefetch de ids (count usa la caché)
+                accesor = field.get_accessor_name()
+                prefetch.setdefault(accesor, Prefetch(
+                    accesor,
+                    queryset=field.related_model._default_manager.only(
+                        field.related_model._meta.pk.name, field.field.name
+                    ),
+                ))
+                break
+            elif field.concrete and not field.is_relation and ultima:
+                only.add('__'.join(ruta + [parte]))
+            else:
+                return None
+
+    return only, select, prefetch
+
+
+def proyectar(queryset, serializer, completo=False):
+    """Aplica al queryset la proyección del serializer (sin cambios si no se puede deducir).
+
+    Con `completo` se cargan todas las columnas del modelo principal y solo se
+    proyectan las relaciones: para instancias que después se guardan.
+    """
+    resultado = proyeccion(serializer, queryset.model)
+    if resultado is None:
+        return queryset
+    only, select, prefetch = resultado
+    if completo:
+        only = only | {field.name for field in queryset.model._meta.concrete_fields}
+    return _aplicar(queryset.select_related(None).prefetch_related(None), only, select, prefetch)
+
+
+def _aplicar(queryset, only, select, prefetch):
+    queryset = queryset.only(*only)
+    if select:
+        # select_related() sin argumentos seguiría todas las FK
+        queryset = queryset.select_related(*select)
+    return queryset.prefetch_related(*prefetch.values())
+
+
+class CamposDinamicosViewSetMixin:
+    """Pasa ?fields= y ?expand= al serializer y proyecta el queryset de las lecturas."""
+
+    def _rutas(self, parametro):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        return parsear_rutas(self.request.query_params.get(parametro))
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), CamposDinamicosMixin):
+            kwargs.setdefault('campos', self._rutas('fields'))
+            kwargs.setdefault('expandir', self._rutas('expand'))
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return queryset
+        if not issubclass(self.get_serializer_class(), CamposDinamicosMixin):
+            return queryset
+        if getattr(self, 'listado_rapido', False):
+            # Los listados rápidos (core.listados) eligen las columnas con values()
+            return queryset
+        return proyectar(queryset, self.get_serializer())
@@ -0,0 +1,67 @@
+"""GET condicional (ETag / Last-Modified) para los catálogos.
+
+Los viewsets con GetCondicionalMixin indican en `tags_catalogo` los tags de
+los datos que muestran, y las escrituras los marcan con marcar_modificados
+(en las señales). Con la versión de esos tags, la URL y el formato de la
+respuesta se arma un ETag fuerte; el Last-Modified es el último cambio de los
+tags. Un GET con If-None-Match (o If-Modified-Since) vigente se responde 304
+en initial(), antes de armar el queryset: sin consultas del listado.
+
+Las respuestas llevan `Cache-Control: private, no-cache`: el cliente puede
+guardarlas pero revalida cada vez.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.settings import api_settings
+from core.cache import ultima_modificacion, version_tags
+
+
+class NoModificado(Exception):
+    """Corta el request con la respuesta condicional (304 o 412)."""
+
+    def __init__(self, respuesta):
+        super().__init__()
+        self.respuesta = respuesta
+
+
+class GetCondicionalMixin:
+    tags_catalogo = ()
+
+    def validadores(self, request):
+        """(ETag, Last-Modified como timestamp) de la respuesta al request."""
+        representacion = '|'.join([
+            version_tags(self.tags_catalogo),
+            request.get_full_path(),
+            request.accepted_media_type,
+            str(api_settings.COERCE_DECIMAL_TO_STRING),
+        ])
+        etag = quote_etag(hashlib.md5(representacion.encode()).hexdigest())
+        return etag, int(ultima_modificacion(self.tags_catalogo))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validadores = None
+        if request.method not in ('GET', 'HEAD') or not self.tags_catalogo:
+            return
+        self._validadores = self.validadores(request)
+        etag, modificado = self._validadores
+        respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+        if respuesta is not None:
+            raise NoModificado(respuesta)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NoModificado):
+            return exc.respuesta
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validadores = getattr(self, '_validadores', None)
+        if validadores is not None and response.status_code in (200, 304):
+            etag, modificado = validadores
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modificado)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
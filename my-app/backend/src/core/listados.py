@@ -0,0 +1,308 @@
+"""Listados rápidos: las acciones list serializadas directamente desde values().
+
+En lugar de instanciar cada modelo y pasarlo por el serializer, el list() de
+los viewsets con ListadoRapidoMixin lee la página con values() y arma cada
+elemento con un mapa de campos compilado a partir del serializer (con ?fields=
+y ?expand= ya aplicados). Los mapas se compilan una vez por serializer y
+combinación de parámetros.
+
+La salida es la del serializer: las mismas claves en el mismo orden y los
+mismos formatos (decimales con sus decimales, fechas ISO, ids de las FK). Las
+FK expandidas salen del mismo JOIN; cada relación inversa anidada (p. ej. los
+ingredientes de un plato plantilla) y cada `relacion.count` agregan un values()
+por página. Si el serializer lee algo que no se puede compilar (métodos,
+archivos, campos sin columna), se usa el list() normal.
+"""
+import decimal
+import json
+from functools import lru_cache
+
+from django.db import models
+from django.db.models import Count
+from rest_framework import fields as drf_fields, relations
+from rest_framework.fields import empty
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.settings import api_settings
+from .campos import CamposDinamicosMixin, _campo_relacion
+
+# Marca de campo omitido (como SkipField en el serializer)
+OMITIR = object()
+
+# Campos cuyo to_representation devuelve el valor leído de la base tal cual
+_IDENTIDAD = (drf_fields.BooleanField, drf_fields.JSONField, drf_fields.ReadOnlyField)
+# Campos que se convierten con su propio to_representation
+_GENERICOS = (
+    drf_fields.CharField, drf_fields.ChoiceField, drf_fields.IntegerField, drf_fields.FloatField,
+    drf_fields.DateTimeField, drf_fields.TimeField, drf_fields.DurationField, drf_fields.UUIDField,
+)
+
+
+class NoCompilable(Exception):
+    pass
+
+
+def _decimal(campo, columna):
+    if campo.decimal_places is None or campo.localize or campo.normalize_output:
+        return campo.to_representation
+    coercionar = getattr(campo, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if (
+        isinstance(columna, models.DecimalField) and campo.rounding is None
+        and (columna.max_digits, columna.decimal_places) == (campo.max_digits, campo.decimal_places)
+    ):
+        # La base (o el conversor de Django) ya devuelve el valor con esos decimales
+        return (lambda valor: f'{valor:f}') if coercionar else None
+    exponente = decimal.Decimal('.1') ** campo.decimal_places
+    contexto = decimal.getcontext().copy()
+    if campo.max_digits is not None:
+        contexto.prec = campo.max_digits
+    redondeo = campo.rounding
+
+    if coercionar:
+        return lambda valor: f'{valor.quantize(exponente, rounding=redondeo, context=contexto):f}'
+    return lambda valor: valor.quantize(exponente, rounding=redondeo, context=contexto)
+
+
+def _conversion(campo, columna):
+    """Función valor de `columna` (campo del modelo) -> representación (None si es la identidad)."""
+    if isinstance(campo, relations.PrimaryKeyRelatedField):
+        if campo.pk_field is not None:
+            raise NoCompilable
+        return None
+    if isinstance(campo, drf_fields.DecimalField):
+        return _decimal(campo, columna)
+    if isinstance(campo, drf_fields.DateField):
+        formato = getattr(campo, 'format', api_settings.DATE_FORMAT)
+        if formato is None:
+            return None
+        if formato.lower() == drf_fields.ISO_8601:
+            return lambda valor: valor.isoformat()
+        return campo.to_representation
+    if isinstance(campo, drf_fields.JSONField) and campo.binary:
+        return campo.to_representation
+    if isinstance(campo, _IDENTIDAD):
+        return None
+    if isinstance(campo, drf_fields.MultipleChoiceField):
+        raise NoCompilable
+    if isinstance(campo, _GENERICOS):
+        return campo.to_representation
+    raise NoCompilable
+
+
+def _extractor(clave, conversion):
+    if conversion is None:
+        return lambda fila: fila[clave]
+
+    def extraer(fila):
+        valor = fila[clave]
+        return None if valor is None else conversion(valor)
+    return extraer
+
+
+def _extractor_nulable(clave, clave_fk, conversion, si_falta):
+    """Columna leída a través de FK que pueden ser NULL: si falta el objeto, `si_falta`."""
+    extraer_valor = _extractor(clave, conversion)
+
+    def extraer(fila):
+        if any(fila[fk] is None for fk in clave_fk):
+            return si_falta
+        return extraer_valor(fila)
+    return extraer
+
+
+class Mapa:
+    """Mapa compilado de un serializer sobre `modelo`.
+
+    `lookups` son las columnas de values(); cada fila se arma con `campos`
+    (nombre, extractor) en el orden del serializer.
+    """
+
+    def __init__(self, modelo, prefijo=''):
+        self.modelo = modelo
+        self.prefijo = prefijo
+        self.pk = prefijo + modelo._meta.pk.name
+        self.lookups = [self.pk]
+        self.campos = []
+        # nombre -> (relación inversa, mapa de los hijos)
+        self.inversas = {}
+        # nombre -> relación inversa que se cuenta
+        self.conteos = {}
+
+    def _lookup(self, lookup):
+        lookup = self.prefijo + lookup
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return lookup
+
+    def compilar(self, serializer):
+        for campo in serializer._readable_fields:
+            if isinstance(campo, BaseSerializer):
+                self._compilar_anidado(campo)
+            else:
+                self._compilar_campo(campo)
+        return self
+
+    def _compilar_anidado(self, campo):
+        anidado = campo.child if isinstance(campo, ListSerializer) else campo
+        relacion = _campo_relacion(self.modelo, campo.source)
+        if relacion is None or not relacion.is_relation:
+            raise NoCompilable
+
+        if isinstance(campo, ListSerializer) and relacion.one_to_many and not self.prefijo:
+            hijo = Mapa(relacion.related_model).compilar(anidado)
+            hijo._lookup(relacion.field.name)
+            self.inversas[campo.field_name] = (relacion, hijo)
+            self.campos.append((campo.field_name, None))
+            return
+
+        if isinstance(campo, ListSerializer) or not (relacion.many_to_one and relacion.concrete):
+            raise NoCompilable
+        # FK expandida: sus columnas con prefijo en la misma fila
+        hijo = Mapa(relacion.related_model, f'{self.prefijo}{relacion.name}__').compilar(anidado)
+        if hijo.inversas or hijo.conteos:
+            raise NoCompilable
+        for lookup in hijo.lookups:
+            if lookup not in self.lookups:
+                self.lookups.append(lookup)
+        fk = self._lookup(relacion.name)
+
+        def extraer(fila):
+            if fila[fk] is None:
+                return None
+            return hijo.armar(fila)
+        self.campos.append((campo.field_name, extraer))
+
+    def _compilar_campo(self, campo):
+        if campo.source == '*':
+            raise NoCompilable
+        partes = campo.source.split('.')
+        actual = self.modelo
+        ruta = []
+        nulables = []
+        for i, parte in enumerate(partes):
+            field = _campo_relacion(actual, parte)
+            ultima = i == len(partes) - 1
+            if field is None:
+                raise NoCompilable
+            if field.is_relation and field.many_to_one and field.concrete:
+                if ultima:
+                    break
+                ruta.append(parte)
+                if field.null:
+                    nulables.append(self._lookup('__'.join(ruta)))
+                actual = field.related_model
+            elif field.one_to_many and not ruta and partes[i + 1:] == ['count']:
+                self.conteos[campo.field_name] = field
+                self.campos.append((campo.field_name, None))
+                return
+            elif field.concrete and not field.is_relation and ultima:
+                pass
+            else:
+                raise NoCompilable
+
+        clave = self._lookup('__'.join(partes))
+        conversion = _conversion(campo, field)
+        if not nulables:
+            self.campos.append((campo.field_name, _extractor(clave, conversion)))
+            return
+        # Si falta un objeto intermedio el serializer usa el default, None u omite el campo
+        if campo.default is not empty:
+            raise NoCompilable
+        if campo.allow_null:
+            si_falta = None
+        elif not campo.required:
+            si_falta = OMITIR
+        else:
+            raise NoCompilable
+        self.campos.append((campo.field_name, _extractor_nulable(clave, nulables, conversion, si_falta)))
+
+    def armar(self, fila, relacionados=None):
+        dato = {}
+        for nombre, extraer in self.campos:
+            if extraer is None:
+                grupos, vacio = relacionados[nombre]
+                valor = grupos.get(fila[self.pk], vacio)
+            else:
+                valor = extraer(fila)
+            if valor is not OMITIR:
+                dato[nombre] = valor
+        return dato
+
+    def _relacionados(self, ids):
+        """nombre -> ({pk: valor}, valor si no hay) para las relaciones inversas y los conteos."""
+        relacionados = {}
+        for nombre, (relacion, hijo) in self.inversas.items():
+            fk = relacion.field.name
+            filas = list(relacion.related_model._default_manager.filter(**{f'{fk}__in': ids}).values(*hijo.lookups))
+            grupos = {}
+            for fila, dato in zip(filas, hijo.serializar(filas)):
+                grupos.setdefault(fila[fk], []).append(dato)
+            relacionados[nombre] = (grupos, [])
+
+        for nombre, relacion in self.conteos.items():
+            inversa = next((n for n, (r, _) in self.inversas.items() if r == relacion), None)
+            if inversa is not None:
+                conteos = {pk: len(hijos) for pk, hijos in relacionados[inversa][0].items()}
+            else:
+                fk = relacion.field.name
+                conteos = dict(
+                    relacion.related_model._default_manager.filter(**{f'{fk}__in': ids})
+                    .order_by().values(fk).annotate(n=Count('pk')).values_list(fk, 'n')
+                )
+            relacionados[nombre] = (conteos, 0)
+        return relacionados
+
+    def serializar(self, filas):
+        """Filas de values() -> lista de dicts como los del serializer."""
+        relacionados = None
+        if self.inversas or self.conteos:
+            relacionados = self._relacionados([fila[self.pk] for fila in filas])
+        return [self.armar(fila, relacionados) for fila in filas]
+
+
+def compilar(serializer, modelo):
+    """Mapa del serializer sobre `modelo`, o None si algún campo no se puede compilar."""
+    try:
+        return Mapa(modelo).compilar(serializer)
+    except NoCompilable:
+        return None
+
+
+@lru_cache(maxsize=256)
+def _mapa(clase, campos, expandir, decimales_como_string):
+    # decimales_como_string solo forma parte de la clave: el mapa depende del setting
+    modelo = getattr(getattr(clase, 'Meta', None), 'model', None)
+    if modelo is None:
+        return None
+    kwargs = {}
+    if issubclass(clase, CamposDinamicosMixin):
+        kwargs = {'campos': json.loads(campos), 'expandir': json.loads(expandir)}
+    return compilar(clase(**kwargs), modelo)
+
+
+class ListadoRapidoMixin:
+    """list() desde values() con el mapa compilado del serializer (ver el docstring del módulo).
+
+    Va después de CamposDinamicosViewSetMixin para respetar ?fields= y ?expand=.
+    """
+
+    def get_mapa_listado(self):
+        rutas = getattr(self, '_rutas', lambda parametro: None)
+        return _mapa(
+            self.get_serializer_class(),
+            json.dumps(rutas('fields'), sort_keys=True),
+            json.dumps(rutas('expand'), sort_keys=True),
+            api_settings.COERCE_DECIMAL_TO_STRING,
+        )
+
+    def list(self, request, *args, **kwargs):
+        mapa = self.get_mapa_listado()
+        if mapa is None:
+            return super().list(request, *args, **kwargs)
+
+        self.listado_rapido = True
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*mapa.lookups)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(mapa.serializar(page))
+        return Response(mapa.serializar(list(queryset)))
@@ -0,0 +1,13 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Muestra aciertos, fallos y desalojos acumulados de la caché compartida"
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, "estadisticas"):
+            raise CommandError(f"El backend {type(cache).__name__} no lleva estadísticas")
+
+        for contador, valor in cache.estadisticas().items():
+            self.stdout.write(f"{contador}: {valor}")
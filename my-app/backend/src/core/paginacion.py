@@ -0,0 +1,180 @@
+"""Paginación por cursor (keyset) además de limit/offset.
+
+Con limit/offset las páginas profundas cuestan cada vez más (la base recorre
+y descarta OFFSET filas) y cada página hace un COUNT(*). Con cursor, cada
+página se pide "después de la última fila vista" según el orden de la vista
+(`orden_cursor`, p. ej. ('-fecha', 'id')), que usa el índice: el costo por
+página es constante aunque se recorra toda la tabla.
+
+- `?paginacion=cursor` (o `paginacion = 'cursor'` en el viewset) pide la
+  primera página; las siguientes siguen los links `next`/`previous` (?cursor=).
+- `?limit=` es el tamaño de página, como en limit/offset.
+- Sin conteo por defecto; `?conteo=exacto` hace el COUNT(*) y
+  `?conteo=estimado` usa la estimación del plan de la base (en MySQL, sin
+  recorrer filas; en otras bases es el exacto).
+
+Los campos de `orden_cursor` no pueden ser NULL y el último debe ser único.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def conteo_estimado(queryset):
+    """Cantidad aproximada de filas según EXPLAIN (MySQL); en otras bases, la exacta."""
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'mysql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with conexion.cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}', params)
+        columnas = [columna[0] for columna in cursor.description]
+        plan = dict(zip(columnas, cursor.fetchone()))
+    filas = plan.get('rows') or 0
+    filtrado = plan.get('filtered') or 100
+    return int(filas * float(filtrado) / 100)
+
+
+def _condicion(orden, valores, reverso):
+    """Filas posteriores a `valores` en `orden` (anteriores si `reverso`)."""
+    condicion = Q()
+    iguales = {}
+    for (campo, descendente), valor in zip(orden, valores):
+        operador = 'lt' if descendente != reverso else 'gt'
+        condicion |= Q(**iguales, **{f'{campo}__{operador}': valor})
+        iguales[campo] = valor
+    # Cota sobre el primer campo, para que la base use el índice como rango
+    campo, descendente = orden[0]
+    return Q(**{f'{campo}__{"lte" if descendente != reverso else "gte"}': valores[0]}) & condicion
+
+
+class PaginacionCursor(BasePagination):
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    conteo_query_param = 'conteo'
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = None
+    mensaje_cursor_invalido = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.orden = [(campo.lstrip('-'), campo.startswith('-')) for campo in view.orden_cursor]
+        limite = self.get_limit(request)
+        posicion, reverso = self.decodificar_cursor(request)
+
+        conteo = request.query_params.get(self.conteo_query_param) or getattr(view, 'conteo_cursor', None)
+        self.count = None
+        if conteo == 'exacto':
+            self.count = queryset.count()
+        elif conteo == 'estimado':
+            self.count = conteo_estimado(queryset)
+
+        campos = [campo for campo, _ in self.orden]
+        valores = queryset.query.values_select
+        if valores and set(campos) - set(valores):
+            # Listados con values(): se agregan las columnas del cursor
+            queryset = queryset.values(*valores, *(campo for campo in campos if campo not in valores))
+
+        if posicion is not None:
+            queryset = queryset.filter(_condicion(self.orden, posicion, reverso))
+        queryset = queryset.order_by(*(
+            f'-{campo}' if descendente != reverso else campo for campo, descendente in self.orden
+        ))
+
+        resultados = list(queryset[:limite + 1])
+        hay_mas = len(resultados) > limite
+        resultados = resultados[:limite]
+        if reverso:
+            resultados.reverse()
+            self.hay_anterior, self.hay_siguiente = hay_mas, True
+        else:
+            self.hay_anterior, self.hay_siguiente = posicion is not None, hay_mas
+
+        if resultados:
+            self.primera, self.ultima = self.posicion(resultados[0]), self.posicion(resultados[-1])
+        else:
+            # Página vacía: los links vuelven desde la misma posición
+            self.primera = self.ultima = posicion
+            self.hay_anterior, self.hay_siguiente = not reverso and posicion is not None, reverso
+        return resultados
+
+    def get_limit(self, request):
+        try:
+            limite = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limite <= 0:
+            return self.default_limit
+        return min(limite, self.max_limit) if self.max_limit else limite
+
+    def posicion(self, fila):
+        if isinstance(fila, dict):
+            return [fila[campo] for campo, _ in self.orden]
+        return [getattr(fila, fila._meta.get_field(campo).attname) for campo, _ in self.orden]
+
+    def decodificar_cursor(self, request):
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(codificado.encode('ascii')))
+            posicion, reverso = cursor['p'], bool(cursor.get('r'))
+            if not isinstance(posicion, list) or len(posicion) != len(self.orden):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.mensaje_cursor_invalido)
+        return posicion, reverso
+
+    def codificar_cursor(self, posicion, reverso):
+        cursor = {'p': posicion, 'r': 1} if reverso else {'p': posicion}
+        codificado = urlsafe_b64encode(json.dumps(cursor, cls=DjangoJSONEncoder).encode()).decode('ascii')
+        url = remove_query_param(self.base_url, 'paginacion')
+        return replace_query_param(url, self.cursor_query_param, codificado)
+
+    def get_next_link(self):
+        if not self.hay_siguiente or self.ultima is None:
+            return None
+        return self.codificar_cursor(self.ultima, False)
+
+    def get_previous_link(self):
+        if not self.hay_anterior or self.primera is None:
+            return None
+        return self.codificar_cursor(self.primera, True)
+
+    def get_paginated_response(self, data):
+        respuesta = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None:
+            respuesta = {'count': self.count, **respuesta}
+        return Response(respuesta)
+
+
+class PaginacionSeleccionable(LimitOffsetPagination):
+    """limit/offset, o PaginacionCursor en las vistas con `orden_cursor` (ver el docstring del módulo)."""
+
+    def usa_cursor(self, request, view):
+        if getattr(view, 'orden_cursor', None) is None:
+            return False
+        if PaginacionCursor.cursor_query_param in request.query_params:
+            return True
+        return request.query_params.get('paginacion', getattr(view, 'paginacion', 'offset')) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.por_cursor = None
+        if self.usa_cursor(request, view):
+            self.por_cursor = PaginacionCursor()
+            return self.por_cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.por_cursor is not None:
+            return self.por_cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
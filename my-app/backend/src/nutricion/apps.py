@@ -5,3 +5,6 @@ class NutricionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'nutricion'
     verbose_name = 'Nutrición'
+
+    def ready(self):
+        from . import signals  # noqa: F401
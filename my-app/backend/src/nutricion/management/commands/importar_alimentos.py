@@ -3,6 +3,8 @@ import os
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from nutricion.models import CategoriaAlimento, AlimentoNutricional
+from core.cache import marcar_modificados
+from nutricion.matriz import TAG_CATALOGO, invalidar_matriz
 
 
 CATEGORIA_CODIGOS = {
@@ -131,6 +133,10 @@ class Command(BaseCommand):
             self.stdout.write(f"Importando {len(objetos)} alimentos...")
             AlimentoNutricional.objects.bulk_create(objetos, batch_size=500)
 
+        # bulk_create no dispara señales: forzar la recarga de la matriz nutricional
+        invalidar_matriz()
+        marcar_modificados(TAG_CATALOGO)
+
         self.stdout.write(self.style.SUCCESS("✓ Importación completada con éxito."))
         self.stdout.write(f"  Categorías: {CategoriaAlimento.objects.count()}")
         self.stdout.write(f"  Alimentos: {AlimentoNutricional.objects.count()}")
@@ -0,0 +1,201 @@
+"""Motor vectorizado de cálculo nutricional.
+
+El catálogo de AlimentoNutricional se carga en una matriz NumPy (una fila por
+alimento, una columna por nutriente, valores cada 100 g) y los aportes o totales
+de uno o miles de platos se obtienen como productos matriz-vector.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AlimentoNutricional
+
+
+# (campo de aporte, campos del alimento en orden de preferencia)
+NUTRIENTES = (
+    ('energia_kcal', ('energia_kcal',)),
+    ('proteinas_g', ('proteinas_g',)),
+    ('grasas_totales_g', ('grasas_totales_g',)),
+    ('carbohidratos_g', ('carbohidratos_disponibles_g', 'carbohidratos_totales_g')),
+    ('agua_g', ('agua_g',)),
+    ('fibra_g', ('fibra_g',)),
+    ('sodio_mg', ('sodio_mg',)),
+    ('calcio_mg', ('calcio_mg',)),
+    ('hierro_mg', ('hierro_mg',)),
+    ('zinc_mg', ('zinc_mg',)),
+    ('vitamina_c_mg', ('vitamina_c_mg',)),
+    ('potasio_mg', ('potasio_mg',)),
+    ('fosforo_mg', ('fosforo_mg',)),
+    ('grasas_saturadas_g', ('grasas_saturadas_g',)),
+    ('grasas_monoinsat_g', ('grasas_monoinsat_g',)),
+    ('grasas_poliinsat_g', ('grasas_poliinsat_g',)),
+)
+
+CAMPOS_APORTE = tuple(campo for campo, _ in NUTRIENTES)
+CAMPOS_TOTAL = tuple(f'{campo}_total' for campo in CAMPOS_APORTE)
+CAMPOS_ALIMENTO = tuple(dict.fromkeys(f for _, fuentes in NUTRIENTES for f in fuentes))
+
+# cantidad (3 decimales) / 100 * valor (3 decimales) tiene a lo sumo 8 decimales,
+# por lo que redondear el float64 a 8 decimales recupera el Decimal exacto.
+DECIMALES = 8
+
+CACHE_VERSION_KEY = 'matriz_nutricional_version'
+
+# Tag de caché (core.cache) de las respuestas que dependen del catálogo
+TAG_CATALOGO = 'catalogo'
+# Solo las categorías (también cambian TAG_CATALOGO: los alimentos muestran su nombre)
+TAG_CATEGORIAS = 'catalogo:categorias'
+
+
+def valores_nutrientes(valores):
+    """Valores (Decimal, cada 100 g) por campo de aporte, aplicando los campos alternativos."""
+    resultado = {}
+    for campo, fuentes in NUTRIENTES:
+        valor = None
+        for fuente in fuentes:
+            valor = valores.get(fuente)
+            if valor is not None:
+                break
+        resultado[campo] = Decimal(str(valor)) if valor is not None else Decimal("0")
+    return resultado
+
+
+def vector_alimento(valores):
+    """Vector de nutrientes (cada 100 g) a partir de un dict campo -> valor del alimento."""
+    return [float(valor) for valor in valores_nutrientes(valores).values()]
+
+
+def a_decimal(valor):
+    return Decimal(f'{valor:.{DECIMALES}f}')
+
+
+def a_decimales(vector, campos=CAMPOS_APORTE):
+    """Convierte un vector de nutrientes en un dict campo -> Decimal."""
+    return {campo: a_decimal(valor) for campo, valor in zip(campos, vector)}
+
+
+class MatrizNutricional:
+    def __init__(self, alimento_ids, valores):
+        self.ids = np.asarray(alimento_ids, dtype=np.int64)
+        self.valores = np.asarray(valores, dtype=np.float64).reshape(len(self.ids), len(NUTRIENTES))
+        self._posiciones = {int(pk): i for i, pk in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, alimento_id):
+        return alimento_id in self._posiciones
+
+    @classmethod
+    def desde_queryset(cls, queryset):
+        ids = []
+        valores = []
+        for fila in queryset.values_list('id', *CAMPOS_ALIMENTO):
+            ids.append(fila[0])
+            valores.append(vector_alimento(dict(zip(CAMPOS_ALIMENTO, fila[1:]))))
+        return cls(ids, valores)
+
+    @classmethod
+    def cargar(cls, alimento_ids=None):
+        """Carga el catálogo completo, o solo los alimentos indicados, en una consulta."""
+        queryset = AlimentoNutricional.objects.order_by()
+        if alimento_ids is not None:
+            queryset = queryset.filter(id__in=set(alimento_ids))
+        return cls.desde_queryset(queryset)
+
+    def faltantes(self, alimento_ids):
+        return {pk for pk in alimento_ids if pk not in self._posiciones}
+
+    def ampliar(self, otra):
+        """Devuelve una matriz con las filas de ambas (las de `otra` prevalecen)."""
+        if not len(otra):
+            return self
+        conservar = np.array([pk not in otra for pk in self.ids.tolist()], dtype=bool)
+        return MatrizNutricional(
+            np.concatenate([self.ids[conservar], otra.ids]),
+            np.vstack([self.valores[conservar], otra.valores]),
+        )
+
+    def posiciones(self, alimento_ids):
+        try:
+            return np.fromiter(
+                (self._posiciones[pk] for pk in alimento_ids), dtype=np.intp, count=len(alimento_ids)
+            )
+        except KeyError as e:
+            raise AlimentoNutricional.DoesNotExist(f'Alimento {e.args[0]} no cargado en la matriz')
+
+    def vector(self, alimento_id):
+        return self.valores[self._posiciones[alimento_id]]
+
+    def aportes(self, alimento_ids, cantidades):
+        """Aporte de cada ingrediente: matriz (n ingredientes x nutrientes)."""
+        factores = _factores(cantidades)
+        return self.valores[self.posiciones(alimento_ids)] * factores[:, None]
+
+    def totales(self, alimento_ids, cantidades):
+        """Totales de un plato: vector de nutrientes."""
+        return _factores(cantidades) @ self.valores[self.posiciones(alimento_ids)]
+
+    def totales_por_grupo(self, grupos, alimento_ids, cantidades, n_grupos=None):
+        """Totales de muchos platos a la vez.
+
+        `grupos` indica, para cada ingrediente, la posición (0..n_grupos-1) de su plato.
+        """
+        grupos = np.asarray(grupos, dtype=np.intp)
+        if n_grupos is None:
+            n_grupos = int(grupos.max()) + 1 if len(grupos) else 0
+        resultado = np.zeros((n_grupos, len(NUTRIENTES)), dtype=np.float64)
+        if len(grupos):
+            np.add.at(resultado, grupos, self.aportes(alimento_ids, cantidades))
+        return resultado
+
+
+def _factores(cantidades):
+    return np.fromiter(
+        (float(c or 0) for c in cantidades), dtype=np.float64, count=len(cantidades)
+    ) / 100.0
+
+
+_matriz = None
+_version = None
+
+
+def obtener_matriz(alimento_ids=()):
+    """Matriz del catálogo cargada una vez por proceso.
+
+    Se recarga cuando cambia la versión del catálogo (ver `invalidar_matriz`) y se
+    amplía con los alimentos pedidos que todavía no estén cargados.
+    """
+    global _matriz, _version
+
+    version = cache.get(CACHE_VERSION_KEY, 0)
+    if _matriz is None or version != _version:
+        _matriz = MatrizNutricional.cargar()
+        _version = version
+
+    faltantes = _matriz.faltantes(alimento_ids)
+    if faltantes:
+        _matriz = _matriz.ampliar(MatrizNutricional.cargar(faltantes))
+    return _matriz
+
+
+def _incrementar_version():
+    global _matriz
+    _matriz = None
+    try:
+        cache.incr(CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(CACHE_VERSION_KEY, 1, None)
+
+
+def invalidar_matriz():
+    """Fuerza la recarga de la matriz en todos los procesos que compartan la caché.
+
+    La versión se incrementa ya y otra vez al confirmar la transacción: una
+    matriz cargada antes del commit (con los datos anteriores) no queda
+    guardada con la versión nueva.
+    """
+    _incrementar_version()
+    transaction.on_commit(_incrementar_version)
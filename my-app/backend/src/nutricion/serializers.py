@@ -1,25 +1,28 @@
 from rest_framework import serializers
+from core.campos import CamposDinamicosMixin
 from .models import CategoriaAlimento, AlimentoNutricional
 
 
-class CategoriaAlimentoSerializer(serializers.ModelSerializer):
+class CategoriaAlimentoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = CategoriaAlimento
         fields = '__all__'
 
 
-class AlimentoNutricionalSerializer(serializers.ModelSerializer):
+class AlimentoNutricionalSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
     
     class Meta:
         model = AlimentoNutricional
         fields = '__all__'
+        expandibles = {'categoria': CategoriaAlimentoSerializer}
 
 
-class AlimentoNutricionalListSerializer(serializers.ModelSerializer):
+class AlimentoNutricionalListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='categoria.nombre', read_only=True)
     
     class Meta:
         model = AlimentoNutricional
         fields = ['id', 'codigo_argenfood', 'nombre', 'categoria', 'categoria_nombre', 
                   'energia_kcal', 'proteinas_g', 'grasas_totales_g', 'carbohidratos_disponibles_g']
+        expandibles = {'categoria': CategoriaAlimentoSerializer}
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache import marcar_modificados
+from .models import CategoriaAlimento, AlimentoNutricional
+from .matriz import TAG_CATALOGO, TAG_CATEGORIAS, invalidar_matriz
+
+
+@receiver([post_save, post_delete], sender=AlimentoNutricional)
+def alimento_modificado(sender, **kwargs):
+    invalidar_matriz()
+    marcar_modificados(TAG_CATALOGO)
+
+
+@receiver([post_save, post_delete], sender=CategoriaAlimento)
+def categoria_modificada(sender, **kwargs):
+    marcar_modificados(TAG_CATALOGO, TAG_CATEGORIAS)
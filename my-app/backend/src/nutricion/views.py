@@ -2,6 +2,11 @@ from rest_framework import viewsets, filters
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.cache import cache
+from core.cache import clave_versionada
+from core.campos import CamposDinamicosViewSetMixin
+from core.condicional import GetCondicionalMixin
+from core.listados import ListadoRapidoMixin
+from .matriz import TAG_CATALOGO, TAG_CATEGORIAS
 from .models import CategoriaAlimento, AlimentoNutricional
 from .serializers import (
     CategoriaAlimentoSerializer,
@@ -10,31 +15,38 @@ from .serializers import (
 )
 
 
-class CategoriaAlimentoViewSet(viewsets.ModelViewSet):
+class CategoriaAlimentoViewSet(GetCondicionalMixin, CamposDinamicosViewSetMixin, viewsets.ModelViewSet):
     queryset = CategoriaAlimento.objects.all()
     serializer_class = CategoriaAlimentoSerializer
+    tags_catalogo = [TAG_CATEGORIAS]
 
 
-class AlimentoNutricionalViewSet(viewsets.ModelViewSet):
+class AlimentoNutricionalViewSet(GetCondicionalMixin, CamposDinamicosViewSetMixin, ListadoRapidoMixin, viewsets.ModelViewSet):
     queryset = AlimentoNutricional.objects.select_related('categoria').all()
+    tags_catalogo = [TAG_CATALOGO]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['categoria']
     search_fields = ['nombre', 'codigo_argenfood']
     ordering_fields = ['nombre', 'codigo_argenfood', 'energia_kcal']
     ordering = ['nombre']
+    orden_cursor = ('nombre', 'id')
 
     def list(self, request, *args, **kwargs):
         search = request.query_params.get('search', '')
         
         if search and len(search) > 2:
-            cache_key = f'alimentos_search_{search[:50]}'
+            # Se invalida al modificar el catálogo (tag), por eso puede durar un día. La
+            # clave incluye todos los parámetros (paginación, filtros, orden).
+            parametros = request.query_params.copy()
+            parametros['search'] = search[:50]
+            cache_key = clave_versionada(f'alimentos_search_{parametros.urlencode()}', [TAG_CATALOGO])
             cached = cache.get(cache_key)
             
             if cached:
                 return Response(cached)
             
             response = super().list(request, *args, **kwargs)
-            cache.set(cache_key, response.data, 1800)  # 30 min
+            cache.set(cache_key, response.data, 24 * 60 * 60)
             return response
         
         return super().list(request, *args, **kwargs)